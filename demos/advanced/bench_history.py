@@ -0,0 +1,428 @@
+"""Demo: Benchmark history store with regression detection.
+
+Demos print their timings and throw them away. `HistoryStore` keeps every run in a
+local SQLite file, together with:
+- The git commit (and whether the tree was dirty)
+- The compute spec it ran on (cpus, memory, gpus, node selector, ...)
+- An environment fingerprint (Python, platform, CPU model, key package versions)
+
+Each run stores one or more samples per metric, and each metric has a direction
+("lower" for latency, "higher" for throughput). A run's baseline is the pooled
+samples of the previous `baseline_runs` runs of the same benchmark, compute spec and
+environment. A regression is flagged when the change is worse by at least
+`min_effect`, and a bootstrap confidence interval (at `confidence`) for the ratio of
+means excludes "no change". `compare` applies the same test to any two runs.
+
+Example:
+    # Record a result dict printed by any demo (samples may be lists)
+    python demos/advanced/bench_history.py --record timing_demo '{"warm_s": [0.11, 0.12]}'
+
+    # Synthetic history with an injected regression, then check it
+    python demos/advanced/bench_history.py --demo --db /tmp/bench.db
+
+    python demos/advanced/bench_history.py --list --db /tmp/bench.db
+    python demos/advanced/bench_history.py --compare 3 7 --db /tmp/bench.db
+    python demos/advanced/bench_history.py --check 7 --db /tmp/bench.db
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import subprocess
+import time
+from importlib import metadata
+
+DEFAULT_DB = os.path.expanduser("~/.kt_bench/history.db")
+FINGERPRINT_PACKAGES = ["kubetorch", "torch", "numpy", "physicsx.pxs"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    benchmark TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    git_commit TEXT,
+    git_dirty INTEGER,
+    compute TEXT NOT NULL,
+    env_fingerprint TEXT NOT NULL,
+    env TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    direction TEXT NOT NULL CHECK (direction IN ('lower', 'higher'))
+);
+CREATE INDEX IF NOT EXISTS runs_by_benchmark ON runs (benchmark, created_at);
+CREATE INDEX IF NOT EXISTS samples_by_run ON samples (run_id, metric);
+"""
+
+
+def git_state(cwd: str | None = None) -> tuple[str | None, bool | None]:
+    """(HEAD commit, dirty) or (None, None) outside a git checkout."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=cwd, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def environment() -> dict:
+    """What can change a benchmark's result besides the code and the compute spec."""
+    cpu_model = None
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu_model = next(
+                (line.split(":", 1)[1].strip() for line in f if line.startswith("model name")),
+                None,
+            )
+    except OSError:
+        pass
+    packages = {}
+    for name in FINGERPRINT_PACKAGES:
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            packages[name] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_model": cpu_model,
+        "packages": packages,
+    }
+
+
+def fingerprint(env: dict) -> str:
+    return hashlib.sha256(json.dumps(env, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def compute_spec(compute=None) -> dict:
+    """Comparable description of a kt.Compute (or {} for local runs)."""
+    if compute is None:
+        return {}
+    keys = ["cpus", "memory", "gpus", "gpu_type", "node_selector", "namespace", "disk_size"]
+    return {k: getattr(compute, k, None) for k in keys if getattr(compute, k, None) is not None}
+
+
+# Rates like samples_per_s or trials_per_hour (but not ms_per_step or s_per_sample)
+_RATE = re.compile(r"_per_(s|sec|second|min|minute|h|hr|hour|day)(_|$)")
+
+
+def infer_direction(metric: str) -> str:
+    """'higher' for throughput-like names, else 'lower' (times, latencies, sizes)."""
+    name = metric.lower()
+    higher = ("_ps", "throughput", "speedup", "gbps", "mbps", "iops", "efficiency")
+    return "higher" if _RATE.search(name) or any(h in name for h in higher) else "lower"
+
+
+def _mean(xs):
+    return sum(xs) / len(xs)
+
+
+def _bootstrap(current, baseline, stat, confidence: float, n_boot: int):
+    """(stat of the samples, CI low, CI high) by resampling both sides."""
+    rng = random.Random(0)  # reproducible verdicts
+    values = []
+    for _ in range(n_boot):
+        c = [rng.choice(current) for _ in current]
+        b = [rng.choice(baseline) for _ in baseline]
+        values.append(stat(_mean(c), _mean(b)))
+    values.sort()
+    tail = (1 - confidence) / 2
+    low = values[int(tail * n_boot)]
+    high = values[min(n_boot - 1, int((1 - tail) * n_boot))]
+    return stat(_mean(current), _mean(baseline)), low, high
+
+
+def _ratio(c: float, b: float) -> float:
+    return c / b if b else float("inf")
+
+
+def bootstrap_ratio_ci(
+    current: list[float], baseline: list[float], confidence: float, n_boot: int = 2000
+) -> tuple[float, float, float]:
+    """(ratio of means, CI low, CI high) for mean(current) / mean(baseline)."""
+    return _bootstrap(current, baseline, _ratio, confidence, n_boot)
+
+
+def bootstrap_diff_ci(
+    current: list[float], baseline: list[float], confidence: float, n_boot: int = 2000
+) -> tuple[float, float, float]:
+    """(difference of means, CI low, CI high) for mean(current) - mean(baseline)."""
+    return _bootstrap(current, baseline, lambda c, b: c - b, confidence, n_boot)
+
+
+def _verdict(n_baseline: int, worse_low, worse_high, effect_ok: bool, better_ok: bool) -> str:
+    if n_baseline < 2:
+        return "insufficient_samples"  # a zero-width bootstrap CI proves nothing
+    if worse_low > 0 and effect_ok:
+        return "regression"
+    if worse_high < 0 and better_ok:
+        return "improvement"
+    return "no_change"
+
+
+def assess(
+    metric: str,
+    direction: str,
+    current: list[float],
+    baseline: list[float],
+    confidence: float,
+    min_effect: float,
+) -> dict:
+    """Compare two sample sets: regression / improvement / no_change / insufficient_samples.
+
+    With a zero mean on either side (e.g. `failed: 0`) a ratio is meaningless, so the
+    change and its CI are reported as an absolute difference (`change_abs`) instead.
+    """
+    current_mean, baseline_mean = _mean(current), _mean(baseline)
+    row = {
+        "metric": metric,
+        "direction": direction,
+        "current_mean": round(current_mean, 6),
+        "baseline_mean": round(baseline_mean, 6),
+        "n": [len(current), len(baseline)],
+    }
+    if current_mean == 0 or baseline_mean == 0:
+        diff, low, high = bootstrap_diff_ci(current, baseline, confidence)
+        # "How much worse" as a signed difference: > 0 is worse for both directions
+        worse_low, worse_high = (low, high) if direction == "lower" else (-high, -low)
+        verdict = _verdict(len(baseline), worse_low, worse_high, True, True)
+        return {
+            **row,
+            "change_abs": round(diff, 6),
+            "ci": [round(low, 6), round(high, 6)],
+            "verdict": verdict,
+        }
+
+    ratio, low, high = bootstrap_ratio_ci(current, baseline, confidence)
+    # Express everything as "how much worse": >1 means worse for both directions
+    if direction == "lower":
+        worse, worse_low, worse_high = ratio, low, high
+    else:
+        inverse = [1 / x if x else float("inf") for x in (ratio, high, low)]
+        worse, worse_low, worse_high = inverse
+    verdict = _verdict(
+        len(baseline),
+        worse_low - 1,
+        worse_high - 1,
+        worse - 1 >= min_effect,
+        1 - worse >= min_effect,
+    )
+    return {
+        **row,
+        "change_pct": round(100 * (ratio - 1), 2),
+        "ci": [round(100 * (low - 1), 2), round(100 * (high - 1), 2)],
+        "verdict": verdict,
+    }
+
+
+class HistoryStore:
+    """SQLite-backed benchmark history."""
+
+    def __init__(self, path: str = DEFAULT_DB):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def record(
+        self,
+        benchmark: str,
+        metrics: dict,
+        compute: dict | None = None,
+        directions: dict | None = None,
+        env: dict | None = None,
+        git: tuple | None = None,
+    ) -> int:
+        """Store one run; metric values may be numbers or lists of samples. Returns run id."""
+        env = env or environment()
+        commit, dirty = git or git_state(os.path.dirname(os.path.abspath(__file__)))
+        with self.db:
+            run_id = self.db.execute(
+                "INSERT INTO runs (benchmark, created_at, git_commit, git_dirty, compute,"
+                " env_fingerprint, env) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    benchmark,
+                    time.time(),
+                    commit,
+                    None if dirty is None else int(dirty),
+                    json.dumps(compute or {}, sort_keys=True),
+                    fingerprint(env),
+                    json.dumps(env, sort_keys=True),
+                ),
+            ).lastrowid
+            for metric, values in metrics.items():
+                values = values if isinstance(values, list) else [values]
+                direction = (directions or {}).get(metric) or infer_direction(metric)
+                self.db.executemany(
+                    "INSERT INTO samples (run_id, metric, value, direction) VALUES (?, ?, ?, ?)",
+                    [(run_id, metric, float(v), direction) for v in values],
+                )
+        return run_id
+
+    def run(self, run_id: int) -> dict:
+        row = self.db.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No run with id {run_id}")
+        return dict(row)
+
+    def samples(self, run_ids: list[int]) -> dict[str, tuple[str, list[float]]]:
+        """{metric: (direction, values)} pooled over the given runs."""
+        marks = ",".join("?" * len(run_ids))
+        out = {}
+        for row in self.db.execute(
+            f"SELECT metric, value, direction FROM samples WHERE run_id IN ({marks})", run_ids
+        ):
+            out.setdefault(row["metric"], (row["direction"], []))[1].append(row["value"])
+        return out
+
+    def runs(self, benchmark: str | None = None, limit: int = 50) -> list[dict]:
+        query = "SELECT * FROM runs"
+        args = ()
+        if benchmark:
+            query, args = query + " WHERE benchmark = ?", (benchmark,)
+        rows = self.db.execute(query + " ORDER BY id DESC LIMIT ?", (*args, limit))
+        return [dict(r) for r in rows]
+
+    def baseline_runs(self, run_id: int, baseline_runs: int = 5) -> list[int]:
+        """Previous runs of the same benchmark on the same compute and environment."""
+        run = self.run(run_id)
+        rows = self.db.execute(
+            "SELECT id FROM runs WHERE benchmark = ? AND compute = ? AND env_fingerprint = ?"
+            " AND id < ? ORDER BY id DESC LIMIT ?",
+            (run["benchmark"], run["compute"], run["env_fingerprint"], run_id, baseline_runs),
+        )
+        return [r["id"] for r in rows]
+
+    def check(
+        self,
+        run_id: int,
+        confidence: float = 0.95,
+        min_effect: float = 0.05,
+        baseline_runs: int = 5,
+    ) -> list[dict]:
+        """Assess every metric of a run against its baseline."""
+        base_ids = self.baseline_runs(run_id, baseline_runs)
+        if not base_ids:
+            return []
+        baseline = self.samples(base_ids)
+        return [
+            assess(metric, direction, values, baseline[metric][1], confidence, min_effect)
+            for metric, (direction, values) in self.samples([run_id]).items()
+            if metric in baseline
+        ]
+
+    def compare(
+        self, run_a: int, run_b: int, confidence: float = 0.95, min_effect: float = 0.05
+    ) -> list[dict]:
+        """Assess run_b against run_a (run_a is the baseline)."""
+        a, b = self.samples([run_a]), self.samples([run_b])
+        return [
+            assess(metric, direction, values, a[metric][1], confidence, min_effect)
+            for metric, (direction, values) in b.items()
+            if metric in a
+        ]
+
+
+def print_assessment(rows: list[dict]):
+    if not rows:
+        print("  (no comparable metrics / no baseline)")
+    for r in rows:
+        flag = {
+            "regression": "REGRESSION",
+            "improvement": "improved",
+            "no_change": "ok",
+            "insufficient_samples": "too few samples",
+        }
+        if "change_abs" in r:
+            change = f" {r['change_abs']:>+8.4g} CI[{r['ci'][0]:+.4g}, {r['ci'][1]:+.4g}]"
+        else:
+            change = f" {r['change_pct']:>+7.2f}% CI[{r['ci'][0]:+.1f}%, {r['ci'][1]:+.1f}%]"
+        print(
+            f"  {r['metric']:<24} {r['baseline_mean']:>12.4g} -> {r['current_mean']:<12.4g}"
+            f"{change}"
+            f"  n={r['n'][0]}/{r['n'][1]} ({r['direction']} is better)"
+            f"  {flag[r['verdict']]}"
+        )
+
+
+def run_demo(store: HistoryStore) -> list[dict]:
+    """Six runs of a synthetic benchmark; the last one is 15% slower on warm latency."""
+    rng = random.Random(42)
+    spec = {"cpus": "0.1"}
+    env = environment()
+    run_id = None
+    for i in range(6):
+        slowdown = 1.15 if i == 5 else 1.0
+        run_id = store.record(
+            "synthetic_timing",
+            {
+                "warm_call_s": [rng.gauss(0.120, 0.006) * slowdown for _ in range(10)],
+                "cold_start_s": [rng.gauss(45.0, 4.0) for _ in range(3)],
+                "calls_per_s": [rng.gauss(80.0, 3.0) for _ in range(10)],
+            },
+            compute=spec,
+            env=env,
+        )
+    return store.check(run_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark history and regression checks")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--record", nargs=2, metavar=("BENCHMARK", "JSON"))
+    parser.add_argument("--compute", default="{}", help="Compute spec JSON for --record")
+    parser.add_argument("--list", nargs="?", const="", metavar="BENCHMARK")
+    parser.add_argument("--compare", nargs=2, type=int, metavar=("BASE_RUN", "RUN"))
+    parser.add_argument("--check", type=int, metavar="RUN")
+    parser.add_argument("--demo", action="store_true", help="Synthetic history + check")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--min-effect", type=float, default=0.05, help="Ignore smaller changes")
+    parser.add_argument("--baseline-runs", type=int, default=5)
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    if args.record:
+        name, payload = args.record
+        if os.path.exists(payload):
+            with open(payload) as f:
+                metrics = json.load(f)
+        else:
+            metrics = json.loads(payload)
+        numeric = {k: v for k, v in metrics.items() if isinstance(v, int | float | list)}
+        run_id = store.record(name, numeric, compute=json.loads(args.compute))
+        print(f"Recorded run {run_id} ({name}): {sorted(numeric)}")
+        print_assessment(store.check(run_id, args.confidence, args.min_effect, args.baseline_runs))
+    elif args.list is not None:
+        for r in store.runs(args.list or None):
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["created_at"]))
+            commit = (r["git_commit"] or "-")[:8] + ("+" if r["git_dirty"] else "")
+            print(f"  {r['id']:>4}  {when}  {r['benchmark']:<24} {commit:<10} {r['compute']}")
+    elif args.compare:
+        print(f"Run {args.compare[1]} vs run {args.compare[0]}:")
+        print_assessment(store.compare(*args.compare, args.confidence, args.min_effect))
+    elif args.check is not None:
+        print(f"Run {args.check} vs its baseline:")
+        print_assessment(
+            store.check(args.check, args.confidence, args.min_effect, args.baseline_runs)
+        )
+    elif args.demo:
+        print("Synthetic history (last run has a 15% warm-call slowdown):")
+        print_assessment(run_demo(store))
+    else:
+        parser.print_help()
@@ -0,0 +1,291 @@
+"""Demo: Per-call resource accounting for remote functions.
+
+Remote functions like `run_opora_gpu` time themselves ad hoc and return the numbers
+inside their result. `@accounted` does this uniformly on the pod, for a sample of
+calls:
+- Wall time, process CPU time (user + system, all threads)
+- Peak RSS during the call (the kernel's high-water mark is reset per call via
+  /proc/self/clear_refs; where that isn't allowed, the process-lifetime peak)
+- Argument and result payload sizes (JSON bytes, as sent by default)
+- Peak GPU memory allocated/reserved, if torch is already in use with CUDA
+- On demand: the top tracemalloc allocation sites
+
+The decorated function returns an envelope, `{"__kt_accounting__": meta, "result": r}`;
+on the client `AccountedFunction` unwraps it, so callers get the plain result and the
+metadata is kept on `.last` / `.history`. Calls that aren't sampled carry `meta=None`
+and cost a random() draw. Passing `accounting=True` (or `tracemalloc_top=N`) forces one.
+
+Example:
+    # Local: measured overhead per call at different sample rates
+    python demos/advanced/call_accounting.py --bench
+
+    # Remote: account a function's calls on a pod (1% sampled, plus forced calls)
+    python demos/advanced/call_accounting.py
+"""
+
+import argparse
+import collections
+import functools
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+import kubetorch as kt
+
+MARKER = "__kt_accounting__"
+# Measuring a call JSON-encodes its args and result (~80us on a tiny call), so only a
+# sample is measured by default
+DEFAULT_SAMPLE_RATE = 0.01
+
+
+def _payload_bytes(value) -> int | None:
+    try:
+        return len(json.dumps(value))
+    except (TypeError, ValueError):
+        return None  # not JSON-serializable (would need pickle serialization)
+
+
+def _rss_kb(field: str) -> int | None:
+    """VmRSS / VmHWM (peak) from /proc/self/status, in KB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's RSS high-water mark (Linux >= 4.0); False if not permitted."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _gpu_reset():
+    torch = sys.modules.get("torch")  # don't import torch just to account a call
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+        return torch
+    return None
+
+
+# tracemalloc is process-wide: started for the first tracing call if the user hadn't
+# already, stopped after the last one (and never if the user started it)
+_trace_lock = threading.Lock()
+_trace = {"users": 0, "started_here": False}
+
+
+def _trace_start():
+    with _trace_lock:
+        if _trace["users"] == 0:
+            _trace["started_here"] = not tracemalloc.is_tracing()
+            if _trace["started_here"]:
+                tracemalloc.start()
+        _trace["users"] += 1
+
+
+def _trace_stop():
+    with _trace_lock:
+        _trace["users"] -= 1
+        if _trace["users"] == 0 and _trace["started_here"]:
+            tracemalloc.stop()
+
+
+def measure(fn, args, kwargs, tracemalloc_top: int = 0):
+    """Run fn once and return (result, accounting dict)."""
+    torch = _gpu_reset()
+    peak_reset = _reset_peak_rss()
+    rss_before = _rss_kb("VmRSS")
+    if tracemalloc_top:
+        _trace_start()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        snapshot = tracemalloc.take_snapshot() if tracemalloc_top else None
+        if tracemalloc_top:
+            _trace_stop()
+
+    peak_kb = _rss_kb("VmHWM") if peak_reset else None
+    if peak_kb is None:  # ru_maxrss is KB on Linux; lifetime peak of the process
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    meta = {
+        "pid": os.getpid(),
+        "wall_s": round(wall, 6),
+        "cpu_s": round(cpu, 6),
+        "cpu_util": round(cpu / wall, 2) if wall else None,
+        "rss_before_mb": round(rss_before / 1024, 1) if rss_before else None,
+        "rss_peak_mb": round(peak_kb / 1024, 1),
+        "rss_peak_scope": "call" if peak_reset else "process",
+        "args_bytes": _payload_bytes([list(args), kwargs]),
+        "result_bytes": _payload_bytes(result),
+    }
+    if torch is not None:
+        meta["gpu_peak_allocated_mb"] = round(torch.cuda.max_memory_allocated() / 1024**2, 1)
+        meta["gpu_peak_reserved_mb"] = round(torch.cuda.max_memory_reserved() / 1024**2, 1)
+    if snapshot is not None:
+        meta["top_allocations"] = [
+            {
+                "where": str(stat.traceback),
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[:tracemalloc_top]
+        ]
+    return result, meta
+
+
+def accounted(fn=None, *, sample_rate: float | None = None):
+    """Decorator (pod side): measure a sample of calls; returns an envelope.
+
+    `sample_rate` defaults to $KT_ACCOUNTING_SAMPLE_RATE, else DEFAULT_SAMPLE_RATE (1%).
+    The first call is always measured. Callers can force accounting with kt_accounting={"force": True}.
+    """
+
+    def decorate(f):
+        rate = sample_rate
+        if rate is None:
+            rate = float(os.environ.get("KT_ACCOUNTING_SAMPLE_RATE", DEFAULT_SAMPLE_RATE))
+        calls = itertools.count(1)  # next() is atomic, so concurrent calls aren't lost
+
+        @functools.wraps(f)
+        def wrapper(*args, kt_accounting: dict | None = None, **kwargs):
+            index = next(calls)
+            options = kt_accounting or {}
+            if options.get("force") or index == 1 or random.random() < rate:
+                result, meta = measure(f, args, kwargs, options.get("tracemalloc_top", 0))
+                meta["call_index"] = index
+                meta["sample_rate"] = rate
+            else:
+                result, meta = f(*args, **kwargs), None
+            return {MARKER: meta, "result": result}
+
+        return wrapper
+
+    return decorate(fn) if fn is not None else decorate
+
+
+def unwrap(value) -> tuple:
+    """(result, accounting or None) from an envelope; plain values pass through."""
+    if isinstance(value, dict) and MARKER in value:
+        return value["result"], value[MARKER]
+    return value, None
+
+
+class AccountedFunction:
+    """Client side: call an `@accounted` function (remote or local), keep its metadata."""
+
+    def __init__(self, fn, max_history: int = 1000):
+        self.fn = fn
+        self.history = collections.deque(maxlen=max_history)
+        self.last: dict | None = None
+
+    def __call__(self, *args, accounting: bool = False, tracemalloc_top: int = 0, **kwargs):
+        if accounting or tracemalloc_top:
+            kwargs["kt_accounting"] = {"force": True, "tracemalloc_top": tracemalloc_top}
+        start = time.perf_counter()
+        result, meta = unwrap(self.fn(*args, **kwargs))
+        if meta is not None:
+            meta["client_round_trip_s"] = round(time.perf_counter() - start, 6)
+            self.history.append(meta)
+        self.last = meta
+        return result
+
+    def summary(self) -> dict:
+        """Median / max over the accounted calls so far."""
+        if not self.history:
+            return {"accounted_calls": 0}
+
+        def stats(key):
+            values = sorted(m[key] for m in self.history if m.get(key) is not None)
+            return {"p50": values[len(values) // 2], "max": values[-1]} if values else None
+
+        keys = [
+            "wall_s",
+            "cpu_s",
+            "rss_peak_mb",
+            "args_bytes",
+            "result_bytes",
+            "client_round_trip_s",
+        ]
+        keys += [k for k in ("gpu_peak_allocated_mb",) if k in self.history[-1]]
+        return {"accounted_calls": len(self.history), **{k: stats(k) for k in keys}}
+
+
+@accounted
+def build_array(n_mb: int = 64, reduce: bool = True):
+    """Allocate ~n_mb of float64, do some work, return a small result."""
+    import numpy as np
+
+    data = np.random.default_rng(0).random(n_mb * 1024**2 // 8)
+    total = float(np.sort(data)[-10:].sum())
+    return {"total": total} if reduce else {"values": data[:10_000].tolist()}
+
+
+def _noop_work(n: int = 2000) -> int:
+    return sum(range(n))
+
+
+def run_overhead_bench(calls: int = 5000) -> dict:
+    """Per-call cost of the wrapper at several sample rates vs the bare function."""
+    results = {}
+    start = time.perf_counter()
+    for _ in range(calls):
+        _noop_work()
+    bare = (time.perf_counter() - start) / calls
+    results["bare_us"] = round(bare * 1e6, 2)
+
+    for rate in (0.0, 0.01, 0.1, 1.0):
+        fn = AccountedFunction(accounted(_noop_work, sample_rate=rate))
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        per_call = (time.perf_counter() - start) / calls
+        results[f"rate_{rate}_overhead_us"] = round((per_call - bare) * 1e6, 2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-call resource accounting")
+    parser.add_argument("--bench", action="store_true", help="Local overhead benchmark")
+    parser.add_argument("--local", action="store_true", help="Run the demo calls locally")
+    args = parser.parse_args()
+
+    if args.bench:
+        print("Wrapper overhead per call (local):")
+        for k, v in run_overhead_bench().items():
+            print(f"  {k}: {v}")
+        raise SystemExit(0)
+
+    if args.local:
+        fn = AccountedFunction(build_array)
+    else:
+        compute = kt.Compute(
+            cpus="1", memory="2Gi", image=kt.images.Python311().pip_install(["numpy"])
+        )
+        fn = AccountedFunction(kt.fn(build_array, name="advanced_accounting").to(compute))
+
+    for n_mb in (16, 64, 256):
+        result = fn(n_mb, accounting=True)
+        print(f"build_array({n_mb}) -> {result}")
+        print(f"  {json.dumps(fn.last)}")
+    fn(32, reduce=False, tracemalloc_top=3)
+    print("Top allocations (32MB, full result):")
+    for alloc in fn.last["top_allocations"]:
+        print(f"  {alloc}")
+    print(f"Summary: {json.dumps(fn.summary(), indent=2)}")
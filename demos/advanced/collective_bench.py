@@ -0,0 +1,326 @@
+"""Demo: Collective-communication benchmark (nccl-tests style).
+
+Sweeps all_reduce, all_gather, broadcast and reduce_scatter over a range of
+message sizes and dtypes, and reports algorithm bandwidth, bus bandwidth and
+latency percentiles per size as JSON - the same quantities nccl-tests prints
+(see `demos/sunk/Dockerfile.pxs`, which builds on the nccl-tests image).
+
+Uses gloo on CPU and nccl on GPU nodes; the benchmark code is identical.
+
+Example:
+    # Locally, 2 processes on CPU (gloo)
+    python demos/advanced/collective_bench.py --local 2 -e 16M
+
+    # On the cluster via .distribute()
+    python demos/advanced/collective_bench.py --workers 2 -b 1K -e 1G
+"""
+
+import argparse
+import json
+import math
+import os
+import socket
+
+import kubetorch as kt
+
+OPS = ["all_reduce", "all_gather", "broadcast", "reduce_scatter"]
+DTYPES = ["float32"]
+
+# Bus bandwidth correction factors, as defined by nccl-tests (doc/PERFORMANCE.md).
+# busbw = algbw * factor, so that busbw is comparable to the link's peak bandwidth.
+BUSBW_FACTOR = {
+    "all_reduce": lambda n: 2 * (n - 1) / n,
+    "all_gather": lambda n: (n - 1) / n,
+    "broadcast": lambda n: 1.0,
+    "reduce_scatter": lambda n: (n - 1) / n,
+}
+
+
+def parse_size(text: str) -> int:
+    """Parse sizes like "1K", "16M" or "1G" (powers of 1024) into bytes."""
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def size_sweep(min_bytes: int, max_bytes: int, factor: int = 2) -> list[int]:
+    """Geometric sweep of message sizes, like nccl-tests' -b/-e/-f flags."""
+    sizes = []
+    size = min_bytes
+    while size <= max_bytes:
+        sizes.append(size)
+        size *= factor
+    return sizes
+
+
+def run_collective_bench(
+    sizes: list[int],
+    dtypes: list[str] = DTYPES,
+    ops: list[str] = OPS,
+    warmup: int = 5,
+    iters: int = 20,
+) -> dict:
+    """Benchmark collectives on every rank; returns the same report on all ranks."""
+    import torch
+    import torch.distributed as dist
+
+    rank = int(os.environ["RANK"])
+    world_size = int(os.environ["WORLD_SIZE"])
+
+    # nccl on GPU nodes (B200 via SUNK), gloo everywhere else
+    use_cuda = torch.cuda.is_available()
+    backend = "nccl" if use_cuda else "gloo"
+    if use_cuda:
+        local_rank = int(os.environ.get("LOCAL_RANK", 0))
+        torch.cuda.set_device(local_rank)
+        device = torch.device("cuda", local_rank)
+    else:
+        device = torch.device("cpu")
+
+    dist.init_process_group(backend=backend, rank=rank, world_size=world_size)
+
+    def sync():
+        if use_cuda:
+            torch.cuda.synchronize()
+
+    results = []
+    for op in ops:
+        for dtype_name in dtypes:
+            for size in sizes:
+                results.append(
+                    _bench_size(op, dtype_name, size, device, world_size, warmup, iters, sync)
+                )
+            if rank == 0:
+                print(f"[Rank 0] {op} {dtype_name}: {len(sizes)} sizes done")
+
+    dist.destroy_process_group()
+
+    return {
+        "backend": backend,
+        "world_size": world_size,
+        "rank": rank,
+        "host": socket.gethostname(),
+        "device": torch.cuda.get_device_name(device) if use_cuda else "cpu",
+        "warmup": warmup,
+        "iters": iters,
+        "results": results,
+    }
+
+
+def _bench_size(
+    op: str, dtype_name: str, size: int, device, world_size: int, warmup: int, iters: int, sync
+) -> dict:
+    """Time one op/dtype/size on every rank; all ranks return the same result or error."""
+    import torch
+    import torch.distributed as dist
+
+    dtype = getattr(torch, dtype_name)
+    itemsize = torch.tensor([], dtype=dtype).element_size()
+    numel = max(size // itemsize, 1)
+
+    # Every rank agrees on failure after setup (e.g. OOM on one rank, no collective issued
+    # yet) and after timing (e.g. an op/dtype the backend doesn't implement), so all ranks
+    # take the same collective path
+    error = None
+    try:
+        call, numel = _make_collective(op, numel, dtype, device, world_size)
+    except RuntimeError as e:
+        error = str(e)
+    if not _any_rank_failed(error, device):
+        try:
+            times = _time_collective(call, warmup, iters, sync)
+        except RuntimeError as e:
+            error = str(e)
+        if not _any_rank_failed(error, device):
+            # A collective is only as fast as its slowest rank
+            t = torch.tensor(times, dtype=torch.float64, device=device)
+            dist.all_reduce(t, op=dist.ReduceOp.MAX)
+            return _summarize(op, dtype_name, numel, itemsize, t.cpu().tolist(), world_size)
+    return {"op": op, "type": dtype_name, "size": size, "error": error or "failed on another rank"}
+
+
+def _any_rank_failed(error: str | None, device) -> bool:
+    """All-reduce a failure flag: True on every rank if any rank hit an error."""
+    import torch
+    import torch.distributed as dist
+
+    failed = torch.tensor([error is not None], dtype=torch.int32, device=device)
+    dist.all_reduce(failed, op=dist.ReduceOp.MAX)
+    return bool(failed.item())
+
+
+def _make_collective(op: str, numel: int, dtype, device, world_size: int):
+    """Allocate buffers once; return a closure running one collective and the total numel."""
+    import torch
+    import torch.distributed as dist
+
+    if op == "all_reduce":
+        buf = torch.ones(numel, dtype=dtype, device=device)
+        return (lambda: dist.all_reduce(buf)), numel
+    if op == "broadcast":
+        buf = torch.ones(numel, dtype=dtype, device=device)
+        return (lambda: dist.broadcast(buf, src=0)), numel
+    # nccl-tests reports all_gather/reduce_scatter size as the *total* buffer,
+    # so each rank contributes numel // world_size elements.
+    chunk = max(numel // world_size, 1)
+    if op == "all_gather":
+        inp = torch.ones(chunk, dtype=dtype, device=device)
+        out = torch.empty(chunk * world_size, dtype=dtype, device=device)
+        return (lambda: dist.all_gather_into_tensor(out, inp)), chunk * world_size
+    if op == "reduce_scatter":
+        inp = torch.ones(chunk * world_size, dtype=dtype, device=device)
+        out = torch.empty(chunk, dtype=dtype, device=device)
+        return (lambda: dist.reduce_scatter_tensor(out, inp)), chunk * world_size
+    raise ValueError(f"Unknown op: {op}")
+
+
+def _time_collective(call, warmup: int, iters: int, sync) -> list[float]:
+    """Per-iteration wall times (s), with ranks aligned by a barrier before each call."""
+    import time
+
+    import torch.distributed as dist
+
+    for _ in range(warmup):
+        call()
+    sync()
+
+    times = []
+    for _ in range(iters):
+        dist.barrier()
+        sync()
+        start = time.perf_counter()
+        call()
+        sync()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _summarize(
+    op: str, dtype_name: str, numel: int, itemsize: int, times: list[float], world_size: int
+) -> dict:
+    """One nccl-tests style result row, plus latency percentiles."""
+    times = sorted(times)
+    nbytes = numel * itemsize
+    avg = sum(times) / len(times)
+    algbw = nbytes / avg / 1e9  # GB/s, as nccl-tests reports
+    return {
+        "op": op,
+        "type": dtype_name,
+        "size": nbytes,
+        "count": numel,
+        "time_us": round(avg * 1e6, 2),
+        "algbw_GBps": round(algbw, 3),
+        "busbw_GBps": round(algbw * BUSBW_FACTOR[op](world_size), 3),
+        "p50_us": round(_percentile(times, 50) * 1e6, 2),
+        "p90_us": round(_percentile(times, 90) * 1e6, 2),
+        "p99_us": round(_percentile(times, 99) * 1e6, 2),
+    }
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    rank = math.ceil(pct * len(sorted_values) / 100)  # smallest rank covering pct%
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+def _free_port() -> int:
+    """An unused local TCP port, so concurrent local runs don't share a store."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _local_worker(rank: int, world_size: int, port: int, kwargs: dict, queue):
+    """Entry point for one locally spawned rank (mimics the env .distribute() sets)."""
+    os.environ.update(
+        {
+            "RANK": str(rank),
+            "LOCAL_RANK": str(rank),
+            "WORLD_SIZE": str(world_size),
+            "MASTER_ADDR": "127.0.0.1",
+            "MASTER_PORT": str(port),
+        }
+    )
+    report = run_collective_bench(**kwargs)
+    if rank == 0:
+        queue.put(report)
+
+
+def run_local(world_size: int, **kwargs) -> dict:
+    """Run the benchmark with `world_size` local processes (gloo on CPU)."""
+    import torch.multiprocessing as mp
+
+    ctx = mp.get_context("spawn")
+    queue = ctx.SimpleQueue()
+    args = (world_size, _free_port(), kwargs, queue)
+    mp.spawn(_local_worker, args=args, nprocs=world_size, join=True)
+    return queue.get()
+
+
+def print_table(report: dict):
+    """Print a compact nccl-tests-like table."""
+    print(
+        f"\n# backend={report['backend']} world_size={report['world_size']} device={report['device']}"
+    )
+    print(
+        f"# {'op':>14} {'type':>8} {'size(B)':>12} {'time(us)':>10} {'algbw':>8} {'busbw':>8} {'p99(us)':>10}"
+    )
+    for r in report["results"]:
+        if "error" in r:
+            print(f"  {r['op']:>14} {r['type']:>8} {r['size']:>12}  unsupported: {r['error'][:40]}")
+            continue
+        print(
+            f"  {r['op']:>14} {r['type']:>8} {r['size']:>12} {r['time_us']:>10.1f} "
+            f"{r['algbw_GBps']:>8.3f} {r['busbw_GBps']:>8.3f} {r['p99_us']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--local", type=int, metavar="N", help="Run N local gloo processes")
+    parser.add_argument("--workers", type=int, default=2, help="Pods for .distribute()")
+    parser.add_argument("-b", "--min-bytes", default="1K")
+    parser.add_argument("-e", "--max-bytes", default="1G")
+    parser.add_argument("-f", "--step-factor", type=int, default=2)
+    parser.add_argument(
+        "-d", "--dtypes", default=",".join(DTYPES), help="Comma-separated torch dtypes"
+    )
+    parser.add_argument("-o", "--ops", default=",".join(OPS))
+    parser.add_argument("-w", "--warmup", type=int, default=5)
+    parser.add_argument("-n", "--iters", type=int, default=20)
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    bench_kwargs = {
+        "sizes": size_sweep(
+            parse_size(args.min_bytes), parse_size(args.max_bytes), args.step_factor
+        ),
+        "dtypes": args.dtypes.split(","),
+        "ops": args.ops.split(","),
+        "warmup": args.warmup,
+        "iters": args.iters,
+    }
+
+    if args.local:
+        print(f"Running collective benchmark locally with {args.local} processes (gloo)...")
+        report = run_local(args.local, **bench_kwargs)
+    else:
+        image = kt.images.Python311().pip_install(["torch"])
+        compute = kt.Compute(cpus="1", memory="4Gi", image=image, launch_timeout=120)
+        compute.distribute(framework="pytorch", workers=args.workers)
+
+        print(f"Deploying {args.workers} workers for collective benchmark...")
+        remote_fn = kt.fn(run_collective_bench, name="advanced_collectives").to(compute)
+        # Every rank returns the same (max-reduced) report; keep rank 0's
+        reports = remote_fn(**bench_kwargs)
+        report = next(r for r in reports if r["rank"] == 0)
+
+    print_table(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+    else:
+        print("\n" + json.dumps(report["results"][:3], indent=2) + "\n  ...")
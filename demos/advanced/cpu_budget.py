@@ -0,0 +1,214 @@
+"""Demo: cgroup-aware thread and worker sizing for remote PyTorch/NumPy code.
+
+Inside a pod `os.cpu_count()` is the whole node (see `check_resources`), so torch,
+OpenMP/MKL/OpenBLAS and DataLoader size their thread pools for e.g. 128 cores while
+`kt.Compute(cpus="2")` gives us two. The threads then fight over the quota and
+get CFS-throttled.
+
+`configure_threads()` derives the real CPU budget from the cgroup quota and the
+affinity mask (`pod_profiler.effective_cpus`) and, before user code runs:
+- Sets OMP/MKL/OpenBLAS/... thread env vars (for libraries not yet loaded)
+- Calls `torch.set_num_threads` / `set_num_interop_threads` if torch is available
+- Returns a recommended DataLoader `num_workers` (and a worker_init_fn)
+
+Overrides: pass `cpus=`, or set `KT_CPU_BUDGET`; thread env vars that are already
+set (e.g. via `Image.set_env_vars`) are left alone, and an explicit OMP_NUM_THREADS
+also sizes torch's thread pool. `@sized` applies it to a remote function on its
+first call.
+
+Example:
+    # Local benchmark: 1 allowed core, default (node-sized) threads vs sized threads
+    python demos/advanced/cpu_budget.py --bench --cpus 1 --node-cpus 16
+
+    # On a cpus="2" pod
+    python demos/advanced/cpu_budget.py
+"""
+
+import argparse
+import functools
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+import kubetorch as kt
+
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+_configured: dict | None = None
+_configured_cpus: float | None = None
+_env_set_here: set[str] = set()  # vars we set (re-sized on a new budget), not the user's
+
+
+def cpu_budget(cpus: float | None = None) -> int:
+    """Whole CPUs to size pools for: explicit > KT_CPU_BUDGET > cgroup quota/affinity."""
+    if cpus is None and os.environ.get("KT_CPU_BUDGET"):
+        cpus = float(os.environ["KT_CPU_BUDGET"])
+    if cpus is None:
+        from pod_profiler import effective_cpus
+
+        cpus = effective_cpus()
+    # A 2.5-core quota sustains 2 busy threads without throttling
+    return max(1, math.floor(cpus))
+
+
+def configure_threads(cpus: float | None = None, force: bool = False) -> dict:
+    """Size thread pools to the CPU budget; idempotent for the same `cpus` unless `force`.
+
+    Thread env vars the user already set are kept (unless `force`), and an explicit
+    OMP_NUM_THREADS also sets torch's intra-op thread count.
+    """
+    global _configured, _configured_cpus
+    if _configured is not None and not force and (cpus is None or cpus == _configured_cpus):
+        return _configured
+
+    budget = cpu_budget(cpus)
+    env = {}
+    for var in THREAD_ENV_VARS:
+        if force or var not in os.environ or var in _env_set_here:
+            os.environ[var] = str(budget)
+            _env_set_here.add(var)
+        env[var] = os.environ[var]
+
+    torch_threads = None
+    try:
+        import torch
+
+        try:
+            intra = max(1, int(env["OMP_NUM_THREADS"]))
+        except ValueError:
+            intra = budget
+        torch.set_num_threads(intra)
+        try:
+            torch.set_num_interop_threads(max(1, budget // 2))
+        except RuntimeError:
+            pass  # can only be set before the first parallel op; keep the default
+        torch_threads = torch.get_num_threads()
+    except ImportError:
+        pass
+
+    _configured_cpus = cpus
+    _configured = {
+        "node_cpu_count": os.cpu_count(),
+        "cpu_budget": budget,
+        "torch_threads": torch_threads,
+        "user_thread_env": sorted(set(THREAD_ENV_VARS) - _env_set_here),
+        "thread_env": env,
+        "dataloader_num_workers": recommended_num_workers(budget),
+    }
+    return _configured
+
+
+def recommended_num_workers(budget: int) -> int:
+    """DataLoader workers: leave one core for the training process, 0 if we only have one."""
+    return budget - 1 if budget > 1 else 0
+
+
+def worker_init_fn(worker_id: int):
+    """DataLoader worker_init_fn: each worker process gets a single compute thread."""
+    import torch
+
+    torch.set_num_threads(1)
+
+
+def sized(fn=None, *, cpus: float | None = None):
+    """Decorator: configure thread pools before the wrapped (remote) function first runs."""
+
+    def decorate(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            configure_threads(cpus)
+            return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorate(fn) if fn is not None else decorate
+
+
+@sized
+def show_budget() -> dict:
+    """What the pod sees vs what we configured."""
+    import torch
+
+    return {**configure_threads(), "torch_threads_now": torch.get_num_threads()}
+
+
+def _bench_worker(threads: int, seconds: float) -> dict:
+    """Matmul throughput with `threads` torch threads (runs in a restricted subprocess)."""
+    import torch
+
+    torch.set_num_threads(threads)
+    a = torch.randn(256, 256)
+    b = torch.randn(256, 256)
+    for _ in range(5):
+        a @ b
+    n = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        a @ b
+        n += 1
+    elapsed = time.perf_counter() - start
+    return {"threads": threads, "matmuls_per_s": round(n / elapsed, 1)}
+
+
+def run_affinity_bench(cpus: int, node_cpus: int, seconds: float = 3.0) -> dict:
+    """Compare node-sized threads against budget-sized threads under a CPU-affinity limit.
+
+    `node_cpus` emulates what `os.cpu_count()` reports on a big node inside a pod;
+    the subprocesses are pinned to `cpus` cores to emulate the container's quota.
+    """
+    allowed = sorted(os.sched_getaffinity(0))[:cpus]
+    results = {}
+    for label, threads in [("default (node-sized)", node_cpus), ("sized", cpu_budget(cpus))]:
+        code = (
+            "import json, os, sys; "
+            f"os.sched_setaffinity(0, {set(allowed)!r}); "
+            "from cpu_budget import _bench_worker; "
+            f"print(json.dumps(_bench_worker({threads}, {seconds})))"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results[label] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    default, tuned = results["default (node-sized)"], results["sized"]
+    return {
+        "allowed_cpus": len(allowed),
+        "emulated_node_cpus": node_cpus,
+        **{
+            f"{k} matmuls/s (threads={v['threads']})": v["matmuls_per_s"]
+            for k, v in results.items()
+        },
+        "speedup": round(tuned["matmuls_per_s"] / default["matmuls_per_s"], 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="cgroup-aware thread sizing")
+    parser.add_argument("--bench", action="store_true", help="Run the local affinity benchmark")
+    parser.add_argument("--cpus", type=int, default=1, help="Cores to pin the benchmark to")
+    parser.add_argument("--node-cpus", type=int, default=16, help="Emulated node core count")
+    args = parser.parse_args()
+
+    if args.bench:
+        print(f"Benchmark: pinned to {args.cpus} core(s), node reports {args.node_cpus}...")
+        for k, v in run_affinity_bench(args.cpus, args.node_cpus).items():
+            print(f"  {k}: {v}")
+    else:
+        image = kt.images.Python311().pip_install(["torch"])
+        compute = kt.Compute(cpus="2", memory="4Gi", image=image, launch_timeout=120)
+        remote_fn = kt.fn(show_budget, name="advanced_cpu_budget").to(compute)
+        print(json.dumps(remote_fn(), indent=2))
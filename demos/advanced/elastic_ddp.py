@@ -0,0 +1,354 @@
+"""Demo: Elastic, failure-tolerant DDP workers.
+
+SUNK pods can be preempted (`terminationGracePeriodSeconds: 5`), and with plain
+`.distribute()` one lost worker kills the whole run. Here every pod runs a
+torchelastic agent instead of the training function directly:
+- Surviving workers see the lost peer (their collective fails), and the agents
+  re-rendezvous at a smaller or replaced world size within [min_nodes, max_nodes]
+- Training resumes from the latest checkpoint in `state_dir`. Use /dev/shm for an
+  in-memory copy that survives worker restarts, or the PVC to survive pod loss.
+- Rank 0 records rendezvous/recovery time and lost work for every restart
+
+Example:
+    # Locally: 3 single-process "nodes"; SIGKILL one mid-run -> world shrinks 3 -> 2
+    python demos/advanced/elastic_ddp.py --local 3 --kill node
+
+    # Locally: 1 node with 3 workers; SIGKILL one worker -> it is replaced
+    python demos/advanced/elastic_ddp.py --local 3 --kill worker
+
+    # On the cluster: 3 pods, keep going with as few as 2
+    python demos/advanced/elastic_ddp.py --workers 3 --min-workers 2
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import kubetorch as kt
+
+RDZV_PORT = 29400
+
+
+def _append_jsonl(path: str, record: dict):
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def _read_jsonl(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _read_json(path: str) -> dict | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_json_atomic(path: str, data: dict):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def save_checkpoint(state_dir: str, step: int, model, optimizer):
+    """Write the checkpoint to a temp file and atomically rename it into place."""
+    import torch
+
+    path = os.path.join(state_dir, "checkpoint.pt")
+    tmp = f"{path}.tmp"
+    torch.save(
+        {"step": step, "model": model.state_dict(), "optimizer": optimizer.state_dict()}, tmp
+    )
+    os.replace(tmp, path)
+
+
+def load_checkpoint(state_dir: str, model, optimizer) -> int:
+    """Restore model/optimizer from the latest checkpoint; returns the step to resume at."""
+    import torch
+
+    path = os.path.join(state_dir, "checkpoint.pt")
+    if not os.path.exists(path):
+        return 0
+    ckpt = torch.load(path, weights_only=True)
+    model.load_state_dict(ckpt["model"])
+    optimizer.load_state_dict(ckpt["optimizer"])
+    return ckpt["step"]
+
+
+def _record_recovery(state_dir: str, world_size: int, resumed_step: int, ready_time: float):
+    """On rank 0: log how long re-formation took and how much work was lost."""
+    events_path = os.path.join(state_dir, "events.jsonl")
+    events = _read_jsonl(events_path)
+    last_ready = events[-1]["ready_time"] if events else 0.0
+    failures = [
+        f for f in _read_jsonl(os.path.join(state_dir, "failures.jsonl")) if f["time"] > last_ready
+    ]
+    progress = _read_json(os.path.join(state_dir, "progress.json")) or {"step": 0, "step_s": 0.0}
+    lost_steps = max(progress["step"] - resumed_step, 0)
+
+    event = {
+        "restart": int(os.environ.get("TORCHELASTIC_RESTART_COUNT", 0)),
+        "world_size": world_size,
+        "resumed_from_step": resumed_step,
+        "ready_time": ready_time,
+    }
+    if failures:
+        event["recovery_s"] = round(ready_time - min(f["time"] for f in failures), 2)
+        event["lost_steps"] = lost_steps
+        event["lost_work_s"] = round(lost_steps * progress["step_s"], 2)
+    _append_jsonl(events_path, event)
+    print(f"[Rank 0] group formed: {event}")
+
+
+def elastic_worker(state_dir: str, total_steps: int, ckpt_every: int, step_time: float):
+    """Training loop run by each worker; restarted by the agent after a failure."""
+    from datetime import timedelta
+
+    import torch
+    import torch.distributed as dist
+    from torch.nn.parallel import DistributedDataParallel
+
+    rank = int(os.environ["RANK"])
+    world_size = int(os.environ["WORLD_SIZE"])
+    with open(os.path.join(state_dir, "pids", f"rank{rank}.pid"), "w") as f:
+        f.write(str(os.getpid()))
+
+    # Env (MASTER_ADDR/PORT, RANK, WORLD_SIZE) comes from the elastic agent's rendezvous
+    dist.init_process_group(backend="gloo", timeout=timedelta(seconds=60))
+
+    torch.manual_seed(0)
+    model = torch.nn.Linear(16, 1)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01)
+    step = load_checkpoint(state_dir, model, optimizer)
+    ddp = DistributedDataParallel(model)
+    dist.barrier()
+    if rank == 0:
+        _record_recovery(state_dir, world_size, step, time.time())
+
+    step_start = time.time()
+    try:
+        while step < total_steps:
+            gen = torch.Generator().manual_seed(step * 1000 + rank)
+            x = torch.randn(32, 16, generator=gen)
+            loss = torch.nn.functional.mse_loss(ddp(x), x.sum(dim=1, keepdim=True))
+            optimizer.zero_grad()
+            loss.backward()  # all-reduce: raises here if a peer has gone away
+            optimizer.step()
+            time.sleep(step_time)  # stand-in for real compute
+            step += 1
+
+            if rank == 0:
+                step_s = time.time() - step_start
+                step_start = time.time()
+                _write_json_atomic(
+                    os.path.join(state_dir, "progress.json"), {"step": step, "step_s": step_s}
+                )
+                if step % ckpt_every == 0:
+                    save_checkpoint(state_dir, step, model, optimizer)
+    except RuntimeError as e:
+        _append_jsonl(
+            os.path.join(state_dir, "failures.jsonl"),
+            {"time": time.time(), "rank": rank, "step": step, "error": str(e)[:200]},
+        )
+        raise
+
+    dist.destroy_process_group()
+    if rank != 0:
+        return None
+    events = _read_jsonl(os.path.join(state_dir, "events.jsonl"))
+    return {
+        "final_step": step,
+        "final_world_size": world_size,
+        "restarts": len(events) - 1,
+        "events": events,
+        "total_recovery_s": round(sum(e.get("recovery_s", 0) for e in events), 2),
+        "total_lost_steps": sum(e.get("lost_steps", 0) for e in events),
+    }
+
+
+def run_elastic_agent(
+    state_dir: str,
+    min_nodes: int,
+    max_nodes: int,
+    nproc_per_node: int = 1,
+    rdzv_endpoint: str | None = None,
+    is_host: bool | None = None,
+    total_steps: int = 200,
+    ckpt_every: int = 20,
+    step_time: float = 0.05,
+    max_restarts: int = 3,
+    run_id: str = "elastic-ddp",
+) -> dict | None:
+    """Run a torchelastic agent on this node; returns rank 0's summary if it lives here."""
+    from torch.distributed.launcher.api import LaunchConfig, elastic_launch
+
+    os.makedirs(os.path.join(state_dir, "pids"), exist_ok=True)
+    if rdzv_endpoint is None:
+        # Under .distribute(), the head pod hosts the rendezvous store
+        rdzv_endpoint = f"{os.environ['MASTER_ADDR']}:{RDZV_PORT}"
+
+    rdzv_configs = {"join_timeout": 120, "last_call_timeout": 2, "close_timeout": 10}
+    if is_host is not None:
+        rdzv_configs["is_host"] = is_host
+
+    config = LaunchConfig(
+        min_nodes=min_nodes,
+        max_nodes=max_nodes,
+        nproc_per_node=nproc_per_node,
+        run_id=run_id,
+        rdzv_backend="c10d",
+        rdzv_endpoint=rdzv_endpoint,
+        rdzv_configs=rdzv_configs,
+        max_restarts=max_restarts,
+        monitor_interval=0.5,
+    )
+    results = elastic_launch(config, elastic_worker)(state_dir, total_steps, ckpt_every, step_time)
+    return next((r for r in results.values() if r), None)
+
+
+def _kill_after(delay: float, state_dir: str, kill: str, agents: list):
+    """Local failure injection: SIGKILL a worker, or a whole non-host "node" (agent + workers)."""
+    # Count the delay from the first training step, not from process start-up
+    while not os.path.exists(os.path.join(state_dir, "progress.json")):
+        time.sleep(0.1)
+    time.sleep(delay)
+    if kill == "node":
+        victim = agents[-1]
+        print(f"\n💥 Killing node (agent pid {victim.pid} and its workers)\n")
+        _append_jsonl(os.path.join(state_dir, "failures.jsonl"), {"time": time.time(), "rank": -1})
+        os.killpg(victim.pid, signal.SIGKILL)
+        return
+    # Highest rank: rank10.pid sorts before rank9.pid as a string
+    pid_file = max(
+        os.listdir(os.path.join(state_dir, "pids")),
+        key=lambda f: int(f.removeprefix("rank").removesuffix(".pid")),
+    )
+    with open(os.path.join(state_dir, "pids", pid_file)) as f:
+        pid = int(f.read())
+    print(f"\n💥 Killing worker {pid_file} (pid {pid})\n")
+    _append_jsonl(os.path.join(state_dir, "failures.jsonl"), {"time": time.time(), "rank": -1})
+    os.kill(pid, signal.SIGKILL)
+
+
+def run_local(n: int, kill: str, kill_after: float, total_steps: int) -> dict:
+    """Run locally, either as n single-worker nodes or one node with n workers."""
+    state_dir = tempfile.mkdtemp(prefix="elastic_ddp_", dir="/dev/shm")
+    print(f"State dir (in-memory tmpfs): {state_dir}")
+    endpoint = f"127.0.0.1:{RDZV_PORT}"
+    agents = []
+    try:
+        if kill == "worker":
+            threading.Thread(
+                target=_kill_after, args=(kill_after, state_dir, kill, []), daemon=True
+            ).start()
+            return run_elastic_agent(
+                state_dir, 1, 1, nproc_per_node=n, rdzv_endpoint=endpoint, total_steps=total_steps
+            )
+
+        # One agent process per "node"; node 0 hosts the rendezvous store and is never killed
+        for i in range(n):
+            cmd = [sys.executable, __file__, "--agent", state_dir, "--endpoint", endpoint]
+            cmd += ["--min-workers", str(max(n - 1, 1)), "--workers", str(n)]
+            cmd += ["--steps", str(total_steps)]
+            cmd += ["--is-host"] if i == 0 else []
+            agents.append(subprocess.Popen(cmd, start_new_session=True))
+            time.sleep(0.5)  # let the host bind the store first
+        threading.Thread(
+            target=_kill_after, args=(kill_after, state_dir, kill, agents), daemon=True
+        ).start()
+        for agent in agents:
+            agent.wait()
+        return _read_json(os.path.join(state_dir, "summary.json"))
+    finally:
+        for agent in agents:  # interrupted: don't leave agents writing to a removed dir
+            if agent.poll() is None:
+                os.killpg(agent.pid, signal.SIGKILL)
+        shutil.rmtree(state_dir, ignore_errors=True)  # /dev/shm is RAM
+
+
+def print_report(summary: dict):
+    print("\n" + "=" * 60)
+    print("ELASTIC RUN REPORT")
+    print("=" * 60)
+    for event in summary["events"]:
+        print(
+            f"  restart={event['restart']} world_size={event['world_size']} "
+            f"resumed_from={event['resumed_from_step']} recovery_s={event.get('recovery_s', '-')} "
+            f"lost_steps={event.get('lost_steps', '-')} lost_work_s={event.get('lost_work_s', '-')}"
+        )
+    print(
+        f"\n  Finished at step {summary['final_step']} with world size {summary['final_world_size']}"
+    )
+    print(f"  Total recovery time: {summary['total_recovery_s']}s")
+    print(f"  Total lost steps: {summary['total_lost_steps']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Elastic, failure-tolerant DDP workers")
+    parser.add_argument("--local", type=int, metavar="N", help="Run N workers locally")
+    parser.add_argument("--kill", choices=["worker", "node"], default="node")
+    parser.add_argument(
+        "--kill-after", type=float, default=3.0, help="Seconds of training before the failure"
+    )
+    parser.add_argument("--workers", type=int, default=3, help="Max workers (pods)")
+    parser.add_argument("--min-workers", type=int, default=2)
+    parser.add_argument("--steps", type=int, default=200)
+    # Internal: run a single local agent (used by --local N --kill node)
+    parser.add_argument("--agent", metavar="STATE_DIR", help=argparse.SUPPRESS)
+    parser.add_argument("--endpoint", help=argparse.SUPPRESS)
+    parser.add_argument("--is-host", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.agent:
+        summary = run_elastic_agent(
+            args.agent,
+            args.min_workers,
+            args.workers,
+            rdzv_endpoint=args.endpoint,
+            is_host=args.is_host,
+            total_steps=args.steps,
+        )
+        if summary:
+            _write_json_atomic(os.path.join(args.agent, "summary.json"), summary)
+    elif args.local:
+        summary = run_local(args.local, args.kill, args.kill_after, total_steps=args.steps)
+        if summary is None:
+            sys.exit("Run failed: no summary from rank 0 (max restarts exceeded?)")
+        print_report(summary)
+    else:
+        vol = kt.Volume.from_name(
+            name="slurm-data", namespace="tenant-slurm", mount_path="/mnt/data"
+        )
+        image = kt.images.Python311().pip_install(["torch"])
+        compute = kt.Compute(
+            cpus="1",
+            memory="2Gi",
+            image=image,
+            namespace="tenant-slurm",
+            volumes=[vol],
+            launch_timeout=120,
+        )
+        compute.distribute(framework="pytorch", workers=args.workers)
+
+        print(f"Deploying {args.workers} elastic agents (min {args.min_workers})...")
+        remote_fn = kt.fn(run_elastic_agent, name="advanced_elastic").to(compute)
+        results = remote_fn(
+            f"/mnt/data/elastic_ddp/{int(time.time())}",  # on the PVC: survives pod loss
+            args.min_workers,
+            args.workers,
+            total_steps=args.steps,
+        )
+        print_report(next(r for r in results if r))
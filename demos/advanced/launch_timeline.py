@@ -0,0 +1,414 @@
+"""Demo: Per-phase span timeline for deploys and calls.
+
+When `kt.fn(...).to(compute)` takes minutes, the total alone doesn't say where the
+time went. `trace_deploy()` records a span for each phase of the deploy by wrapping
+Kubetorch's internal steps while it runs:
+- `image_setup`: image steps -> Dockerfile (attrs: image steps, pip installs)
+- `rsync`: each upload of project code to the data store (attrs: files, bytes)
+- `submit`: creating/updating the service
+- `schedule_and_start`: waiting for pods (scheduling, image pull, container start)
+- `server_ready`: waiting for the HTTP server (setup script, pip installs, imports)
+`add_pod_phases()` then splits pod start-up into scheduling / image pull /
+container start using the pods' own condition timestamps, and `traced_call()`
+records calls (e.g. the first call after a deploy).
+
+Timelines save as JSON, export as OTLP/JSON (any OpenTelemetry collector or viewer
+accepts it), and `--summarize` prints them as a tree. The hooks are a plain table,
+so a fake backend with known phase durations can stand in for the cluster.
+
+Example:
+    # Fake backend with known phase durations (no cluster)
+    python demos/advanced/launch_timeline.py --fake --out /tmp/trace.json
+
+    # Trace a real deploy + first call, then summarise
+    python demos/advanced/launch_timeline.py --out trace.json --otlp-out trace.otlp.json
+    python demos/advanced/launch_timeline.py --summarize trace.json
+"""
+
+import argparse
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import time
+import types
+import urllib.request
+import uuid
+from datetime import datetime
+
+import kubetorch as kt
+
+_parent = contextvars.ContextVar("launch_timeline_parent", default=None)
+
+
+class Timeline:
+    """Ordered spans: {name, span_id, parent_id, start, end, attrs} (epoch seconds)."""
+
+    def __init__(self, name: str, trace_id: str | None = None):
+        self.name = name
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.spans: list[dict] = []
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attrs):
+        """Time the enclosed block; yields the span so attrs can be added inside it."""
+        span = {
+            "name": name,
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": _parent.get(),
+            "start": time.time(),
+            "end": None,
+            "attrs": attrs,
+        }
+        self.spans.append(span)
+        token = _parent.set(span["span_id"])
+        try:
+            yield span
+        except BaseException as e:
+            span["attrs"]["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _parent.reset(token)
+            span["end"] = time.time()
+
+    def add_span(self, name: str, start: float, end: float, parent_id: str | None = None, **attrs):
+        """Record a span measured elsewhere (e.g. from pod condition timestamps)."""
+        span = {
+            "name": name,
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": parent_id,
+            "start": start,
+            "end": end,
+            "attrs": attrs,
+        }
+        self.spans.append(span)
+        return span
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "trace_id": self.trace_id, "spans": self.spans}
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def to_otlp(self, service_name: str = "kubetorch-client") -> dict:
+        """OTLP/JSON `ExportTraceServiceRequest` body."""
+
+        def attr(key, value):
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        spans = [
+            {
+                "traceId": self.trace_id,
+                "spanId": s["span_id"],
+                "parentSpanId": s["parent_id"] or "",
+                "name": s["name"],
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(int(s["start"] * 1e9)),
+                "endTimeUnixNano": str(int(s["end"] * 1e9)),
+                "attributes": [attr(k, v) for k, v in s["attrs"].items()],
+                "status": {"code": 2 if "error" in s["attrs"] else 1},
+            }
+            for s in self.spans
+        ]
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [attr("service.name", service_name)]},
+                    "scopeSpans": [{"scope": {"name": "launch_timeline"}, "spans": spans}],
+                }
+            ]
+        }
+
+    def export_otlp(self, endpoint: str):
+        """POST to an OTLP/HTTP collector, e.g. http://localhost:4318."""
+        request = urllib.request.Request(
+            endpoint.rstrip("/") + "/v1/traces",
+            data=json.dumps(self.to_otlp()).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        urllib.request.urlopen(request, timeout=10).close()
+
+
+def _path_bytes(source) -> tuple[int, int]:
+    """(files, bytes) under a path or list of paths."""
+    files = size = 0
+    for path in [source] if isinstance(source, str) else source:
+        if os.path.isfile(path):
+            files, size = files + 1, size + os.path.getsize(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs[:] = [d for d in dirs if d not in (".git", "__pycache__")]
+            for n in names:
+                with contextlib.suppress(OSError):
+                    size += os.path.getsize(os.path.join(root, n))
+                    files += 1
+    return files, size
+
+
+def _image_attrs(module, args, kwargs) -> dict:
+    lines = getattr(module.compute.image, "_dockerfile_contents", None) or []
+    run_lines = [line for line in lines if line.startswith("RUN")]
+    return {
+        "image_steps": len(lines),
+        "pip_installs": sum("pip" in line or "PIP_INSTALL" in line for line in run_lines),
+    }
+
+
+def _rsync_attrs(client, args, kwargs) -> dict:
+    source = kwargs.get("source", args[0] if args else None)
+    files, size = _path_bytes(source) if source else (0, 0)
+    return {"source": str(source), "files": files, "bytes": size}
+
+
+def kubetorch_hooks() -> list[tuple]:
+    """(class, method, span name, attrs_fn) for each deploy phase in Kubetorch."""
+    from kubetorch.data_store.rsync_client import RsyncClient
+    from kubetorch.resources.callables.module import Module
+    from kubetorch.resources.compute.compute import Compute
+
+    return [
+        (Module, "_get_service_dockerfile", "image_setup", _image_attrs),
+        (RsyncClient, "upload", "rsync", _rsync_attrs),
+        (Compute, "_launch", "submit", None),
+        (Compute, "_check_service_ready", "schedule_and_start", None),
+        (Module, "_wait_for_http_health", "server_ready", None),
+    ]
+
+
+@contextlib.contextmanager
+def trace_deploy(timeline: Timeline, name: str = "deploy", hooks: list[tuple] | None = None):
+    """Record a span per phase for everything deployed inside the block."""
+    hooks = kubetorch_hooks() if hooks is None else hooks
+    originals = []
+    for cls, method, span_name, attrs_fn in hooks:
+        original = getattr(cls, method)
+        originals.append((cls, method, original))
+
+        def wrapper(self, *args, _original=original, _span=span_name, _attrs=attrs_fn, **kwargs):
+            attrs = _attrs(self, args, kwargs) if _attrs else {}
+            with timeline.span(_span, **attrs):
+                return _original(self, *args, **kwargs)
+
+        functools.update_wrapper(wrapper, original)
+        setattr(cls, method, wrapper)
+    try:
+        with timeline.span(name):
+            yield timeline
+    finally:
+        for cls, method, original in originals:
+            setattr(cls, method, original)
+
+
+def traced_call(timeline: Timeline, fn, *args, name: str = "call", **kwargs):
+    """Call `fn` inside a span (attrs: request payload bytes as JSON)."""
+    payload = len(json.dumps([args, kwargs], default=str))
+    with timeline.span(name, payload_bytes=payload):
+        return fn(*args, **kwargs)
+
+
+def _ts(value: str | None) -> float | None:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() if value else None
+
+
+def add_pod_phases(timeline: Timeline, service_name: str, namespace: str):
+    """Split pod start-up using condition timestamps (second resolution) of each pod."""
+    from kubetorch.globals import controller_client
+
+    deploy = next((s for s in timeline.spans if s["name"] == "deploy"), None)
+    pods = controller_client().list_pods(
+        namespace=namespace, label_selector=f"kubetorch.com/service={service_name}"
+    )
+    for pod in pods.get("items", []):
+        status = pod.get("status", {})
+        conditions = {
+            c["type"]: _ts(c.get("lastTransitionTime")) for c in status.get("conditions", [])
+        }
+        started = [
+            _ts(s.get("state", {}).get("running", {}).get("startedAt"))
+            for s in status.get("containerStatuses", [])
+        ]
+        created = _ts(pod["metadata"].get("creationTimestamp"))
+        marks = [
+            ("pod_scheduling", created, conditions.get("PodScheduled")),
+            (
+                "pod_image_pull_and_init",
+                conditions.get("PodScheduled"),
+                min(filter(None, started), default=None),
+            ),
+            (
+                "pod_container_to_ready",
+                min(filter(None, started), default=None),
+                conditions.get("Ready"),
+            ),
+        ]
+        for name, start, end in marks:
+            if start and end:
+                parent_id = deploy["span_id"] if deploy else None
+                timeline.add_span(name, start, end, parent_id, pod=pod["metadata"]["name"])
+
+
+def summarize(trace: dict):
+    """Print spans as a tree with durations and share of the trace's total time."""
+    spans = trace["spans"]
+    children = {}
+    for s in spans:
+        children.setdefault(s["parent_id"], []).append(s)
+    t0 = min(s["start"] for s in spans)
+    total = max(s["end"] for s in spans) - t0
+
+    print(f"Trace: {trace['name']} ({trace['trace_id']}), total {total:.2f}s")
+    print(f"{'phase':<36}{'start':>9}{'duration':>10}{'share':>8}  attrs")
+
+    def show(span, depth):
+        duration = span["end"] - span["start"]
+        attrs = " ".join(f"{k}={_fmt(k, v)}" for k, v in span["attrs"].items())
+        label = "  " * depth + span["name"]
+        print(
+            f"{label:<36}{span['start'] - t0:>8.2f}s{duration:>9.2f}s"
+            f"{100 * duration / total if total else 0:>7.1f}%  {attrs}"
+        )
+        for child in sorted(children.get(span["span_id"], []), key=lambda s: s["start"]):
+            show(child, depth + 1)
+
+    for root in sorted(children.get(None, []), key=lambda s: s["start"]):
+        show(root, 0)
+
+
+def _fmt(key, value):
+    if key.endswith("bytes") and isinstance(value, int):
+        if value >= 1024**2:
+            return f"{value / 1024**2:.2f}MB"
+        return f"{value / 1024:.1f}KB" if value >= 1024 else f"{value}B"
+    return value
+
+
+# Fake backend: same method names as Kubetorch, each sleeping a known duration
+FAKE_PHASES = {
+    "image_setup": 0.05,  # own time, excluding the nested rsync
+    "rsync": 0.15,
+    "submit": 0.05,
+    "schedule_and_start": 0.4,
+    "server_ready": 0.2,
+    "call": 0.03,
+}
+
+
+class FakeRsyncClient:
+    def upload(self, source, dest):
+        time.sleep(FAKE_PHASES["rsync"])
+
+
+class FakeCompute:
+    image = types.SimpleNamespace(
+        _dockerfile_contents=["FROM python:3.11", "RUN $KT_PIP_INSTALL_CMD torch"]
+    )
+
+    def _launch(self):
+        time.sleep(FAKE_PHASES["submit"])
+
+    def _check_service_ready(self):
+        time.sleep(FAKE_PHASES["schedule_and_start"])
+
+
+class FakeModule:
+    def __init__(self):
+        self.compute = FakeCompute()
+
+    def _get_service_dockerfile(self):
+        time.sleep(FAKE_PHASES["image_setup"])
+        FakeRsyncClient().upload(source=os.path.dirname(os.path.abspath(__file__)), dest="svc/")
+
+    def _wait_for_http_health(self):
+        time.sleep(FAKE_PHASES["server_ready"])
+
+    def to(self):
+        """Same order as Kubetorch's `_launch_service`."""
+        self._get_service_dockerfile()
+        self.compute._launch()
+        self.compute._check_service_ready()
+        self._wait_for_http_health()
+        return self
+
+    def __call__(self):
+        time.sleep(FAKE_PHASES["call"])
+        return "ok"
+
+
+def fake_hooks() -> list[tuple]:
+    return [
+        (FakeModule, "_get_service_dockerfile", "image_setup", _image_attrs),
+        (FakeRsyncClient, "upload", "rsync", _rsync_attrs),
+        (FakeCompute, "_launch", "submit", None),
+        (FakeCompute, "_check_service_ready", "schedule_and_start", None),
+        (FakeModule, "_wait_for_http_health", "server_ready", None),
+    ]
+
+
+def run_fake(tolerance_s: float = 0.05) -> Timeline:
+    """Trace a fake deploy + call and check each span against the known durations."""
+    timeline = Timeline("fake deploy")
+    with trace_deploy(timeline, hooks=fake_hooks()):
+        remote = FakeModule().to()
+    traced_call(timeline, remote, name="call")
+
+    durations = {s["name"]: s["end"] - s["start"] for s in timeline.spans}
+    expected = dict(FAKE_PHASES, image_setup=FAKE_PHASES["image_setup"] + FAKE_PHASES["rsync"])
+    for name, want in expected.items():
+        assert abs(durations[name] - want) < tolerance_s, (
+            f"{name}: {durations[name]:.3f}s != {want}s"
+        )
+    parents = {s["span_id"]: s["name"] for s in timeline.spans}
+    rsync = next(s for s in timeline.spans if s["name"] == "rsync")
+    assert parents[rsync["parent_id"]] == "image_setup", "rsync should nest under image_setup"
+    return timeline
+
+
+def get_time():
+    import datetime
+
+    return f"Called at {datetime.datetime.now()}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-phase deploy/call timelines")
+    parser.add_argument("--fake", action="store_true", help="Use the fake backend")
+    parser.add_argument("--summarize", metavar="JSON", help="Summarise a saved timeline")
+    parser.add_argument("--out", help="Save the timeline as JSON")
+    parser.add_argument("--otlp-out", help="Save the timeline as OTLP/JSON")
+    parser.add_argument("--otlp-endpoint", help="Also POST to an OTLP/HTTP collector")
+    args = parser.parse_args()
+
+    if args.summarize:
+        with open(args.summarize) as f:
+            summarize(json.load(f))
+        raise SystemExit(0)
+
+    if args.fake:
+        timeline = run_fake()
+        print("Fake backend: all phases match their known durations\n")
+    else:
+        timeline = Timeline("deploy advanced_launch_timeline")
+        compute = kt.Compute(cpus="0.1", launch_timeout=300)
+        with trace_deploy(timeline):
+            remote_fn = kt.fn(get_time, name="advanced_launch_timeline").to(compute)
+        with contextlib.suppress(Exception):  # pod phases are best-effort
+            add_pod_phases(timeline, remote_fn.service_name, compute.namespace)
+        traced_call(timeline, remote_fn, name="first_call")
+        traced_call(timeline, remote_fn, name="second_call")
+
+    summarize(timeline.to_dict())
+    if args.out:
+        timeline.save(args.out)
+    if args.otlp_out:
+        with open(args.otlp_out, "w") as f:
+            json.dump(timeline.to_otlp(), f, indent=2)
+    if args.otlp_endpoint:
+        timeline.export_otlp(args.otlp_endpoint)
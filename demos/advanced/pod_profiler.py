@@ -0,0 +1,297 @@
+"""Demo: Pod capability profiler.
+
+`check_resources` in `resource_requests.py` reports node-level values (`os.cpu_count()`,
+overlay disk size). This profiler measures what the *container* actually gets:
+- cgroup v1/v2 CPU quota and memory limit, plus the CPU affinity mask
+- Sequential write/read and 4K random-read throughput on `/` (overlay), `/dev/shm`
+  and any mounted PVCs
+- Memory copy bandwidth
+- Single- vs multi-core compute throughput (effective cores under the quota)
+
+Reports are plain dicts, so runs on different node classes can be saved and compared
+to size `cpus`, `memory`, `shared_memory_limit` and `disk_size` from data.
+
+Example:
+    # Profile this machine
+    python demos/advanced/pod_profiler.py --local --out local.json
+
+    # Profile a CPU pod and a B200 pod (via SUNK), then compare
+    python demos/advanced/pod_profiler.py --classes cpu,b200 --out profiles.json
+    python demos/advanced/pod_profiler.py --compare profiles.json
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import tempfile
+import time
+
+import kubetorch as kt
+
+# Filesystem types that indicate a network/PVC mount rather than the container overlay
+PVC_FS_TYPES = ("nfs", "nfs4", "ceph", "cephfs", "lustre", "fuse", "virtiofs", "vast")
+
+
+def _read(path: str) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_limits() -> dict:
+    """CPU quota (in cores) and memory limit from cgroup v2 or v1; None means unlimited."""
+    limits = {"cgroup_version": None, "cpu_quota_cores": None, "memory_limit_bytes": None}
+
+    cpu_max = _read("/sys/fs/cgroup/cpu.max")  # v2: "<quota> <period>" or "max <period>"
+    if cpu_max is not None:
+        limits["cgroup_version"] = 2
+        quota, period = cpu_max.split()
+        if quota != "max":
+            limits["cpu_quota_cores"] = int(quota) / int(period)
+        mem = _read("/sys/fs/cgroup/memory.max")
+        if mem and mem != "max":
+            limits["memory_limit_bytes"] = int(mem)
+        return limits
+
+    quota = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")  # v1: -1 means unlimited
+    if quota is not None:
+        limits["cgroup_version"] = 1
+        period = _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if int(quota) > 0 and period:
+            limits["cpu_quota_cores"] = int(quota) / int(period)
+        mem = _read("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+        # v1 reports "unlimited" as a huge page-aligned number
+        if mem and int(mem) < 2**60:
+            limits["memory_limit_bytes"] = int(mem)
+    return limits
+
+
+def effective_cpus() -> float:
+    """CPUs this process can really use: min(cgroup quota, affinity mask)."""
+    affinity = len(os.sched_getaffinity(0))
+    quota = cgroup_limits()["cpu_quota_cores"]
+    return min(quota, affinity) if quota else float(affinity)
+
+
+def pvc_mounts() -> list[str]:
+    """Mount points that look like PVCs (network filesystems, or anything under /mnt)."""
+    mounts = []
+    for line in (_read("/proc/mounts") or "").splitlines():
+        _, mount_point, fs_type, *_ = line.split()
+        if fs_type.startswith(PVC_FS_TYPES) or mount_point.startswith("/mnt/"):
+            if os.access(mount_point, os.W_OK):
+                mounts.append(mount_point)
+    return mounts
+
+
+def _drop_cache(fd: int):
+    """Best-effort page-cache eviction so reads hit the device (no root needed)."""
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def disk_throughput(path: str, size_mb: int = 256, random_reads: int = 2000) -> dict:
+    """Sequential write (with fsync), sequential read and 4K random-read throughput."""
+    block = os.urandom(1024 * 1024)
+    fd, tmp = tempfile.mkstemp(dir=path, prefix=".pod_profiler_")
+    try:
+        start = time.perf_counter()
+        for _ in range(size_mb):
+            os.write(fd, block)
+        os.fsync(fd)
+        write_s = time.perf_counter() - start
+
+        _drop_cache(fd)
+        start = time.perf_counter()
+        offset = 0
+        while chunk := os.pread(fd, len(block), offset):
+            offset += len(chunk)
+        read_s = time.perf_counter() - start
+
+        _drop_cache(fd)
+        n_pages = size_mb * 256
+        start = time.perf_counter()
+        for _ in range(random_reads):
+            os.pread(fd, 4096, random.randrange(n_pages) * 4096)
+        rand_s = time.perf_counter() - start
+    finally:
+        os.close(fd)
+        os.unlink(tmp)
+
+    return {
+        "seq_write_MBps": round(size_mb / write_s, 1),
+        "seq_read_MBps": round(size_mb / read_s, 1),
+        "rand_read_4k_iops": round(random_reads / rand_s),
+        "rand_read_4k_MBps": round(random_reads * 4096 / rand_s / 1e6, 2),
+    }
+
+
+def memory_bandwidth(size_mb: int = 256, repeats: int = 5) -> dict:
+    """memcpy bandwidth (read + write bytes) from copying one large buffer into another."""
+    src = bytearray(os.urandom(1024 * 1024)) * size_mb
+    dst = bytearray(len(src))
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        dst[:] = src
+        best = min(best, time.perf_counter() - start)
+    return {"memcpy_GBps": round(2 * len(src) / best / 1e9, 2)}
+
+
+def _spin(n: int) -> float:
+    """Fixed amount of pure-Python work; returns its duration."""
+    start = time.perf_counter()
+    acc = 0
+    for i in range(n):
+        acc += i * i
+    return time.perf_counter() - start
+
+
+def compute_throughput(n: int = 5_000_000, processes: int | None = None) -> dict:
+    """Ops/s on one core vs one process per usable core; the ratio shows the cores you get.
+
+    Sized from `effective_cpus()` (rounded up, so a fractional quota's throttling shows),
+    not `os.cpu_count()`, which would oversubscribe a small pod on a large node.
+    """
+    import math
+    from concurrent.futures import ProcessPoolExecutor
+
+    processes = processes or max(1, math.ceil(effective_cpus()))
+    single = n / _spin(n)
+    with ProcessPoolExecutor(processes) as pool:
+        # Start every worker before timing, so process start-up isn't counted as compute
+        list(pool.map(_spin, [1] * processes))
+        start = time.perf_counter()
+        list(pool.map(_spin, [n] * processes))
+        multi = processes * n / (time.perf_counter() - start)
+    return {
+        "single_core_Mops": round(single / 1e6, 1),
+        "multi_core_Mops": round(multi / 1e6, 1),
+        "processes": processes,
+        "effective_cores": round(multi / single, 2),
+    }
+
+
+def profile_pod(size_mb: int = 256, extra_paths: list[str] | None = None) -> dict:
+    """Full capability report for the current container."""
+    import shutil
+
+    report = {
+        "host": socket.gethostname(),
+        "cpu_count_node": os.cpu_count(),
+        "cpu_affinity": len(os.sched_getaffinity(0)),
+        **cgroup_limits(),
+        "effective_cpus": effective_cpus(),
+        "memory": memory_bandwidth(size_mb),
+        "compute": compute_throughput(),
+        "storage": {},
+    }
+    # "/" may not be writable; /tmp lives on the same overlay
+    paths = {"/ (overlay)": "/tmp", "/dev/shm": "/dev/shm"}
+    paths.update({p: p for p in pvc_mounts() + (extra_paths or [])})
+    for label, path in paths.items():
+        total, _, free = shutil.disk_usage(path)
+        entry = {"size_gb": round(total / 1024**3, 2)}
+        # Don't fill a small /dev/shm (e.g. shared_memory_limit="1Gi") or disk
+        size = min(size_mb, int(free / 1024**2 / 4))
+        entry.update(disk_throughput(path, size) if size >= 16 else {"skipped": "too small"})
+        report["storage"][label] = entry
+    return report
+
+
+COMPARE_ROWS = [
+    ("effective_cpus", lambda r: r["effective_cpus"]),
+    ("memory limit (GiB)", lambda r: round((r["memory_limit_bytes"] or 0) / 1024**3, 1) or "-"),
+    ("memcpy GB/s", lambda r: r["memory"]["memcpy_GBps"]),
+    ("single-core Mops", lambda r: r["compute"]["single_core_Mops"]),
+    ("effective cores", lambda r: r["compute"]["effective_cores"]),
+]
+
+
+def compare_reports(reports: dict[str, dict]):
+    """Print reports from several node classes side by side."""
+    names = list(reports)
+    print(f"{'':<28}" + "".join(f"{n:>16}" for n in names))
+    for label, get in COMPARE_ROWS:
+        print(f"{label:<28}" + "".join(f"{get(reports[n])!s:>16}" for n in names))
+    paths = sorted({p for r in reports.values() for p in r["storage"]})
+    for path in paths:
+        for metric in ("seq_write_MBps", "seq_read_MBps", "rand_read_4k_iops"):
+            values = [reports[n]["storage"].get(path, {}).get(metric, "-") for n in names]
+            print(f"{path[:14] + ' ' + metric:<28}" + "".join(f"{v!s:>16}" for v in values))
+
+
+def node_class_compute(name: str):
+    """Compute for each node class we size against."""
+    if name == "cpu":
+        return kt.Compute(
+            cpus="2", memory="4Gi", disk_size="10Gi", shared_memory_limit="1Gi", launch_timeout=120
+        )
+    if name == "b200":
+        return kt.Compute(
+            cpus="16",
+            memory="128Gi",
+            gpus="1",
+            shared_memory_limit="16Gi",
+            node_selector={"gpu.nvidia.com/class": "B200"},
+            namespace="tenant-slurm",
+            launch_timeout=600,
+            annotations={
+                "sunk.coreweave.com/account": "root",
+                "sunk.coreweave.com/comment": "Pod capability profile",
+                "sunk.coreweave.com/exclusive": "user",
+            },
+            tolerations=[{"key": "nvidia.com/gpu", "operator": "Exists", "effect": "NoSchedule"}],
+            service_template={
+                "spec": {
+                    "template": {
+                        "spec": {
+                            "schedulerName": "tenant-slurm-slurm-scheduler",
+                            "terminationGracePeriodSeconds": 5,
+                        }
+                    }
+                }
+            },
+        )
+    raise ValueError(f"Unknown node class: {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile pod CPU/memory/disk capabilities")
+    parser.add_argument("--local", action="store_true", help="Profile this machine")
+    parser.add_argument("--classes", default="cpu", help="Node classes to profile (cpu,b200)")
+    parser.add_argument("--size-mb", type=int, default=256, help="Test file/buffer size")
+    parser.add_argument("--out", help="Save reports as JSON")
+    parser.add_argument("--compare", nargs="+", metavar="JSON", help="Compare saved reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = {}
+        for path in args.compare:
+            with open(path) as f:
+                reports.update(json.load(f))
+        compare_reports(reports)
+        raise SystemExit(0)
+
+    if args.local:
+        reports = {"local": profile_pod(args.size_mb)}
+    else:
+        reports = {}
+        for name in args.classes.split(","):
+            print(f"Profiling node class '{name}'...")
+            remote_fn = kt.fn(profile_pod, name=f"advanced_profile_{name}").to(
+                node_class_compute(name)
+            )
+            reports[name] = remote_fn(args.size_mb)
+
+    print(json.dumps(reports, indent=2))
+    print()
+    compare_reports(reports)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\nSaved to {args.out}")
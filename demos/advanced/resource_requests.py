@@ -1,6 +1,7 @@
 """Demo: Advanced Resource Requests.
 
 Request specific memory, disk, and shared memory sizes.
+For measured disk/memory/CPU throughput, see `pod_profiler.py`.
 """
 
 import kubetorch as kt
@@ -20,10 +21,15 @@ def check_resources():
     total_disk, _, _ = shutil.disk_usage("/")
     disk_size_gb = total_disk / (1024**3)
 
+    # Container limits (what we actually get), vs the node values above
+    from pod_profiler import cgroup_limits, effective_cpus
+
     return {
         "shm_size_gb": f"{shm_size_gb:.2f} GB",
         "disk_size_gb": f"{disk_size_gb:.2f} GB (approx node/overlay size)",
         "cpu_count": os.cpu_count(),
+        "cgroup": cgroup_limits(),
+        "effective_cpus": effective_cpus(),
     }
 
 
@@ -0,0 +1,314 @@
+"""Demo: Streaming items and metrics from long-running remote functions.
+
+A plain `kt.fn` call only returns when the function finishes. Here a `StreamServer`
+class is deployed with `kt.cls` and runs functions in a background thread on the pod:
+- Generator functions stream each yielded item to the client as it is produced
+- The client iterates with `for item in stream`, fetching items in batches
+  (one round trip per batch, long-polling while the producer is busy)
+- Backpressure: the pod-side buffer is bounded, so a fast producer blocks until
+  the client catches up; the generator's return value arrives as `stream.value`
+- Any function can call `emitter().emit(loss=...)`; metrics are rate-limited and
+  coalesced, and never block the training loop (they are dropped and counted
+  if the client falls behind)
+
+Example:
+    # Local stand-in: time-to-first-item for a 10k-item generator
+    python demos/advanced/streaming.py --local
+
+    # On the cluster: stream a training run's progress
+    python demos/advanced/streaming.py
+"""
+
+import argparse
+import collections
+import importlib
+import queue
+import threading
+import time
+import uuid
+
+import kubetorch as kt
+
+_current = threading.local()
+
+
+class MetricEmitter:
+    """Rate-limited, non-blocking metric emission for hot loops.
+
+    `emit()` only updates a dict; at most once per `interval` seconds the latest
+    values are pushed as one record. Records go into a bounded deque, so a slow
+    client costs dropped (and counted) records, never training time.
+    """
+
+    def __init__(self, interval: float = 0.5, max_records: int = 1000):
+        self.interval = interval
+        self.records = collections.deque(maxlen=max_records)
+        self.dropped = 0
+        self._latest = {}
+        self._n_emits = 0
+        self._last_flush = 0.0
+
+    def emit(self, **metrics):
+        self._latest.update(metrics)
+        self._n_emits += 1
+        now = time.monotonic()
+        if now - self._last_flush >= self.interval:
+            self.flush(now)
+
+    def flush(self, now: float | None = None):
+        if not self._latest:
+            return
+        if len(self.records) == self.records.maxlen:
+            self.dropped += 1  # deque drops the oldest record
+        self.records.append({"time": time.time(), "n_emits": self._n_emits, **self._latest})
+        self._latest = {}
+        self._n_emits = 0
+        self._last_flush = now or time.monotonic()
+
+
+class _NullEmitter:
+    def emit(self, **metrics):
+        pass
+
+    def flush(self, now=None):
+        pass
+
+
+def emitter() -> MetricEmitter:
+    """The current stream's emitter (a no-op outside a stream, so code runs standalone)."""
+    return getattr(_current, "emitter", None) or _NullEmitter()
+
+
+def resolve_target(target):
+    """Accept a callable or a "module:function" string (importable on the pod)."""
+    if callable(target):
+        return target
+    module, _, name = target.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+class _Stream:
+    """One running function: a producer thread feeding a bounded item queue."""
+
+    _DONE = object()
+
+    def __init__(self, fn, args, kwargs, max_buffer: int, metric_interval: float):
+        self.items = queue.Queue(maxsize=max_buffer)
+        self.emitter = MetricEmitter(interval=metric_interval)
+        self.value = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(fn, args, kwargs), daemon=True)
+        self.thread.start()
+
+    def _run(self, fn, args, kwargs):
+        _current.emitter = self.emitter
+        try:
+            result = fn(*args, **kwargs)
+            if hasattr(result, "__next__"):
+                result = self._drain(result)
+            self.value = result
+        except Exception as e:  # reported to the client, not swallowed
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.emitter.flush()
+            if not self.cancelled.is_set():  # nobody reads a cancelled stream's queue
+                self.items.put(self._DONE)
+
+    def _drain(self, gen):
+        """Pull from the generator, blocking on a full queue (backpressure)."""
+        while not self.cancelled.is_set():
+            try:
+                item = next(gen)
+            except StopIteration as stop:
+                return stop.value
+            while not self.cancelled.is_set():
+                try:
+                    self.items.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+        gen.close()
+        return None
+
+
+class StreamServer:
+    """Pod-side registry of running streams; deploy with `kt.cls(StreamServer)`."""
+
+    def __init__(self, max_buffer: int = 4096, metric_interval: float = 0.5):
+        self.max_buffer = max_buffer
+        self.metric_interval = metric_interval
+        self._streams: dict[str, _Stream] = {}
+
+    def start(self, target, *args, **kwargs) -> str:
+        """Start `target` (callable or "module:function") in the background; returns its id."""
+        stream_id = uuid.uuid4().hex[:12]
+        self._streams[stream_id] = _Stream(
+            resolve_target(target), args, kwargs, self.max_buffer, self.metric_interval
+        )
+        return stream_id
+
+    def next_batch(self, stream_id: str, max_items: int = 1000, timeout: float = 1.0) -> dict:
+        """Up to `max_items` items; waits up to `timeout` for the first one."""
+        stream = self._streams[stream_id]
+        items, done = [], False
+        try:
+            first = stream.items.get(timeout=timeout)
+            while True:
+                if first is _Stream._DONE:
+                    done = True
+                    break
+                items.append(first)
+                if len(items) >= max_items:
+                    break
+                first = stream.items.get_nowait()
+        except queue.Empty:
+            pass
+
+        metrics = []
+        while stream.emitter.records:
+            metrics.append(stream.emitter.records.popleft())
+        batch = {"items": items, "metrics": metrics, "done": done}
+        if done:
+            batch.update(
+                value=stream.value, error=stream.error, metrics_dropped=stream.emitter.dropped
+            )
+            del self._streams[stream_id]
+        return batch
+
+    def cancel(self, stream_id: str):
+        stream = self._streams.pop(stream_id, None)
+        if stream:
+            stream.cancelled.set()
+
+
+class RemoteStream:
+    """Client-side iterator over a stream's items.
+
+    Metrics are collected into `.metrics` (and passed to `on_metrics` if given);
+    after iteration finishes, `.value` holds the function's return value.
+    """
+
+    def __init__(self, server, stream_id: str, max_items: int = 1000, on_metrics=None):
+        self.server = server
+        self.stream_id = stream_id
+        self.max_items = max_items
+        self.on_metrics = on_metrics
+        self.metrics = []
+        self.value = None
+        self.metrics_dropped = 0
+        self.round_trips = 0
+
+    def __iter__(self):
+        while True:
+            batch = self.server.next_batch(self.stream_id, self.max_items)
+            self.round_trips += 1
+            for record in batch["metrics"]:
+                self.metrics.append(record)
+                if self.on_metrics:
+                    self.on_metrics(record)
+            yield from batch["items"]
+            if batch["done"]:
+                if batch["error"]:
+                    raise RuntimeError(f"Remote stream failed: {batch['error']}")
+                self.value = batch["value"]
+                self.metrics_dropped = batch["metrics_dropped"]
+                return
+
+    def close(self):
+        self.server.cancel(self.stream_id)
+
+
+def stream(server, target, *args, max_items: int = 1000, on_metrics=None, **kwargs):
+    """Start `target` on `server` (local StreamServer or kt.cls remote) and iterate it."""
+    return RemoteStream(server, server.start(target, *args, **kwargs), max_items, on_metrics)
+
+
+def count_items(n: int = 10_000, work_s: float = 0.0002):
+    """Generator with a little work per item; returns the total."""
+    total = 0
+    for i in range(n):
+        deadline = time.perf_counter() + work_s
+        while time.perf_counter() < deadline:
+            pass
+        total += i
+        yield {"i": i}
+    return {"n": n, "total": total}
+
+
+def train_with_metrics(steps: int = 2000, log_every: int = 200):
+    """Tiny torch training loop: metrics every step (rate-limited), items every `log_every`."""
+    import torch
+
+    model = torch.nn.Linear(16, 1)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01)
+    start = time.time()
+    for step in range(1, steps + 1):
+        x = torch.randn(64, 16)
+        loss = torch.nn.functional.mse_loss(model(x), x.sum(dim=1, keepdim=True))
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        emitter().emit(step=step, loss=loss.item(), samples_per_s=step * 64 / (time.time() - start))
+        if step % log_every == 0:
+            yield {"step": step, "loss": round(loss.item(), 4)}
+    return {"steps": steps, "final_loss": loss.item(), "duration_s": round(time.time() - start, 2)}
+
+
+def run_ttfi_bench(n: int = 10_000, work_s: float = 0.0002) -> dict:
+    """Time-to-first-item: streaming vs waiting for the whole (list-returning) call."""
+    server = StreamServer()
+
+    start = time.perf_counter()
+    everything = server.start(lambda: list(count_items(n, work_s)))
+    batch = {"done": False}
+    while not batch["done"]:
+        batch = server.next_batch(everything)
+    blocking_total = time.perf_counter() - start
+
+    start = time.perf_counter()
+    s = stream(server, count_items, n, work_s)
+    first = None
+    count = 0
+    for _ in s:
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    streaming_total = time.perf_counter() - start
+
+    return {
+        "items": count,
+        "return_value": s.value,
+        "blocking_ttfi_ms": round(blocking_total * 1e3, 1),  # first item == all items
+        "streaming_ttfi_ms": round(first * 1e3, 2),
+        "blocking_total_ms": round(blocking_total * 1e3, 1),
+        "streaming_total_ms": round(streaming_total * 1e3, 1),
+        "round_trips": s.round_trips,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming from remote functions")
+    parser.add_argument("--local", action="store_true", help="Run the local TTFI benchmark")
+    parser.add_argument("--items", type=int, default=10_000)
+    args = parser.parse_args()
+
+    if args.local:
+        print(f"Time-to-first-item for a {args.items}-item generator (local stand-in)...")
+        for k, v in run_ttfi_bench(args.items).items():
+            print(f"  {k}: {v}")
+    else:
+        image = kt.images.Python311().pip_install(["torch"])
+        compute = kt.Compute(cpus="1", memory="2Gi", image=image, launch_timeout=120)
+        server = kt.cls(StreamServer, name="advanced_streaming").to(compute)
+
+        print("Streaming training progress from the pod...")
+        s = stream(
+            server,
+            "streaming:train_with_metrics",
+            on_metrics=lambda m: print(f"  [metrics] step={m['step']} loss={m['loss']:.4f}"),
+        )
+        for item in s:
+            print(f"  [item] {item}")
+        print(f"\nReturn value: {s.value}")
+        print(f"Metric records: {len(s.metrics)} (dropped: {s.metrics_dropped})")
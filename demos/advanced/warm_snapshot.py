@@ -0,0 +1,464 @@
+"""Demo: Fast warm-state restore after scale-from-zero with mmap-able snapshots.
+
+With `min_scale=0` (`hello_world.py`, `autoscale_demo.py`) every scale-up rebuilds the
+pod's state: imports, model construction, weight loading, derived caches. `WarmState`
+writes the warm process's model weights and named caches to the PVC in a flat format:
+- `tensors.bin`: every tensor's raw bytes, each starting on a 4 KiB boundary
+- `index.json`: name -> dtype, shape, offset (plus small JSON-able cache values)
+
+Each snapshot is an immutable version directory (`snap-<id>/`) next to a `CURRENT`
+file naming the published one. Publishing is an `os.replace` of `CURRENT`, so readers
+always see a complete version and replicas writing at once (both cold-starting, or
+both draining) each succeed; the last one to publish wins.
+
+A new replica maps `tensors.bin` (copy-on-write, so tensors stay writable) and wraps
+each tensor around its slice of the mapping; nothing is deserialized or copied, and
+pages are read from disk only when first touched. The model is built on the `meta`
+device (no init cost) and the mapped tensors are assigned as its parameters.
+
+Snapshots are written after the state is built cold (unless another replica has
+already published one) and, when the process can install a handler, again on
+SIGTERM as the pod drains.
+
+Example:
+    # Local: time-to-first-prediction in fresh processes, page cache dropped each time
+    python demos/advanced/warm_snapshot.py --bench --mb 256
+
+    # Autoscaled (min_scale=0) predictor restoring from the slurm-data PVC
+    python demos/advanced/warm_snapshot.py
+"""
+
+import argparse
+import atexit
+import json
+import mmap
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import kubetorch as kt
+
+ALIGN = 4096
+KEEP_OLD_VERSIONS = 2  # superseded versions kept for readers that just read CURRENT
+PRUNE_AFTER_S = 600  # never prune younger versions: another writer may be publishing one
+SNAPSHOT_ROOT = os.environ.get("KT_SNAPSHOT_DIR", "/mnt/data/warm-snapshots")
+
+
+def _as_bytes(value):
+    """(kind, dtype name, shape, uint8 buffer) for a torch tensor or numpy array."""
+    import torch
+
+    if isinstance(value, torch.Tensor):
+        t = value.detach().cpu().contiguous()
+        raw = t.reshape(-1).view(torch.uint8).numpy()
+        return "torch", str(t.dtype).removeprefix("torch."), list(t.shape), raw
+    import numpy as np
+
+    a = np.ascontiguousarray(value)
+    return "numpy", a.dtype.str, list(a.shape), a.reshape(-1).view(np.uint8)
+
+
+def current_version(path: str) -> str | None:
+    """Directory of the published snapshot under `path`, or None if there is none."""
+    try:
+        with open(os.path.join(path, "CURRENT")) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(path, version) if version else None
+
+
+def _fsync_write(path: str, write):
+    with open(path, "w" if isinstance(write, str) else "wb") as f:
+        f.write(write)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_snapshot(path: str, tensors: dict, meta: dict | None = None) -> dict:
+    """Write tensors/arrays (aligned) plus JSON `meta` as a new version under `path`.
+
+    The version is fully on disk before `CURRENT` is atomically pointed at it.
+    """
+    os.makedirs(path, exist_ok=True)
+    version = f"snap-{uuid.uuid4().hex}"
+    tmp = os.path.join(path, f".tmp-{version}")
+    os.mkdir(tmp)
+    try:
+        offset = _write_files(tmp, tensors, meta)
+        os.rename(tmp, os.path.join(path, version))  # unique name: never collides
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    pointer = os.path.join(path, f".CURRENT-{version}")
+    _fsync_write(pointer, version)
+    os.replace(pointer, os.path.join(path, "CURRENT"))
+    _prune(path)
+    return {"path": os.path.join(path, version), "tensors": len(tensors), "bytes": offset}
+
+
+def _prune(path: str):
+    """Drop old versions beyond the newest KEEP_OLD_VERSIONS, and day-old temp dirs."""
+    current = current_version(path)
+    cutoff = time.time() - PRUNE_AFTER_S
+    ages = {}
+    for name in os.listdir(path):
+        full = os.path.join(path, name)
+        try:
+            mtime = os.stat(full).st_mtime
+        except FileNotFoundError:  # pruned by another replica
+            continue
+        if name.startswith("snap-") and full != current:
+            ages[full] = mtime
+        elif name.startswith(".tmp-snap-") and mtime < cutoff - 86400:
+            shutil.rmtree(full, ignore_errors=True)  # left behind by a killed writer
+    for stale in sorted(ages, key=ages.get, reverse=True)[KEEP_OLD_VERSIONS:]:
+        if ages[stale] < cutoff:
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def _write_files(tmp: str, tensors: dict, meta: dict | None) -> int:
+    index = {"tensors": {}, "meta": meta or {}, "created": time.time()}
+    offset = 0
+    with open(os.path.join(tmp, "tensors.bin"), "wb") as f:
+        for name, value in tensors.items():
+            kind, dtype, shape, raw = _as_bytes(value)
+            offset = -(-offset // ALIGN) * ALIGN  # round up to the next boundary
+            f.seek(offset)
+            f.write(memoryview(raw))
+            index["tensors"][name] = {
+                "kind": kind,
+                "dtype": dtype,
+                "shape": shape,
+                "offset": offset,
+                "nbytes": raw.nbytes,
+            }
+            offset += raw.nbytes
+        f.truncate(offset)
+        os.fsync(f.fileno())  # on disk before CURRENT makes it visible
+    _fsync_write(os.path.join(tmp, "index.json"), json.dumps(index))
+    return offset
+
+
+class MappedSnapshot:
+    """The published snapshot under `path`, mapped into memory; tensors are views of it."""
+
+    def __init__(self, path: str):
+        for attempt in range(3):
+            self.path = current_version(path)
+            if self.path is None:
+                raise FileNotFoundError(f"No snapshot published under {path}")
+            try:
+                self._open(self.path)  # both files from the same (immutable) version
+                return
+            except FileNotFoundError:
+                if attempt == 2:  # pruned under us repeatedly: give up
+                    raise
+
+    def _open(self, version: str):
+        with open(os.path.join(version, "index.json")) as f:
+            self.index = json.load(f)
+        self.meta = self.index["meta"]
+        with open(os.path.join(version, "tensors.bin"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # ACCESS_COPY: private copy-on-write pages, so tensors are writable
+            self._map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_COPY) if size else None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index["tensors"]
+
+    def get(self, name: str):
+        entry = self.index["tensors"][name]
+        if entry["kind"] == "numpy":
+            import numpy as np
+
+            dtype = np.dtype(entry["dtype"])
+            count = entry["nbytes"] // dtype.itemsize
+            array = np.frombuffer(self._map, dtype, count, entry["offset"]) if count else None
+            return array.reshape(entry["shape"]) if count else np.empty(entry["shape"], dtype)
+        import torch
+
+        dtype = getattr(torch, entry["dtype"])
+        if not entry["nbytes"]:
+            return torch.empty(entry["shape"], dtype=dtype)
+        count = entry["nbytes"] // dtype.itemsize
+        flat = torch.frombuffer(self._map, dtype=dtype, count=count, offset=entry["offset"])
+        return flat.view(entry["shape"])
+
+    def state_dict(self, prefix: str) -> dict:
+        """All tensors under `prefix/`, keyed by the rest of their name."""
+        start = f"{prefix}/"
+        return {
+            name[len(start) :]: self.get(name)
+            for name in self.index["tensors"]
+            if name.startswith(start)
+        }
+
+
+def restore_model(build_fn, snapshot: MappedSnapshot, name: str = "model"):
+    """Build the module on the meta device (no init) and assign the mapped tensors."""
+    import torch
+
+    with torch.device("meta"):
+        module = build_fn()
+    module.load_state_dict(snapshot.state_dict(f"models/{name}"), assign=True)
+    return module.eval()
+
+
+class WarmState:
+    """The process's warm state (models + named caches) and its snapshot on disk.
+
+    Caches are dicts of tensors/arrays (mapped on restore) and small JSON-able values.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.models = {}
+        self.caches = {}
+        self._drain_hooked = False
+
+    def snapshot(self) -> dict:
+        tensors, meta = {}, {"caches": {}}
+        for name, module in self.models.items():
+            for key, value in module.state_dict().items():
+                tensors[f"models/{name}/{key}"] = value
+        for name, cache in self.caches.items():
+            for key, value in cache.items():
+                if hasattr(value, "shape") and hasattr(value, "dtype"):
+                    tensors[f"caches/{name}/{key}"] = value
+                else:
+                    meta["caches"].setdefault(name, {})[key] = value
+        return write_snapshot(self.path, tensors, meta)
+
+    @staticmethod
+    def load_caches(snapshot: MappedSnapshot) -> dict:
+        caches = {name: dict(values) for name, values in snapshot.meta["caches"].items()}
+        for name in snapshot.index["tensors"]:
+            if name.startswith("caches/"):
+                _, cache, key = name.split("/", 2)
+                caches.setdefault(cache, {})[key] = snapshot.get(name)
+        return caches
+
+    def snapshot_on_drain(self):
+        """Re-snapshot on SIGTERM (main thread only) or, failing that, at exit."""
+        if self._drain_hooked:
+            return
+        self._drain_hooked = True
+        if threading.current_thread() is threading.main_thread():
+            previous = signal.getsignal(signal.SIGTERM)
+
+            def on_sigterm(signum, frame):
+                self.snapshot()
+                if callable(previous):
+                    previous(signum, frame)
+                else:
+                    raise SystemExit(0)
+
+            signal.signal(signal.SIGTERM, on_sigterm)
+        else:
+            atexit.register(self.snapshot)
+
+
+def build_model(width: int = 2048, depth: int = 8):
+    """Stand-in for the Opora model: an MLP over 3D points, `depth` hidden layers."""
+    import torch
+
+    layers = [torch.nn.Linear(3, width), torch.nn.GELU()]
+    for _ in range(depth - 1):
+        layers += [torch.nn.Linear(width, width), torch.nn.GELU()]
+    return torch.nn.Sequential(*layers, torch.nn.Linear(width, 1))
+
+
+def width_for_mb(mb: int, depth: int = 8) -> int:
+    """Hidden width giving roughly `mb` MB of fp32 weights at this depth."""
+    return int((mb * 1024**2 / 4 / (depth - 1)) ** 0.5)
+
+
+def compute_feature_cache(n: int = 200_000, seed: int = 0) -> dict:
+    """A derived cache that is slow to rebuild (e.g. reference-geometry features)."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    points = rng.normal(size=(n, 3)).astype(np.float32)
+    features = np.stack([np.sin(points * k).sum(axis=1) for k in range(1, 33)], axis=1)
+    return {"features": features.astype(np.float32), "n_reference": n}
+
+
+_STATE = {}
+
+
+def get_predictor(root: str = SNAPSHOT_ROOT, width: int = 1024, depth: int = 8) -> dict:
+    """Pod-side: the model + caches, restored from the snapshot if there is one."""
+    if _STATE:
+        return _STATE
+    import torch
+
+    path = os.path.join(root, f"predictor-w{width}-d{depth}")
+    start = time.perf_counter()
+    if current_version(path):
+        snapshot = MappedSnapshot(path)
+        model = restore_model(lambda: build_model(width, depth), snapshot)
+        caches = WarmState.load_caches(snapshot)
+        source = "mmap_snapshot"
+    else:
+        torch.manual_seed(0)
+        model = build_model(width, depth).eval()  # in practice: import pxs, load weights
+        caches = {"reference": compute_feature_cache()}
+        source = "cold"
+    warm = WarmState(path)
+    warm.models["model"] = model
+    warm.caches = caches
+    if source == "cold" and not current_version(path):  # another replica may have won
+        warm.snapshot()
+    warm.snapshot_on_drain()
+    _STATE.update(model=model, caches=caches, source=source, restore_s=time.perf_counter() - start)
+    return _STATE
+
+
+def predict(points: list) -> dict:
+    """Autoscaled entry point: first call on a replica restores the warm state."""
+    import socket
+
+    import torch
+
+    state = get_predictor()
+    with torch.no_grad():
+        out = state["model"](torch.tensor(points, dtype=torch.float32))
+    return {
+        "prediction": out.squeeze(-1).tolist()[:5],
+        "state_source": state["source"],
+        "restore_s": round(state["restore_s"], 3),
+        "pod": socket.gethostname(),
+    }
+
+
+def _drop_page_cache(directory: str):
+    """Ask the kernel to drop cached pages of the snapshot files (a 'cold' disk read)."""
+    for root, _, files in os.walk(directory):
+        for name in files:
+            fd = os.open(os.path.join(root, name), os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+
+def _first_prediction(method: str, workdir: str, width: int, depth: int) -> dict:
+    """In a fresh process: restore state by `method`, run one prediction; timings in s."""
+    start = time.perf_counter()
+    import numpy as np
+    import torch
+
+    imported = time.perf_counter()
+    x = torch.from_numpy(np.random.default_rng(1).normal(size=(64, 3)).astype(np.float32))
+    if method == "cold":
+        torch.manual_seed(0)
+        model = build_model(width, depth).eval()
+        model.load_state_dict(torch.load(os.path.join(workdir, "weights.pt")))
+        caches = {"reference": compute_feature_cache()}
+    elif method == "torch_load":
+        state = torch.load(os.path.join(workdir, "warm_state.pt"), weights_only=False)
+        with torch.device("meta"):
+            model = build_model(width, depth)
+        model.load_state_dict(state["model"], assign=True)
+        caches = state["caches"]
+    else:
+        snapshot = MappedSnapshot(os.path.join(workdir, "snapshot"))
+        model = restore_model(lambda: build_model(width, depth), snapshot)
+        caches = WarmState.load_caches(snapshot)
+    restored = time.perf_counter()
+    with torch.no_grad():
+        y = model.eval()(x)
+    done = time.perf_counter()
+    return {
+        "import_s": round(imported - start, 3),
+        "restore_s": round(restored - imported, 3),
+        "first_predict_s": round(done - restored, 3),
+        "time_to_first_prediction_s": round(done - start, 3),
+        "checksum": round(float(y.sum()), 4),
+        "cache_rows": int(caches["reference"]["features"].shape[0]),
+    }
+
+
+def run_bench(mb: int = 256, depth: int = 8, repeats: int = 3) -> dict:
+    """Time-to-first-prediction in fresh processes: cold rebuild, torch.load, mmap."""
+    import torch
+
+    width = width_for_mb(mb, depth)
+    results = {"weights_mb": mb, "width": width, "depth": depth}
+    with tempfile.TemporaryDirectory() as workdir:
+        torch.manual_seed(0)
+        model = build_model(width, depth).eval()
+        caches = {"reference": compute_feature_cache()}
+        torch.save(model.state_dict(), os.path.join(workdir, "weights.pt"))
+        torch.save({"model": model.state_dict(), "caches": caches}, f"{workdir}/warm_state.pt")
+        warm = WarmState(os.path.join(workdir, "snapshot"))
+        warm.models["model"] = model
+        warm.caches = caches
+        start = time.perf_counter()
+        info = warm.snapshot()
+        results["snapshot_write_s"] = round(time.perf_counter() - start, 3)
+        results["snapshot_mb"] = round(info["bytes"] / 1024**2, 1)
+        del model, caches, warm
+
+        for method in ("cold", "torch_load", "mmap"):
+            runs = []
+            for _ in range(repeats):
+                _drop_page_cache(workdir)
+                proc = subprocess.run(
+                    [sys.executable, __file__, "--probe", method, workdir, str(width), str(depth)],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            best = min(runs, key=lambda r: r["time_to_first_prediction_s"])
+            results[method] = best
+    checksums = {results[m]["checksum"] for m in ("cold", "torch_load", "mmap")}
+    results["same_predictions"] = len(checksums) == 1
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mmap warm-state snapshots")
+    parser.add_argument("--bench", action="store_true", help="Local restore benchmark")
+    parser.add_argument("--mb", type=int, default=256, help="Model weight size for --bench")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--probe", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        method, workdir, width, depth = args.probe
+        print(json.dumps(_first_prediction(method, workdir, int(width), int(depth))))
+        raise SystemExit(0)
+
+    if args.bench:
+        print(f"Time to first prediction, {args.mb} MB of weights (best of {args.repeats}):")
+        for k, v in run_bench(args.mb, repeats=args.repeats).items():
+            print(f"  {k}: {v}")
+        raise SystemExit(0)
+
+    compute = kt.Compute(
+        cpus="2",
+        memory="4Gi",
+        image=kt.images.Python311().pip_install(["torch", "numpy"]),
+        namespace="tenant-slurm",
+        volumes=[
+            kt.Volume.from_name(name="slurm-data", namespace="tenant-slurm", mount_path="/mnt/data")
+        ],
+        launch_timeout=300,
+    ).autoscale(min_scale=0, max_scale=2, concurrency=1, scale_to_zero_pod_retention_period="30s")
+    remote_predict = kt.fn(predict, name="advanced_warm_snapshot").to(compute)
+
+    points = [[0.1 * i, 0.2, -0.3] for i in range(64)]
+    print("First call (builds the state cold, or restores the snapshot from the PVC):")
+    print(f"  {remote_predict(points)}")
+    print("Second call (warm pod):")
+    print(f"  {remote_predict(points)}")
+    print("Wait for scale-to-zero (~45s) and run again: state_source becomes mmap_snapshot.")
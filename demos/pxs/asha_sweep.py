@@ -0,0 +1,254 @@
+"""Hyperparameter sweep over remote functions with ASHA early stopping.
+
+`autoscale_demo.py` fans calls out by hand. `run_sweep` does the same over an
+autoscaled `kt.fn`, but trains every trial in segments ("rungs") and uses
+asynchronous successive halving (ASHA) to decide what runs next:
+- Rungs are at min_epochs * eta^k epochs; a trial that finishes rung k is promoted
+  to rung k+1 only if it is in the top 1/eta of trials that reached rung k
+- A free replica always gets work: the best promotable trial, else a new trial
+- Per-epoch metrics come back with each segment (and go to `on_metrics` as each
+  segment returns); model state is handed back so promoted trials resume, not restart
+- A trial whose segment raises is recorded as failed and the sweep carries on; if
+  no trial reaches the top rung, the best trial on the highest reached rung wins
+
+The trial function has the signature `trial_fn(config, start_epoch, end_epoch, state)`
+and returns `{"metrics": [{"epoch": e, "val_loss": x}, ...], "state": ...}`.
+`synthetic_curve` is a stand-in with synthetic learning curves, so the scheduler can
+be run locally in seconds; `train_segment` trains the demo Opora MLP for real.
+
+Example:
+    # Local: ASHA vs a full grid on synthetic learning curves
+    python demos/pxs/asha_sweep.py --local
+
+    # Cluster: 36 configs on up to 4 autoscaled CPU replicas
+    python demos/pxs/asha_sweep.py --replicas 4
+"""
+
+import argparse
+import base64
+import collections
+import io
+import itertools
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import kubetorch as kt
+
+# Opora block widths and learning settings (same grid as trial_packing.py)
+SEARCH_SPACE = {
+    "width": [16, 32, 64, 128],
+    "hidden": [16, 32, 64],
+    "lr": [1e-3, 3e-3, 1e-2],
+}
+
+
+def grid(space: dict) -> list[dict]:
+    """Every combination in the search space."""
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+
+class ASHA:
+    """Asynchronous successive halving over a fixed list of configs."""
+
+    def __init__(self, n_trials: int, min_epochs: int = 1, max_epochs: int = 27, eta: int = 3):
+        self.eta = eta
+        self.rungs = []
+        epochs = min_epochs
+        while epochs < max_epochs:
+            self.rungs.append(epochs)
+            epochs *= eta
+        self.rungs.append(max_epochs)
+        self.results = [{} for _ in self.rungs]  # rung -> {trial_id: val_loss}
+        self.promoted = [set() for _ in self.rungs]
+        self.trained = collections.defaultdict(int)  # trial_id -> epochs trained so far
+        self._new = collections.deque(range(n_trials))
+
+    def next_job(self) -> tuple[int, int] | None:
+        """(trial_id, rung) to run next, or None if nothing can start right now."""
+        for k in reversed(range(len(self.rungs) - 1)):
+            done = self.results[k]
+            for trial_id in sorted(done, key=done.get)[: len(done) // self.eta]:
+                if trial_id not in self.promoted[k]:
+                    self.promoted[k].add(trial_id)
+                    return trial_id, k + 1
+        if self._new:
+            return self._new.popleft(), 0
+        return None
+
+    def report(self, trial_id: int, rung: int, val_loss: float):
+        self.results[rung][trial_id] = val_loss
+        self.trained[trial_id] = self.rungs[rung]
+
+
+def run_sweep(
+    trial_fn,
+    configs: list[dict],
+    max_concurrent: int = 4,
+    min_epochs: int = 1,
+    max_epochs: int = 27,
+    eta: int = 3,
+    on_metrics=None,
+) -> dict:
+    """Run configs through ASHA, keeping `max_concurrent` segments in flight."""
+    asha = ASHA(len(configs), min_epochs, max_epochs, eta)
+    curves = collections.defaultdict(list)
+    states = {}
+    failed = {}
+    epochs_used = 0
+    start = time.time()
+
+    with ThreadPoolExecutor(max_concurrent) as pool:
+        running = {}
+        while True:
+            while len(running) < max_concurrent and (job := asha.next_job()):
+                trial_id, rung = job
+                segment = (asha.trained[trial_id], asha.rungs[rung])
+                future = pool.submit(
+                    trial_fn, configs[trial_id], *segment, states.pop(trial_id, None)
+                )
+                running[future] = (trial_id, rung, segment)
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                trial_id, rung, (first, last) = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:  # one bad config shouldn't end the sweep
+                    failed[trial_id] = f"{type(e).__name__}: {e}"
+                    continue
+                for record in result["metrics"]:
+                    curves[trial_id].append(record)
+                    if on_metrics:
+                        on_metrics(trial_id, record)
+                states[trial_id] = result.get("state")
+                epochs_used += last - first
+                asha.report(trial_id, rung, result["metrics"][-1]["val_loss"])
+
+    # Best trial on the highest rung anyone reached (the top rung unless trials failed)
+    top = next((r for r in reversed(asha.results) if r), {})
+    best_id = min(top, key=top.get) if top else None
+    full_grid_epochs = len(configs) * max_epochs
+    return {
+        "n_configs": len(configs),
+        "rungs": asha.rungs,
+        "trials_per_rung": [len(r) for r in asha.results],
+        "best_config": configs[best_id] if best_id is not None else None,
+        "best_val_loss": round(top[best_id], 5) if best_id is not None else None,
+        "failed_trials": failed,
+        "epochs_used": epochs_used,
+        "full_grid_epochs": full_grid_epochs,
+        "compute_saved_pct": round(100 * (1 - epochs_used / full_grid_epochs), 1),
+        "wall_s": round(time.time() - start, 2),
+        "curves": dict(curves),
+    }
+
+
+def synthetic_curve(
+    config: dict, start_epoch: int, end_epoch: int, state=None, epoch_s: float = 0.01
+) -> dict:
+    """Stand-in trial: a noisy power-law learning curve whose plateau depends on config.
+
+    Higher learning rates converge faster but plateau higher, so early rankings are
+    not simply the final ones (curves cross).
+    """
+    import random
+
+    floor = (
+        0.02
+        + 0.04 * math.log10(config["lr"] / 3e-3) ** 2
+        + 0.01 * math.log2(config["width"] / 64) ** 2
+        + 0.005 * math.log2(config["hidden"] / 32) ** 2
+    )
+    rate = 0.5 + 0.25 * math.log10(config["lr"] / 1e-3)
+    metrics = []
+    for epoch in range(start_epoch + 1, end_epoch + 1):
+        time.sleep(epoch_s)
+        rng = random.Random(f"{sorted(config.items())}-{epoch}")  # deterministic noise
+        loss = floor + 0.5 * epoch**-rate
+        metrics.append({"epoch": epoch, "val_loss": loss * (1 + rng.gauss(0, 0.02))})
+    return {"metrics": metrics, "state": None}
+
+
+def train_segment(config: dict, start_epoch: int, end_epoch: int, state=None) -> dict:
+    """Real trial: train the demo Opora MLP (as a torch MLP) from start to end epoch."""
+    import numpy as np
+    import torch
+    from opora_common import make_data, mlp
+
+    torch.manual_seed(0)
+    model = mlp(config["width"], config["hidden"])
+    optimizer = torch.optim.Adam(model.parameters(), lr=config["lr"])
+    if state is not None:
+        saved = torch.load(io.BytesIO(base64.b64decode(state)))
+        model.load_state_dict(saved["model"])
+        optimizer.load_state_dict(saved["optimizer"])
+
+    def tensors(samples):
+        return (
+            torch.from_numpy(np.stack([s["points"] for s in samples])),
+            torch.from_numpy(np.stack([s["target"] for s in samples])),
+        )
+
+    x, y = tensors(make_data(100, 50, seed=0))
+    vx, vy = tensors(make_data(10, 50, seed=1))
+    metrics = []
+    for epoch in range(start_epoch + 1, end_epoch + 1):
+        for i in range(0, len(x), 10):
+            optimizer.zero_grad()
+            torch.nn.functional.mse_loss(model(x[i : i + 10]), y[i : i + 10]).backward()
+            optimizer.step()
+        with torch.no_grad():
+            metrics.append(
+                {"epoch": epoch, "val_loss": torch.nn.functional.mse_loss(model(vx), vy).item()}
+            )
+    # Any replica may run the next segment, so state travels with the (JSON) call
+    buf = io.BytesIO()
+    torch.save({"model": model.state_dict(), "optimizer": optimizer.state_dict()}, buf)
+    return {"metrics": metrics, "state": base64.b64encode(buf.getvalue()).decode()}
+
+
+def full_grid_ranking(configs: list[dict], max_epochs: int) -> list[int]:
+    """Trial ids ranked by final loss when every config trains to max_epochs (synthetic only)."""
+    final = [
+        synthetic_curve(c, max_epochs - 1, max_epochs, epoch_s=0)["metrics"][-1]["val_loss"]
+        for c in configs
+    ]
+    return sorted(range(len(configs)), key=final.__getitem__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ASHA hyperparameter sweep")
+    parser.add_argument("--local", action="store_true", help="Synthetic curves, local threads")
+    parser.add_argument("--replicas", type=int, default=4, help="Concurrent trials / max pods")
+    parser.add_argument("--max-epochs", type=int, default=27)
+    parser.add_argument("--eta", type=int, default=3)
+    args = parser.parse_args()
+
+    configs = grid(SEARCH_SPACE)
+    if args.local:
+        trial_fn = synthetic_curve
+    else:
+        compute = kt.Compute(
+            cpus="1",
+            memory="2Gi",
+            image=kt.images.Python311().pip_install(["torch", "numpy"]),
+            launch_timeout=180,
+        ).autoscale(min_scale=0, max_scale=args.replicas, concurrency=1)
+        trial_fn = kt.fn(train_segment, name="pxs_asha_sweep").to(compute)
+
+    print(f"Sweeping {len(configs)} configs, {args.replicas} at a time...")
+    summary = run_sweep(trial_fn, configs, args.replicas, max_epochs=args.max_epochs, eta=args.eta)
+    curves = summary.pop("curves")
+    for k, v in summary.items():
+        print(f"  {k}: {v}")
+    print(
+        f"  trials trained to max_epochs: {sum(len(c) == args.max_epochs for c in curves.values())}"
+    )
+
+    if args.local:
+        ranking = full_grid_ranking(configs, args.max_epochs)
+        best_rank = ranking.index(configs.index(summary["best_config"]))
+        print(f"  ASHA winner's rank in the full grid: {best_rank + 1} of {len(configs)}")
@@ -0,0 +1,401 @@
+"""Compiled and mixed-precision execution modes for Opora models.
+
+`run_opora_gpu` / `run_opora_mlp` run the model in eager fp32. An `ExecutionMode`
+selects how the underlying torch module runs instead:
+- `eager`: unchanged (the fp32 reference)
+- `compile`: `torch.compile`; compiled artifacts are cached in-process (a warm call
+  on a kept-alive pod compiling a fresh model reuses them) and, with a cache dir (e.g.
+  on the PVC), on disk via inductor's cache plus `torch.compiler.save_cache_artifacts`,
+  so a new pod loads them instead of compiling from scratch
+- `bf16` / `fp16`: `torch.autocast`; fp16 training uses a `GradScaler` (loss scaling)
+  to avoid gradient underflow, and `amp` picks bf16 where the device supports it,
+  else fp16 with loss scaling
+- Modes combine: `compile+bf16`
+
+`apply_to_opora(model, mode)` patches an Opora model's torch module so `train()` and
+`predict_one()` run in the mode. Opora's own training loop can't take a GradScaler,
+so fp16 there is applied to inference only; `train_module` runs an explicit loop with
+loss scaling. The benchmark runs on CPU (bf16 autocast and inductor both work there);
+without pxs it uses an equivalent torch MLP.
+
+Example:
+    # Local CPU: samples/s, compile time and drift vs fp32 for each mode
+    python demos/pxs/execution_modes.py --local --modes eager compile bf16 fp16
+
+    # Compile time in fresh processes: cold vs loaded from the artifact cache
+    python demos/pxs/execution_modes.py --local --modes compile --cache-check
+
+    # On a B200 via SUNK, caching compiled artifacts on the PVC
+    python demos/pxs/execution_modes.py --modes eager compile bf16 compile+bf16
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import kubetorch as kt
+from opora_common import (
+    build_module,
+    forward_points,
+    make_data,
+    sunk_b200_compute,
+    torch_module,
+)
+
+MODES = ("eager", "compile", "bf16", "fp16", "amp", "compile+bf16", "compile+fp16")
+
+_LOADED_CACHES = set()
+
+
+class ExecutionMode:
+    """Parsed execution mode: whether to compile, and the autocast dtype (or None)."""
+
+    def __init__(self, mode: str = "eager", device: str = "cpu", cache_dir: str | None = None):
+        import torch
+
+        parts = set(mode.split("+"))
+        unknown = parts - {"eager", "compile", "bf16", "fp16", "amp"}
+        if unknown:
+            raise ValueError(f"Unknown execution mode {mode!r}; choose from {MODES}")
+        self.mode = mode
+        self.device = device
+        self.compile = "compile" in parts
+        self.cache_dir = cache_dir
+        self.cache_key = None
+        if "amp" in parts:
+            bf16_ok = device == "cpu" or torch.cuda.is_bf16_supported()
+            parts.add("bf16" if bf16_ok else "fp16")
+        self.dtype = (
+            torch.bfloat16 if "bf16" in parts else torch.float16 if "fp16" in parts else None
+        )
+
+    @property
+    def loss_scaling(self) -> bool:
+        import torch
+
+        return self.dtype == torch.float16
+
+    def autocast(self):
+        import torch
+
+        if self.dtype is None:
+            return contextlib.nullcontext()
+        return torch.autocast(self.device, dtype=self.dtype)
+
+    def scaler(self):
+        """GradScaler for fp16 (a no-op pass-through when disabled)."""
+        import torch
+
+        return torch.amp.GradScaler(self.device, enabled=self.loss_scaling)
+
+    def forward(self, module, key: str = ""):
+        """The module's forward, compiled and/or autocast per the mode; outputs in fp32."""
+        fn = getattr(module, "_eager_forward", module.forward)
+        module._eager_forward = fn  # so wrapping twice doesn't compile a wrapper
+        if self.compile:
+            import torch
+
+            self.cache_key = key
+            load_compile_cache(self.cache_dir, key)
+            fn = torch.compile(fn)
+
+        def run(*args, **kwargs):
+            with self.autocast():
+                out = fn(*args, **kwargs)
+            return _to_fp32(out) if self.dtype is not None else out
+
+        return run
+
+    def save_cache(self) -> int:
+        """After the first compiled step: save artifacts under the key they are loaded by."""
+        if not self.compile or self.cache_key is None:
+            return 0
+        return save_compile_cache(self.cache_dir, self.cache_key)
+
+
+def _to_fp32(value):
+    import torch
+
+    if isinstance(value, torch.Tensor):
+        return value.float() if value.is_floating_point() else value
+    if isinstance(value, dict):
+        return {k: _to_fp32(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_to_fp32(v) for v in value)
+    return value
+
+
+def _cache_file(cache_dir: str, key: str) -> str:
+    import torch
+
+    tag = hashlib.sha1(f"{torch.__version__}|{key}".encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"compile-{tag}.bin")
+
+
+def load_compile_cache(cache_dir: str | None, key: str) -> bool:
+    """Point inductor at cache_dir and load saved artifacts for `key` (once per process)."""
+    if not cache_dir:
+        return False
+    import torch
+
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(cache_dir, "inductor"))
+    path = _cache_file(cache_dir, key)
+    if path in _LOADED_CACHES or not os.path.exists(path):
+        return False
+    with open(path, "rb") as f:
+        torch.compiler.load_cache_artifacts(f.read())
+    _LOADED_CACHES.add(path)
+    return True
+
+
+def save_compile_cache(cache_dir: str | None, key: str) -> int:
+    """Save this process's compiled artifacts for `key`; returns bytes written."""
+    if not cache_dir:
+        return 0
+    import torch
+
+    artifacts = torch.compiler.save_cache_artifacts()
+    if artifacts is None:
+        return 0
+    data, _ = artifacts
+    path = _cache_file(cache_dir, key)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)  # atomic, so concurrent pods never read a partial file
+    return len(data)
+
+
+def apply_to_opora(model, mode: str = "eager", device: str = "cpu", cache_dir: str | None = None):
+    """Run an Opora model's forward in `mode` (for its own train() and predict_one()).
+
+    Returns the ExecutionMode; call its `save_cache()` once the model has run, so the
+    next pod loads the compiled artifacts. When `execution.loss_scaling` is set (fp16,
+    or amp without bf16) Opora's training loop can't scale the loss: apply it after
+    training (inference only) or train with `train_module`.
+    """
+    execution = ExecutionMode(mode, device, cache_dir)
+    if mode != "eager":
+        module = torch_module(model)
+        module.forward = execution.forward(module, key=f"opora|{mode}|{device}")
+    return execution
+
+
+def train_module(
+    module,
+    x,
+    y,
+    execution: ExecutionMode,
+    epochs: int,
+    batch_size: int = 32,
+    key: str = "",
+    kind: str = "opora",
+):
+    """Explicit training loop with autocast and (for fp16) loss scaling; returns stats."""
+    import torch
+
+    forward = execution.forward(module, key=key)
+    optimizer = torch.optim.Adam(module.parameters(), lr=1e-3)
+    scaler = execution.scaler()
+    step_times, loss = [], None
+    for _ in range(epochs):
+        for i in range(0, len(x), batch_size):
+            start = time.perf_counter()
+            optimizer.zero_grad(set_to_none=True)
+            out = forward_points(_Forward(forward), x[i : i + batch_size], kind)
+            loss = torch.nn.functional.mse_loss(out.float(), y[i : i + batch_size])
+            scaler.scale(loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
+            _sync(execution.device)
+            step_times.append(time.perf_counter() - start)
+    return {"final_loss": loss.item(), "step_times": step_times}
+
+
+class _Forward:
+    """Callable stand-in for a module whose forward is wrapped."""
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __call__(self, *args, **kwargs):
+        return self.fn(*args, **kwargs)
+
+
+def _sync(device: str):
+    import torch
+
+    if device == "cuda":
+        torch.cuda.synchronize()
+
+
+def _steady_rate(step_times: list[float], batch_size: int) -> float:
+    """Samples/s over the second half of the steps (after compile / warmup)."""
+    steady = step_times[len(step_times) // 2 :]
+    return batch_size * len(steady) / sum(steady)
+
+
+def run_mode_benchmark(
+    modes: list[str] = ("eager", "compile", "bf16", "fp16"),
+    width: int = 256,
+    hidden: int = 128,
+    n_samples: int = 512,
+    n_points: int = 256,
+    epochs: int = 4,
+    batch_size: int = 32,
+    cache_dir: str | None = None,
+) -> dict:
+    """Training + inference throughput, compile time and drift vs eager fp32, per mode."""
+    import numpy as np
+    import torch
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    data = make_data(n_samples, n_points, seed=0)
+    x = torch.from_numpy(np.stack([s["points"] for s in data])).to(device)
+    y = torch.from_numpy(np.stack([s["target"] for s in data])).to(device).float()
+
+    # One set of weights for the inference comparison
+    reference, kind = build_module(width, hidden, device, seed=0)
+    with torch.no_grad():
+        ref_out = forward_points(reference, x, kind).float()
+    results = {"device": device, "model": kind, "modes": {}}
+
+    for mode in modes:
+        execution = ExecutionMode(mode, device, cache_dir)
+        # One key per model/mode/device, used to load and to save the compiled artifacts
+        key = f"bench|{kind}-{width}-{hidden}|{mode}|{device}"
+        module, _ = build_module(width, hidden, device, seed=0)
+        train = train_module(module, x, y, execution, epochs, batch_size, key=key, kind=kind)
+        times = train["step_times"]
+        steady = sorted(times[len(times) // 2 :])[len(times) // 4]
+        entry = {
+            "train_samples_per_s": round(_steady_rate(times, batch_size), 1),
+            "first_step_s": round(times[0], 3),
+            "final_loss": round(train["final_loss"], 5),
+            "loss_scaling": execution.loss_scaling,
+        }
+        if execution.compile:
+            # First step minus a steady (median) step: the compile cost
+            entry["compile_s"] = round(max(times[0] - steady, 0.0), 3)
+            # A warm call on the same pod: fresh model, same process
+            fresh, _ = build_module(width, hidden, device, seed=1)
+            fresh_forward = _Forward(execution.forward(fresh, key=key))
+            start = time.perf_counter()
+            forward_points(fresh_forward, x[:batch_size], kind).float().mean().backward()
+            _sync(device)
+            entry["warm_compile_s"] = round(time.perf_counter() - start, 3)
+
+        # Inference on the reference weights
+        module.load_state_dict(reference.state_dict())
+        module.eval()
+        forward = _Forward(execution.forward(module, key=key))
+        with torch.no_grad():
+            forward_points(forward, x[:batch_size], kind)  # compile / warm up
+            start = time.perf_counter()
+            out = torch.cat(
+                [
+                    forward_points(forward, x[i : i + batch_size], kind)
+                    for i in range(0, len(x), batch_size)
+                ]
+            ).float()
+            _sync(device)
+        entry["infer_samples_per_s"] = round(len(x) / (time.perf_counter() - start), 1)
+        diff = (out - ref_out).abs()
+        entry["drift_max_abs"] = float(f"{diff.max().item():.3g}")
+        entry["drift_rel"] = float(f"{(diff.norm() / ref_out.norm()).item():.3g}")
+        if execution.compile:
+            entry["cache_bytes_saved"] = execution.save_cache()
+        results["modes"][mode] = entry
+
+    eager = results["modes"].get("eager")
+    if eager:
+        for entry in results["modes"].values():
+            entry["train_speedup"] = round(
+                entry["train_samples_per_s"] / eager["train_samples_per_s"], 2
+            )
+            entry["loss_vs_fp32"] = round(entry["final_loss"] - eager["final_loss"], 5)
+    return results
+
+
+def _compile_probe(cache_dir: str, mode: str) -> dict:
+    """In this (fresh) process: time the first compiled forward, loading cache_dir first."""
+    import torch
+
+    execution = ExecutionMode(mode, "cpu", cache_dir)
+    module, kind = build_module(256, 128, "cpu", seed=0)
+    key = f"probe|{mode}"
+    loaded = load_compile_cache(cache_dir, key)
+    forward = execution.forward(module, key=key)
+    start = time.perf_counter()
+    with torch.no_grad():
+        forward_points(_Forward(forward), torch.randn(32, 256, 3), kind)
+    compile_s = time.perf_counter() - start
+    saved = execution.save_cache()
+    return {"loaded_cache": loaded, "compile_s": round(compile_s, 2), "cache_bytes": saved}
+
+
+def run_cache_check(mode: str = "compile") -> dict:
+    """Compile in two fresh processes sharing a cache dir (as two pods sharing a PVC)."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        runs = []
+        for _ in range(2):
+            env = {**os.environ, "TORCHINDUCTOR_CACHE_DIR": os.path.join(cache_dir, "inductor")}
+            proc = subprocess.run(
+                [sys.executable, __file__, "--compile-probe", cache_dir, "--modes", mode],
+                capture_output=True,
+                text=True,
+                env=env,
+                check=True,
+            )
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {"cold": runs[0], "from_cache": runs[1]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Opora execution modes")
+    parser.add_argument("--local", action="store_true", help="Benchmark on this machine")
+    parser.add_argument("--modes", nargs="+", default=["eager", "compile", "bf16", "fp16"])
+    parser.add_argument("--epochs", type=int, default=4)
+    parser.add_argument("--cache-dir", help="Compiled-artifact cache (default: none locally)")
+    parser.add_argument("--cache-check", action="store_true", help="Cold vs cached compile")
+    parser.add_argument("--compile-probe", metavar="DIR", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compile_probe:
+        print(json.dumps(_compile_probe(args.compile_probe, args.modes[0])))
+        raise SystemExit(0)
+
+    if args.cache_check:
+        print(f"Compile time in fresh processes ({args.modes[0]}), sharing one cache dir:")
+        for k, v in run_cache_check(args.modes[0]).items():
+            print(f"  {k}: {v}")
+        raise SystemExit(0)
+
+    if args.local:
+        results = run_mode_benchmark(args.modes, epochs=args.epochs, cache_dir=args.cache_dir)
+    else:
+        compute = sunk_b200_compute(
+            "PXS execution modes via Kubetorch",
+            volumes=[
+                kt.Volume.from_name(
+                    name="slurm-data", namespace="tenant-slurm", mount_path="/mnt/data"
+                )
+            ],
+        )
+        remote_fn = kt.fn(run_mode_benchmark, name="pxs_execution_modes").to(compute)
+        results = remote_fn(
+            args.modes, epochs=args.epochs, cache_dir=args.cache_dir or "/mnt/data/compile-cache"
+        )
+
+    print(f"Device: {results['device']}, model: {results['model']}")
+    for mode, entry in results["modes"].items():
+        print(f"  {mode}:")
+        for k, v in entry.items():
+            print(f"    {k}: {v}")
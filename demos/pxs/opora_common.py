@@ -0,0 +1,149 @@
+"""Opora model, data and SUNK B200 compute shared by the PXS demos.
+
+`build_module` returns the torch module inside the demos' Opora MLP, or an equivalent
+torch MLP (3 -> hidden -> width -> 1) when pxs isn't installed (e.g. a local CPU
+check); `forward_points` runs either on a (batch, points, 3) tensor.
+"""
+
+import kubetorch as kt
+
+# Pre-built image with PXS, PyTorch, CUDA 13.0 and kubetorch[server], pinned by digest
+PXS_GPU_IMAGE = "ghcr.io/physicsxltd/pxs-gpu@sha256:6ab9fa3573ed0c406c0a2229d557d2ebffccf84d9aa975701fe0da4962bc99ec"
+
+FEATURE = "points"
+TARGET = "target"
+
+
+def opora_config(width: int = 64, hidden: int = 32) -> dict:
+    """The demos' Opora MLP config with a tunable block width."""
+    return {
+        "features": [FEATURE],
+        "target": TARGET,
+        "opora": {
+            "architecture": "default",
+            "blocks": [
+                {
+                    "block_type": "MLP",
+                    "in_channels": 3,
+                    "out_channels": width,
+                    "hidden_channels": [hidden],
+                },
+                {
+                    "block_type": "MLP",
+                    "in_channels": width,
+                    "out_channels": 1,
+                    "hidden_channels": [],
+                },
+            ],
+        },
+    }
+
+
+def make_data(n_samples: int, n_points: int, seed: int) -> list[dict]:
+    """PXS-format samples with a learnable target."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    data = []
+    for _ in range(n_samples):
+        points = rng.normal(size=(n_points, 3)).astype(np.float32)
+        data.append({FEATURE: points, TARGET: np.sin(points).sum(axis=1, keepdims=True)})
+    return data
+
+
+def mlp(width: int = 64, hidden: int = 32):
+    """Plain torch equivalent of the demo Opora config."""
+    import torch
+
+    return torch.nn.Sequential(
+        torch.nn.Linear(3, hidden),
+        torch.nn.ReLU(),
+        torch.nn.Linear(hidden, width),
+        torch.nn.ReLU(),
+        torch.nn.Linear(width, 1),
+    )
+
+
+def torch_module(model):
+    """The torch.nn.Module inside an OporaPyTorch model (or the model itself).
+
+    pxs has no public accessor for it, so this requires exactly one nn.Module attribute
+    and raises rather than pick one when the wrapper's layout differs.
+    """
+    import torch
+
+    if isinstance(model, torch.nn.Module):
+        return model
+    modules = {k: v for k, v in vars(model).items() if isinstance(v, torch.nn.Module)}
+    if len(modules) != 1:
+        raise TypeError(
+            f"Expected exactly one torch.nn.Module attribute on {type(model).__name__}, "
+            f"found {sorted(modules) or 'none'}; update opora_common.torch_module for "
+            "this pxs version"
+        )
+    return next(iter(modules.values()))
+
+
+def build_module(
+    width: int = 64, hidden: int = 32, device: str = "cpu", seed: int | None = None
+) -> tuple:
+    """Return (torch module, kind): Opora's module, or the torch MLP ("torch-mlp") without pxs."""
+    import torch
+
+    if seed is not None:
+        torch.manual_seed(seed)
+    try:
+        from pxs.models.opora.pytorch.base import OporaPyTorch
+        from pxs.models.opora.pytorch.config.config import OporaPyTorchConfig
+    except ImportError:
+        return mlp(width, hidden).to(device), "torch-mlp"
+    model = OporaPyTorch(OporaPyTorchConfig(**opora_config(width, hidden)), device=str(device))
+    return torch_module(model).to(device), "opora"
+
+
+def forward_points(module, points, kind: str):
+    """Run a `build_module` module (or its DDP/compiled wrapper) on (B, N, 3) points.
+
+    Opora's module maps a feature dict to a target dict, as `predict_one` does; the
+    torch MLP takes the tensor directly. Returns (B, N, 1) predictions.
+    """
+    if kind != "opora":
+        return module(points)
+    try:
+        return module({FEATURE: points})[TARGET]
+    except (TypeError, KeyError, IndexError) as e:
+        raise TypeError(
+            f"Opora's torch module did not map {{{FEATURE!r}: tensor}} to "
+            f"{{{TARGET!r}: tensor}}; update opora_common.forward_points for this pxs version"
+        ) from e
+
+
+def sunk_b200_compute(comment: str, image=None, **kwargs) -> kt.Compute:
+    """One B200 GPU via the SUNK scheduler, running the pxs-gpu image by default."""
+    return kt.Compute(
+        cpus="16",
+        memory="128Gi",  # SUNK requires memory request
+        gpus="1",
+        node_selector={"gpu.nvidia.com/class": "B200"},
+        namespace="tenant-slurm",
+        launch_timeout=600,
+        annotations={
+            "sunk.coreweave.com/account": "root",
+            "sunk.coreweave.com/comment": comment,
+            "sunk.coreweave.com/exclusive": "user",
+        },
+        tolerations=[{"key": "nvidia.com/gpu", "operator": "Exists", "effect": "NoSchedule"}],
+        service_template={
+            "spec": {
+                "template": {
+                    "spec": {
+                        "schedulerName": "tenant-slurm-slurm-scheduler",
+                        "terminationGracePeriodSeconds": 5,
+                        "imagePullSecrets": [{"name": "ghcr-secret"}],
+                    }
+                }
+            }
+        },
+        image=image or kt.Image().from_docker(PXS_GPU_IMAGE),
+        **kwargs,
+    )
@@ -1,12 +1,19 @@
 """Minimal pxs Opora test on CPU with Kubetorch."""
 
+import argparse
+
 import kubetorch as kt
 from utils import load_artifactory_creds
 
 
-def run_opora_mlp():
-    """Run a simple Opora MLP model on CPU."""
+def run_opora_mlp(mode: str = "eager", cache_dir: str | None = None):
+    """Run a simple Opora MLP model on CPU (mode: see execution_modes.MODES).
+
+    With a compile mode, `cache_dir` (e.g. on a mounted volume) keeps the compiled
+    artifacts, so the next pod loads them instead of recompiling.
+    """
     import numpy as np
+    from execution_modes import apply_to_opora
     from pxs.models.opora.pytorch.base import OporaPyTorch
     from pxs.models.opora.pytorch.config.config import OporaPyTorchConfig
 
@@ -36,6 +43,7 @@ def run_opora_mlp():
     # Create model
     model = OporaPyTorch(OporaPyTorchConfig(**config))
     model.is_trained = True  # Skip training check for inference
+    execution = apply_to_opora(model, mode, cache_dir=cache_dir)
 
     # Dummy data: 100 points with 3D coordinates
     n_points = 100
@@ -46,11 +54,17 @@ def run_opora_mlp():
 
     # Run forward pass
     output = model.predict_one(data=sample)
+    execution.save_cache()
 
     return f"Opora MLP output shape: {output['target'].shape}, first 3 values: {output['target'][:3].flatten()}"
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", default="eager", help="eager, compile, bf16, fp16, ...")
+    parser.add_argument("--cache-dir", help="Pod path for compiled artifacts (compile modes)")
+    args = parser.parse_args()
+
     print("Running pxs Opora test on Kubetorch (CPU)...")
 
     # Load artifactory credentials from uv
@@ -78,5 +92,5 @@ if __name__ == "__main__":
 
     # Run the Opora MLP test (separate pod - different image from editable demos)
     remote_fn = kt.fn(run_opora_mlp, name="pxs_artifactory").to(compute)
-    result = remote_fn()
+    result = remote_fn(mode=args.mode, cache_dir=args.cache_dir)
     print(result)
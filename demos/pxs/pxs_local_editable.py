@@ -1,14 +1,20 @@
 """Minimal pxs Opora test on CPU with Kubetorch - editable install from local source."""
 
+import argparse
 from pathlib import Path
 
 import kubetorch as kt
 from utils import load_artifactory_creds
 
 
-def run_opora_mlp():
-    """Run a simple Opora MLP model on CPU."""
+def run_opora_mlp(mode: str = "eager", cache_dir: str | None = None):
+    """Run a simple Opora MLP model on CPU (mode: see execution_modes.MODES).
+
+    With a compile mode, `cache_dir` (e.g. on a mounted volume) keeps the compiled
+    artifacts, so the next pod loads them instead of recompiling.
+    """
     import numpy as np
+    from execution_modes import apply_to_opora
     from pxs.models.opora.pytorch.base import OporaPyTorch
     from pxs.models.opora.pytorch.config.config import OporaPyTorchConfig
 
@@ -38,6 +44,7 @@ def run_opora_mlp():
     # Create model
     model = OporaPyTorch(OporaPyTorchConfig(**config))
     model.is_trained = True  # Skip training check for inference
+    execution = apply_to_opora(model, mode, cache_dir=cache_dir)
 
     # Dummy data: 100 points with 3D coordinates
     n_points = 100
@@ -48,6 +55,7 @@ def run_opora_mlp():
 
     # Run forward pass
     output = model.predict_one(data=sample)
+    execution.save_cache()
 
     # Show which pxs we're using
     import pxs
@@ -56,6 +64,11 @@ def run_opora_mlp():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", default="eager", help="eager, compile, bf16, fp16, ...")
+    parser.add_argument("--cache-dir", help="Pod path for compiled artifacts (compile modes)")
+    args = parser.parse_args()
+
     print("Running pxs editable install test on Kubetorch (CPU)...")
 
     # Load artifactory creds for dependencies
@@ -90,5 +103,5 @@ if __name__ == "__main__":
 
     # Run the Opora MLP test (separate pod - different image from editable demos)
     remote_fn = kt.fn(run_opora_mlp, name="pxs_editable").to(compute)
-    result = remote_fn()
+    result = remote_fn(mode=args.mode, cache_dir=args.cache_dir)
     print(result)
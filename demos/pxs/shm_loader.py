@@ -0,0 +1,284 @@
+"""Shared-memory, multi-process data loading for PXS point-cloud samples.
+
+The PXS demos build their training data as a Python list in one process. Here a
+pool of worker processes decodes and augments samples, and writes each batch
+straight into a ring buffer in `/dev/shm` (`multiprocessing.shared_memory`):
+- Arrays are never pickled; only (batch index, slot) integers cross process boundaries
+- `prefetch` slots are in flight at most; batch k always uses slot k % prefetch,
+  so the consumer gets batches strictly in order and workers never deadlock
+- The consumer's time spent waiting for data (stall time) is reported
+
+Needs `shared_memory_limit` on the pod (see `demos/advanced/resource_requests.py`):
+the ring uses prefetch * batch_size * sample bytes of /dev/shm.
+
+Example:
+    # CPU benchmark: single-process loader vs 4 shared-memory workers
+    python demos/pxs/shm_loader.py --bench --workers 4
+
+    # Same benchmark on a pod with 4 CPUs and 1Gi /dev/shm
+    python demos/pxs/shm_loader.py --bench --workers 4 --remote
+"""
+
+import argparse
+import multiprocessing as mp
+import queue
+import time
+import traceback
+from multiprocessing import shared_memory
+
+import kubetorch as kt
+import numpy as np
+
+# Field name -> (shape per sample without n_points, dtype); PXS sample format
+FIELDS = {"points": ((3,), np.float32), "target": ((1,), np.float32)}
+
+
+def synthetic_sample(index: int, n_points: int) -> dict:
+    """'Decode' sample `index`: a deterministic point cloud with a learnable target."""
+    rng = np.random.default_rng(index)
+    points = rng.normal(size=(n_points, 3)).astype(np.float32)
+    return {"points": points, "target": np.sin(points).sum(axis=1, keepdims=True)}
+
+
+def augment(sample: dict, rng: np.random.Generator) -> dict:
+    """Random rotation about z, isotropic scaling and point jitter."""
+    theta = rng.uniform(0, 2 * np.pi)
+    c, s = np.cos(theta), np.sin(theta)
+    rot = np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]], dtype=np.float32)
+    points = sample["points"] @ rot.T * rng.uniform(0.9, 1.1)
+    points += rng.normal(scale=0.01, size=points.shape).astype(np.float32)
+    return {**sample, "points": points}
+
+
+def _slot_views(buf, slot: int, batch_size: int, n_points: int) -> dict:
+    """numpy views of one ring slot: {field: (batch_size, n_points, *shape) array}."""
+    views, offset = {}, 0
+    slot_bytes = _slot_nbytes(batch_size, n_points)
+    for name, (shape, dtype) in FIELDS.items():
+        full = (batch_size, n_points, *shape)
+        views[name] = np.ndarray(full, dtype=dtype, buffer=buf, offset=slot * slot_bytes + offset)
+        offset += int(np.prod(full)) * np.dtype(dtype).itemsize
+    return views
+
+
+def _slot_nbytes(batch_size: int, n_points: int) -> int:
+    return sum(
+        batch_size * n_points * int(np.prod(shape)) * np.dtype(dtype).itemsize
+        for shape, dtype in FIELDS.values()
+    )
+
+
+def _worker(shm_name, tasks, ready, batch_size, n_points, decode, seed):
+    """Worker process: decode + augment each requested batch directly into its slot."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ready.put(-1)  # started (imports done)
+    try:
+        while (task := tasks.get()) is not None:
+            batch_idx, slot = task
+            views = _slot_views(shm.buf, slot, batch_size, n_points)
+            rng = np.random.default_rng((seed, batch_idx))
+            for j in range(batch_size):
+                sample = augment(decode(batch_idx * batch_size + j, n_points), rng)
+                for name in FIELDS:
+                    views[name][j] = sample[name]
+            del views  # release buffer exports before closing
+            ready.put(batch_idx)
+    except Exception:
+        ready.put(("error", traceback.format_exc()))  # re-raised by the consumer
+    finally:
+        shm.close()
+
+
+class ShmLoader:
+    """Iterate batches decoded by `num_workers` processes via a /dev/shm ring buffer.
+
+    Yielded arrays are views into shared memory and are only valid until the next
+    batch is requested (copy or move them to the GPU before then).
+    """
+
+    def __init__(
+        self,
+        n_samples: int,
+        batch_size: int = 8,
+        n_points: int = 20_000,
+        num_workers: int = 4,
+        prefetch: int = 8,
+        decode=synthetic_sample,
+        seed: int = 0,
+    ):
+        self.n_batches = n_samples // batch_size
+        self.batch_size = batch_size
+        self.n_points = n_points
+        self.prefetch = prefetch
+        self.stall_s = 0.0
+
+        ctx = mp.get_context("spawn")
+        size = prefetch * _slot_nbytes(batch_size, n_points)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._tasks = ctx.Queue()
+        self._ready = ctx.Queue()
+        self._workers = [
+            ctx.Process(
+                target=_worker,
+                args=(self._shm.name, self._tasks, self._ready, batch_size, n_points, decode, seed),
+                daemon=True,
+            )
+            for _ in range(num_workers)
+        ]
+        for w in self._workers:
+            w.start()
+        for _ in self._workers:  # don't count worker start-up as stall time
+            self._next_ready()
+
+    def _next_ready(self, poll_s: float = 1.0) -> int:
+        """Next ready batch index; raises if a worker failed or died."""
+        while True:
+            try:
+                msg = self._ready.get(timeout=poll_s)
+            except queue.Empty:
+                dead = [w for w in self._workers if not w.is_alive()]
+                if dead:
+                    raise RuntimeError(
+                        f"Loader worker exited unexpectedly (exitcode {dead[0].exitcode})"
+                    ) from None
+                continue
+            if isinstance(msg, tuple):
+                raise RuntimeError(f"Loader worker failed:\n{msg[1]}")
+            return msg
+
+    def __len__(self):
+        return self.n_batches
+
+    def __iter__(self):
+        done = set()
+        submitted = 0
+        for batch_idx in range(self.n_batches):
+            # Keep `prefetch` batches in flight; slot k % prefetch is free once k - prefetch
+            # has been consumed, which is guaranteed because we consume in order
+            while submitted < min(batch_idx + self.prefetch, self.n_batches):
+                self._tasks.put((submitted, submitted % self.prefetch))
+                submitted += 1
+            start = time.perf_counter()
+            while batch_idx not in done:
+                done.add(self._next_ready())
+            self.stall_s += time.perf_counter() - start
+            done.discard(batch_idx)
+            yield _slot_views(
+                self._shm.buf, batch_idx % self.prefetch, self.batch_size, self.n_points
+            )
+
+    def close(self):
+        for _ in self._workers:
+            self._tasks.put(None)
+        for w in self._workers:
+            w.join(timeout=5)
+            if w.is_alive():
+                w.terminate()
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SingleProcessLoader:
+    """Baseline: decode + augment inline in the training process (like the PXS demos)."""
+
+    def __init__(self, n_samples: int, batch_size: int = 8, n_points: int = 20_000, seed: int = 0):
+        self.n_batches = n_samples // batch_size
+        self.batch_size = batch_size
+        self.n_points = n_points
+        self.seed = seed
+        self.stall_s = 0.0
+
+    def __iter__(self):
+        for batch_idx in range(self.n_batches):
+            start = time.perf_counter()
+            rng = np.random.default_rng((self.seed, batch_idx))
+            samples = [
+                augment(synthetic_sample(batch_idx * self.batch_size + j, self.n_points), rng)
+                for j in range(self.batch_size)
+            ]
+            batch = {name: np.stack([s[name] for s in samples]) for name in FIELDS}
+            self.stall_s += time.perf_counter() - start
+            yield batch
+
+
+def _consume(loader, step_s: float) -> dict:
+    """Stand-in training loop: touch the batch, then 'compute' for step_s (e.g. on GPU)."""
+    checksum = 0.0
+    n = 0
+    start = time.perf_counter()
+    for batch in loader:
+        checksum += float(batch["points"][:, 0, 0].sum())
+        time.sleep(step_s)
+        n += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "batches": n,
+        "batches_per_s": round(n / elapsed, 1),
+        "stall_s": round(loader.stall_s, 3),
+        "stall_pct": round(100 * loader.stall_s / elapsed, 1),
+        "checksum": round(checksum, 3),
+    }
+
+
+def run_loader_bench(
+    n_samples: int = 512,
+    batch_size: int = 8,
+    n_points: int = 20_000,
+    num_workers: int = 4,
+    prefetch: int = 8,
+    step_ms: float = 20.0,
+) -> dict:
+    """Single-process loader vs ShmLoader, both feeding the same stand-in training loop."""
+    single = _consume(SingleProcessLoader(n_samples, batch_size, n_points), step_ms / 1e3)
+    with ShmLoader(n_samples, batch_size, n_points, num_workers, prefetch) as loader:
+        shm = _consume(loader, step_ms / 1e3)
+    assert shm["checksum"] == single["checksum"], "batches differ between loaders"
+    return {
+        "single_process": single,
+        f"shm_{num_workers}_workers": shm,
+        "speedup": round(shm["batches_per_s"] / single["batches_per_s"], 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared-memory PXS data loader")
+    parser.add_argument("--bench", action="store_true", help="Run the loader benchmark")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--prefetch", type=int, default=8)
+    parser.add_argument("--n-samples", type=int, default=512)
+    parser.add_argument("--n-points", type=int, default=20_000)
+    parser.add_argument("--step-ms", type=float, default=20.0, help="Simulated training step")
+    parser.add_argument("--remote", action="store_true", help="Run the benchmark on a pod")
+    args = parser.parse_args()
+
+    if not args.bench:
+        parser.print_help()
+        raise SystemExit(0)
+
+    bench_kwargs = {
+        "n_samples": args.n_samples,
+        "n_points": args.n_points,
+        "num_workers": args.workers,
+        "prefetch": args.prefetch,
+        "step_ms": args.step_ms,
+    }
+    if args.remote:
+        compute = kt.Compute(
+            cpus=str(args.workers),
+            memory="4Gi",
+            shared_memory_limit="1Gi",  # the ring buffer lives in /dev/shm
+            image=kt.images.Python311().pip_install(["numpy"]),
+            launch_timeout=120,
+        )
+        result = kt.fn(run_loader_bench, name="pxs_shm_loader").to(compute)(**bench_kwargs)
+    else:
+        result = run_loader_bench(**bench_kwargs)
+
+    for name, value in result.items():
+        print(f"{name}: {value}")
@@ -0,0 +1,301 @@
+"""Pack many small Opora training trials into one pod.
+
+The Opora configs in these demos are tiny (3 -> 32 -> 64 -> 1 MLP), so one trial per
+B200 pod (as `demos/sunk/pxs_gpu_train.py` does) leaves the device nearly idle and
+pays the full Slurm scheduling latency every time. `TrialPacker` instead runs
+independent trials in parallel inside one pod:
+- A process pool sized to the pod's CPU budget (its cgroup quota, via
+  `demos/advanced/cpu_budget.py`, not the node's core count) and, on GPU, to device
+  memory per trial
+- Each worker process has its memory capped (RLIMIT_DATA on CPU, a per-process CUDA
+  memory fraction on GPU), so one bad trial can't OOM the rest; workers are reused
+  (torch is imported once per worker) and seeds are reset per trial
+- A worker that dies (OOM-killed, segfault) fails only the trial it was running: the
+  pool is recreated and the unfinished trials resubmitted
+- Results are collected as trials finish; queued trials start as slots free up
+
+If pxs isn't installed (e.g. a local CPU check), an equivalent torch MLP is trained.
+
+Example:
+    # A dozen trials locally on CPU
+    python demos/pxs/trial_packing.py --local --trials 12
+
+    # 64 trials packed onto one B200 pod via SUNK
+    python demos/pxs/trial_packing.py --trials 64
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import kubetorch as kt
+from opora_common import make_data, mlp, opora_config, sunk_b200_compute
+
+ADVANCED_DEMOS = Path(__file__).resolve().parents[1] / "advanced"
+
+_started = None  # worker side: queue of trial ids as they start
+
+
+def train_trial(trial: dict) -> dict:
+    """Train one trial and return its validation MSE (runs inside a pool worker)."""
+    import numpy as np
+    import torch
+
+    # Workers are reused across trials: reseed so results don't depend on trial order
+    torch.manual_seed(trial["id"])
+    np.random.seed(trial["id"])
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    train = make_data(trial.get("n_samples", 100), 50, seed=trial["id"])
+    val = make_data(10, 50, seed=10_000 + trial["id"])
+    start = time.time()
+
+    try:
+        from pxs.models.opora.pytorch.base import OporaPyTorch
+        from pxs.models.opora.pytorch.config.config import OporaPyTorchConfig
+    except ImportError:
+        val_mse = _train_torch_mlp(trial, train, val, device)
+        model_kind = "torch-mlp"
+    else:
+        config = OporaPyTorchConfig(**opora_config(trial["width"], trial["hidden"]))
+        model = OporaPyTorch(config, device=device)
+        model.train(train)
+        val_mse = float(
+            np.mean([(model.predict_one(data=s)["target"] - s["target"]) ** 2 for s in val])
+        )
+        model_kind = "opora"
+
+    return {
+        **trial,
+        "model": model_kind,
+        "val_mse": round(val_mse, 5),
+        "duration_s": round(time.time() - start, 2),
+        "pid": os.getpid(),
+    }
+
+
+def _train_torch_mlp(trial: dict, train: list[dict], val: list[dict], device: str) -> float:
+    import numpy as np
+    import torch
+
+    torch.manual_seed(trial["id"])
+    model = mlp(trial["width"], trial["hidden"]).to(device)
+    x = torch.from_numpy(np.stack([s["points"] for s in train])).to(device)
+    y = torch.from_numpy(np.stack([s["target"] for s in train])).to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=trial["lr"])
+    for _ in range(trial.get("epochs", 20)):
+        for i in range(0, len(x), 10):
+            optimizer.zero_grad()
+            torch.nn.functional.mse_loss(model(x[i : i + 10]), y[i : i + 10]).backward()
+            optimizer.step()
+    with torch.no_grad():
+        vx = torch.from_numpy(np.stack([s["points"] for s in val])).to(device)
+        vy = torch.from_numpy(np.stack([s["target"] for s in val])).to(device)
+        return torch.nn.functional.mse_loss(model(vx), vy).item()
+
+
+def _run_trial(trial: dict) -> dict:
+    """Pool task: announce the trial, so the parent knows what a dead worker was running."""
+    _started.put(trial["id"])
+    return train_trial(trial)
+
+
+def _init_trial_worker(
+    threads: int, memory_mb: int | None, gpu_fraction: float | None, started=None
+):
+    """Pool initializer: pin thread count and cap this trial's memory."""
+    import resource
+
+    import torch
+
+    global _started
+    _started = started
+
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    torch.set_num_threads(threads)
+    if gpu_fraction:
+        torch.cuda.set_per_process_memory_fraction(gpu_fraction)
+    elif memory_mb:
+        # RLIMIT_DATA (heap + private mappings) rather than RLIMIT_AS, which torch's
+        # large virtual reservations would trip long before real memory runs out
+        limit = memory_mb * 1024**2
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+
+class TrialPacker:
+    """Run independent trials in parallel inside one pod.
+
+    Args:
+        max_parallel: Concurrent trials; default derived from CPU budget and GPU memory.
+        threads_per_trial: torch threads per trial.
+        memory_per_trial_mb: Memory cap per trial (host RAM, or GPU memory on GPU).
+        cpus: CPU budget override (default: KT_CPU_BUDGET, else the cgroup quota).
+    """
+
+    def __init__(
+        self,
+        max_parallel: int | None = None,
+        threads_per_trial: int = 1,
+        memory_per_trial_mb: int = 2048,
+        cpus: float | None = None,
+    ):
+        import torch
+
+        if str(ADVANCED_DEMOS) not in sys.path:
+            sys.path.insert(0, str(ADVANCED_DEMOS))
+        from cpu_budget import cpu_budget
+
+        cpu_slots = max(1, cpu_budget(cpus) // threads_per_trial)
+        self.gpu_fraction = None
+        if torch.cuda.is_available():
+            total_mb = torch.cuda.get_device_properties(0).total_memory / 1024**2
+            self.gpu_fraction = min(1.0, memory_per_trial_mb / total_mb)
+            cpu_slots = min(cpu_slots, int(1 / self.gpu_fraction))
+        self.max_parallel = max_parallel or cpu_slots
+        self.threads_per_trial = threads_per_trial
+        self.memory_per_trial_mb = memory_per_trial_mb
+
+    def run(self, trials: list[dict], on_result=None) -> list[dict]:
+        """Run all trials; results are returned (and passed to `on_result`) as they finish.
+
+        A dead worker breaks the whole pool. Trials that were in flight then rerun one
+        at a time, so the trial that kills its worker again is the only one failed; the
+        others are resubmitted to a fresh pool.
+        """
+        results = []
+        pending = {t["id"]: t for t in trials}
+        suspects = []
+        while pending:
+            batch = suspects or list(pending.values())
+            workers = 1 if suspects else self.max_parallel
+            finished, in_flight = self._run_pool(batch, workers, on_result)
+            results += finished
+            for r in finished:
+                pending.pop(r["id"], None)
+            if in_flight is None:
+                suspects = []
+                continue
+            if not in_flight:
+                raise RuntimeError("Trial workers died before starting any trial")
+            if len(in_flight) == 1:
+                trial = pending.pop(next(iter(in_flight)))
+                result = {**trial, "error": "worker died (OOM-killed or crashed)"}
+                results.append(result)
+                if on_result:
+                    on_result(result)
+            suspects = [pending[i] for i in in_flight if i in pending]
+        return results
+
+    def _run_pool(self, trials: list[dict], workers: int, on_result) -> tuple[list, set | None]:
+        """Run trials in one pool: (results, ids in flight if a worker died, else None)."""
+        import multiprocessing as mp
+
+        ctx = mp.get_context("spawn")
+        started_queue = ctx.SimpleQueue()
+        started, finished, broken = set(), [], False
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_trial_worker,
+            initargs=(
+                self.threads_per_trial,
+                self.memory_per_trial_mb,
+                self.gpu_fraction,
+                started_queue,
+            ),
+        ) as pool:
+            futures = {pool.submit(_run_trial, t): t for t in trials}
+            for future in as_completed(futures):
+                while not started_queue.empty():  # drain, so workers never block on it
+                    started.add(started_queue.get())
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    continue
+                except Exception as e:  # a failed/OOM trial doesn't stop the sweep
+                    result = {**futures[future], "error": f"{type(e).__name__}: {e}"}
+                finished.append(result)
+                if on_result:
+                    on_result(result)
+        if not broken:
+            return finished, None
+        while not started_queue.empty():
+            started.add(started_queue.get())
+        return finished, started - {r["id"] for r in finished}
+
+
+def make_trials(n: int) -> list[dict]:
+    """Grid over block width, hidden width and learning rate (first n combinations)."""
+    grid = itertools.product([16, 32, 64, 128], [16, 32, 64], [1e-3, 3e-3, 1e-2])
+    return [
+        {"id": i, "width": w, "hidden": h, "lr": lr}
+        for i, (w, h, lr) in zip(range(n), itertools.cycle(grid))
+    ]
+
+
+def run_packed_sweep(n_trials: int = 12, pod_overhead_s: float = 120.0, **packer_kwargs) -> dict:
+    """Run n trials packed into this process's pod; compare with one trial per pod."""
+    packer = TrialPacker(**packer_kwargs)
+    print(f"Packing {n_trials} trials, {packer.max_parallel} at a time...")
+    start = time.time()
+    results = packer.run(
+        make_trials(n_trials),
+        on_result=lambda r: print(
+            f"  trial {r['id']:>3} done: {r.get('val_mse', r.get('error'))} ({r.get('duration_s')}s)"
+        ),
+    )
+    wall = time.time() - start
+    ok = [r for r in results if "error" not in r]
+    mean_trial_s = sum(r["duration_s"] for r in ok) / max(len(ok), 1)
+    return {
+        "n_trials": n_trials,
+        "failed": len(results) - len(ok),
+        "parallel_slots": packer.max_parallel,
+        "wall_s": round(wall, 1),
+        "packed_trials_per_hour": round(n_trials / wall * 3600),
+        # One trial per pod: every trial pays scheduling + pod start-up again. An
+        # estimate from the assumed overhead (--pod-overhead-s), not a measurement
+        "one_per_pod_trials_per_hour_est": round(3600 / (pod_overhead_s + mean_trial_s)),
+        "assumed_pod_overhead_s": pod_overhead_s,
+        "one_per_pod_note": "estimated from assumed_pod_overhead_s, not measured",
+        "best": min(ok, key=lambda r: r["val_mse"]) if ok else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack small Opora trials into one pod")
+    parser.add_argument("--local", action="store_true", help="Run on this machine (CPU)")
+    parser.add_argument("--trials", type=int, default=12)
+    parser.add_argument("--parallel", type=int, help="Override concurrent trial slots")
+    parser.add_argument("--memory-mb", type=int, default=2048, help="Memory cap per trial")
+    parser.add_argument(
+        "--pod-overhead-s",
+        type=float,
+        default=120.0,
+        help="Scheduling + start-up per pod for the one-trial-per-pod comparison",
+    )
+    args = parser.parse_args()
+
+    sweep_kwargs = {
+        "n_trials": args.trials,
+        "pod_overhead_s": args.pod_overhead_s,
+        "max_parallel": args.parallel,
+        "memory_per_trial_mb": args.memory_mb,
+    }
+    if args.local:
+        summary = run_packed_sweep(**sweep_kwargs)
+    else:
+        compute = sunk_b200_compute("PXS packed trials via Kubetorch")
+        remote_fn = kt.fn(run_packed_sweep, name="pxs_trial_packing").to(compute)
+        summary = remote_fn(**sweep_kwargs)
+
+    print("\n" + "=" * 50)
+    print("RESULTS")
+    print("=" * 50)
+    for k, v in summary.items():
+        print(f"  {k}: {v}")
@@ -0,0 +1,462 @@
+"""Run the demo suite concurrently, one pod per distinct compute spec.
+
+Running each demo script in turn deploys and waits sequentially, even though many
+of them ask for identical compute (e.g. `kt.Compute(cpus="0.1", launch_timeout=60)`).
+This runner:
+- Discovers entry points statically (AST): each `kt.fn(<func>).to(<compute>)` in a
+  demo whose function can be called without arguments
+- Groups them by compute spec (the `kt.Compute(...)` expression with variables
+  inlined, so textual identity means identical compute)
+- Deploys one host pod per group (`LeaseHost` from `sunk/sunk_lease.py`), all groups
+  concurrently, and runs every function of a group on that pod
+- Limits concurrent deploys + calls per namespace (e.g. one at a time on the SUNK
+  namespace), and collects pass/fail and timings into one report
+
+`FakeBackend` replaces the cluster with sleeps (and injectable failures), so the
+discovery, grouping, scheduling and report run end to end locally.
+
+Example:
+    # What would run, and how it groups
+    python demos/run_suite.py --list
+
+    # End to end against the fake backend
+    python demos/run_suite.py --fake --report /tmp/suite.json
+
+    # On the cluster (GPU/B200 jobs and long benchmarks need --include-gpu)
+    python demos/run_suite.py --limit default=4 --limit tenant-slurm=1
+"""
+
+import argparse
+import ast
+import builtins
+import fnmatch
+import hashlib
+import importlib.util
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DEMOS_DIR = Path(__file__).resolve().parent
+REPO_ROOT = DEMOS_DIR.parent
+
+# Interactive or multi-pod demos that can't run unattended on a shared host pod
+DEFAULT_EXCLUDE = ["warmstart/breakpoint_debug.py", "warmstart/ssh_into_pod.py"]
+# B200 jobs and long benchmarks, run only with --include-gpu (as is anything requesting gpus)
+HEAVY = [
+    "pxs/execution_modes.py:run_mode_benchmark",
+    "pxs/trial_packing.py:run_packed_sweep",
+    "sunk/pxs_gpu_train.py:run_opora_gpu",
+    "sunk/checkpointing.py:run_checkpoint_bench",
+]
+# Compute helpers whose namespace isn't visible in the call expression
+HELPER_NAMESPACES = {"sunk_b200_compute": "tenant-slurm"}
+# kt.Compute kwargs that don't change what the pod is (labels do: demos read them)
+GROUPING_IGNORED = ("launch_timeout",)
+
+
+class _Inline(ast.NodeTransformer):
+    """Replace variable names with their assigned expressions (recursively)."""
+
+    def __init__(self, assignments: dict, imported: set[str], line: int):
+        self.assignments = assignments
+        self.known = imported | set(dir(builtins))
+        self.line = line
+        self.unresolved = set()
+        self._depth = 0
+
+    def visit_Name(self, node):
+        candidates = [(ln, e) for ln, e in self.assignments.get(node.id, []) if ln <= self.line]
+        if not candidates or self._depth > 5:
+            if node.id not in self.known:
+                self.unresolved.add(node.id)
+            return node
+        line, expr = candidates[-1]  # the closest preceding assignment
+        if "parse_args(" in ast.unparse(expr):  # CLI values are only known at run time
+            self.unresolved.add(node.id)
+            return node
+        self._depth += 1
+        saved, self.line = self.line, line
+        try:
+            return self.visit(ast.parse(ast.unparse(expr), mode="eval").body)
+        finally:
+            self.line = saved
+            self._depth -= 1
+
+
+def _calls_without_args(fn: ast.FunctionDef) -> bool:
+    args = fn.args
+    required = len(args.posonlyargs) + len(args.args) - len(args.defaults)
+    kw_required = any(d is None for d in args.kw_defaults)
+    return required == 0 and not kw_required
+
+
+def _module_scope(tree: ast.Module) -> tuple[dict, dict, set[str], set[str]]:
+    """Module-level functions, every `name = ...` assignment (with line), imported names,
+    and names that `.distribute(...)` is called on."""
+    functions = {n.name: n for n in tree.body if isinstance(n, ast.FunctionDef)}
+    assignments, imported, distributed = {}, set(), set()
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "distribute"
+            and isinstance(node.func.value, ast.Name)
+        ):
+            distributed.add(node.func.value.id)
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    assignments.setdefault(target.id, []).append((node.lineno, node.value))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            imported |= {(a.asname or a.name).split(".")[0] for a in node.names}
+    return functions, assignments, imported, distributed
+
+
+def _is_fn_to(node) -> bool:
+    """`kt.fn(<name>, ...).to(<compute>)`"""
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "to"
+        and isinstance(node.func.value, ast.Call)
+        and ast.unparse(node.func.value.func) == "kt.fn"
+        and bool(node.func.value.args)
+        and isinstance(node.func.value.args[0], ast.Name)
+        and bool(node.args)
+    )
+
+
+def discover(demos_dir: Path = DEMOS_DIR) -> list[dict]:
+    """Every `kt.fn(f).to(compute)` entry point under demos_dir."""
+    entries = []
+    for path in sorted(demos_dir.rglob("*.py")):
+        if path.name == Path(__file__).name:
+            continue
+        tree = ast.parse(path.read_text(), filename=str(path))
+        functions, assignments, imported, distributed = _module_scope(tree)
+        for node in filter(_is_fn_to, ast.walk(tree)):
+            fn_name = node.func.value.args[0].id
+            inliner = _Inline(assignments, imported, node.lineno)
+            compute = ast.unparse(inliner.visit(ast.parse(ast.unparse(node.args[0])).body[0]))
+            entry = {
+                "demo": str(path.relative_to(demos_dir)),
+                "function": fn_name,
+                "compute": compute,
+                "namespace": _namespace(compute),
+                "skip": None,
+            }
+            if fn_name not in functions:
+                entry["skip"] = "function not defined at module level"
+            elif not _calls_without_args(functions[fn_name]):
+                entry["skip"] = "function needs arguments"
+            elif inliner.unresolved:
+                entry["skip"] = f"compute depends on runtime values {sorted(inliner.unresolved)}"
+            elif ".distribute(" in compute or ast.unparse(node.args[0]) in distributed:
+                entry["skip"] = "distributed compute (multi-pod)"
+            entries.append(entry)
+    return entries
+
+
+def _namespace(compute_expr: str) -> str:
+    for node in ast.walk(ast.parse(compute_expr)):
+        if not isinstance(node, ast.Call):
+            continue
+        name = ast.unparse(node.func)
+        if name in HELPER_NAMESPACES:
+            return HELPER_NAMESPACES[name]
+        if name == "kt.Compute":
+            for kw in node.keywords:
+                if kw.arg == "namespace" and isinstance(kw.value, ast.Constant):
+                    return kw.value.value
+    return "default"
+
+
+def _is_heavy(entry: dict) -> bool:
+    """A listed heavy entry point, or compute that requests GPUs."""
+    if f"{entry['demo']}:{entry['function']}" in HEAVY:
+        return True
+    for node in ast.walk(ast.parse(entry["compute"])):
+        if isinstance(node, ast.keyword) and node.arg == "gpus":
+            return not (isinstance(node.value, ast.Constant) and node.value.value is None)
+    return False
+
+
+def select(entries, include=None, exclude=None, include_gpu: bool = False) -> list[dict]:
+    """Mark entries not matching the include/exclude globs (on the demo path) as skipped,
+    and GPU/heavy ones unless `include_gpu`."""
+    for e in entries:
+        if e["skip"]:
+            continue
+        if not include_gpu and _is_heavy(e):
+            e["skip"] = "GPU or heavy job (pass --include-gpu)"
+        elif include and not any(fnmatch.fnmatch(e["demo"], p) for p in include):
+            e["skip"] = "not included"
+        elif any(fnmatch.fnmatch(e["demo"], p) for p in exclude or []):
+            e["skip"] = "excluded"
+    return entries
+
+
+def _split_compute(compute_expr: str) -> tuple[str, float | None]:
+    """(spec without launch_timeout, launch_timeout). The timeout only bounds the client's
+    wait, so it shouldn't stop two demos sharing a pod."""
+    tree = ast.parse(compute_expr, mode="eval")
+    timeout = None
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and ast.unparse(node.func) == "kt.Compute":
+            for kw in [k for k in node.keywords if k.arg in GROUPING_IGNORED]:
+                if kw.arg == "launch_timeout" and isinstance(kw.value, ast.Constant):
+                    timeout = kw.value.value
+                node.keywords.remove(kw)
+    return ast.unparse(tree), timeout
+
+
+def _with_timeout(spec: str, timeout: float | None) -> str:
+    if timeout is None:
+        return spec
+    tree = ast.parse(spec, mode="eval")
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and ast.unparse(node.func) == "kt.Compute":
+            node.keywords.append(ast.keyword("launch_timeout", ast.Constant(timeout)))
+    return ast.unparse(tree)
+
+
+def group_by_compute(entries) -> dict[str, dict]:
+    """{group id: {compute, namespace, entries}} for the runnable entries.
+
+    The group's compute is the shared spec with the longest launch_timeout of its entries.
+    """
+    groups = {}
+    for e in entries:
+        if e["skip"]:
+            continue
+        spec, timeout = _split_compute(e["compute"])
+        gid = hashlib.sha1(spec.encode()).hexdigest()[:8]
+        group = groups.setdefault(
+            gid,
+            {"id": gid, "spec": spec, "timeout": None, "namespace": e["namespace"], "entries": []},
+        )
+        if timeout is not None:
+            group["timeout"] = max(group["timeout"] or 0, timeout)
+        group["compute"] = _with_timeout(spec, group["timeout"])
+        group["entries"].append(e)
+    return groups
+
+
+def _add_path(path: Path):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+
+class KubetorchBackend:
+    """Deploy a LeaseHost per group and run the group's functions on it."""
+
+    def __init__(self):
+        self._modules = {}  # demo path -> module, each imported once
+        self._lock = threading.Lock()
+
+    def _module(self, demo: Path):
+        """The demo module (for the names its compute spec uses), imported on first use."""
+        with self._lock:
+            if demo not in self._modules:
+                _add_path(demo.parent)  # demos import their siblings by bare name
+                name = f"suite_{demo.parent.name}_{demo.stem}"
+                spec = importlib.util.spec_from_file_location(name, demo)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                self._modules[demo] = module
+            return self._modules[demo]
+
+    def deploy(self, group):
+        import kubetorch as kt
+
+        _add_path(DEMOS_DIR / "sunk")
+        from sunk_lease import LeaseHost
+
+        # Demos build their compute under __main__, so there is no module-level object;
+        # the spec is built once per group from its expression, in the demo's namespace
+        module = self._module(DEMOS_DIR / group["entries"][0]["demo"])
+        compute = eval(group["compute"], {**vars(module), "kt": kt})
+        return kt.cls(LeaseHost, name=f"suite-{group['id']}").to(compute)
+
+    def call(self, host, entry):
+        demo = DEMOS_DIR / entry["demo"]
+        rel_dir = str(demo.parent.relative_to(REPO_ROOT))
+        return host.call(rel_dir, demo.stem, entry["function"], [], {})
+
+    def teardown(self, host):
+        host.teardown()
+
+
+class FakeBackend:
+    """Local stand-in: sleeps for deploys/calls; entries matching `fail` raise."""
+
+    def __init__(self, deploy_s: float = 0.5, call_s: float = 0.2, fail: list[str] | None = None):
+        self.deploy_s = deploy_s
+        self.call_s = call_s
+        self.fail = fail or []
+        self.deploys = 0
+        self._lock = threading.Lock()
+
+    def deploy(self, group):
+        time.sleep(self.deploy_s)
+        with self._lock:
+            self.deploys += 1
+        return group["id"]
+
+    def call(self, host, entry):
+        time.sleep(self.call_s)
+        if any(fnmatch.fnmatch(entry["demo"], p) for p in self.fail):
+            raise RuntimeError(f"injected failure in {entry['demo']}")
+        return f"{entry['function']} ok on {host}"
+
+    def teardown(self, host):
+        pass
+
+
+def run_suite(
+    groups: dict, backend, limits: dict[str, int] | None = None, default_limit: int = 4
+) -> dict:
+    """Deploy all groups concurrently and run their calls, within per-namespace limits."""
+    limits = limits or {}
+    semaphores = {}
+    for group in groups.values():
+        ns = group["namespace"]
+        semaphores.setdefault(ns, threading.BoundedSemaphore(limits.get(ns, default_limit)))
+    results = []
+    lock = threading.Lock()
+
+    def run_call(group, host, entry):
+        with semaphores[group["namespace"]]:
+            start = time.perf_counter()
+            try:
+                output, status = backend.call(host, entry), "pass"
+            except Exception as e:
+                output, status = f"{type(e).__name__}: {e}", "fail"
+        with lock:
+            results.append(
+                {
+                    **entry,
+                    "group": group["id"],
+                    "status": status,
+                    "call_s": round(time.perf_counter() - start, 2),
+                    "deploy_s": group["deploy_s"],
+                    "output": str(output)[:200],
+                }
+            )
+
+    def run_group(group, pool):
+        with semaphores[group["namespace"]]:
+            start = time.perf_counter()
+            try:
+                host = backend.deploy(group)
+                error = None
+            except Exception as e:
+                host, error = None, f"deploy failed: {type(e).__name__}: {e}"
+            group["deploy_s"] = round(time.perf_counter() - start, 2)
+        if error:
+            with lock:
+                results.extend(
+                    {
+                        **e,
+                        "group": group["id"],
+                        "status": "fail",
+                        "call_s": 0.0,
+                        "deploy_s": group["deploy_s"],
+                        "output": error,
+                    }
+                    for e in group["entries"]
+                )
+            return
+        try:
+            calls = [pool.submit(run_call, group, host, e) for e in group["entries"]]
+            for c in calls:
+                c.result()
+        finally:
+            backend.teardown(host)
+
+    start = time.perf_counter()
+    n_calls = sum(len(g["entries"]) for g in groups.values())
+    with ThreadPoolExecutor(max(1, n_calls)) as call_pool:
+        with ThreadPoolExecutor(max(1, len(groups))) as group_pool:
+            for f in [group_pool.submit(run_group, g, call_pool) for g in groups.values()]:
+                f.result()
+    wall = time.perf_counter() - start
+
+    sequential = sum(r["deploy_s"] + r["call_s"] for r in results)
+    return {
+        "entries": len(results),
+        "passed": sum(r["status"] == "pass" for r in results),
+        "failed": sum(r["status"] == "fail" for r in results),
+        "pods": len(groups),
+        "wall_s": round(wall, 2),
+        # One deploy per demo, one after another (running the scripts in turn)
+        "sequential_estimate_s": round(sequential, 2),
+        "results": sorted(results, key=lambda r: (r["group"], r["demo"])),
+    }
+
+
+def print_report(report: dict, skipped: list[dict]):
+    print(f"{'status':<6} {'group':<9} {'demo':<36} {'function':<22} {'deploy':>7} {'call':>7}")
+    for r in report["results"]:
+        print(
+            f"{r['status']:<6} {r['group']:<9} {r['demo']:<36} {r['function']:<22}"
+            f" {r['deploy_s']:>6.1f}s {r['call_s']:>6.1f}s"
+        )
+        if r["status"] == "fail":
+            print(f"       {r['output']}")
+    for e in skipped:
+        print(f"{'skip':<6} {'-':<9} {e['demo']:<36} {e['function']:<22}  ({e['skip']})")
+    print(
+        f"\n{report['passed']}/{report['entries']} passed on {report['pods']} pod(s) in "
+        f"{report['wall_s']}s (sequential estimate {report['sequential_estimate_s']}s)"
+    )
+
+
+def _parse_limits(values: list[str]) -> dict[str, int]:
+    limits = {}
+    for v in values:
+        ns, _, n = v.partition("=")
+        limits[ns] = int(n)
+    return limits
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the demo suite concurrently")
+    parser.add_argument("--list", action="store_true", help="Show entries and groups only")
+    parser.add_argument("--fake", action="store_true", help="Use the local fake backend")
+    parser.add_argument("--include", action="append", help="Glob on demo path, e.g. 'basics/*'")
+    parser.add_argument("--exclude", action="append", default=list(DEFAULT_EXCLUDE))
+    parser.add_argument(
+        "--include-gpu", action="store_true", help="Also run B200 jobs and long benchmarks"
+    )
+    parser.add_argument(
+        "--limit", action="append", default=[], metavar="NS=N", help="Per-namespace limit"
+    )
+    parser.add_argument("--default-limit", type=int, default=4)
+    parser.add_argument("--fail", action="append", help="Fake backend: glob of demos to fail")
+    parser.add_argument("--report", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    entries = select(discover(), args.include, args.exclude, args.include_gpu)
+    groups = group_by_compute(entries)
+    skipped = [e for e in entries if e["skip"]]
+
+    if args.list:
+        for group in groups.values():
+            print(f"[{group['id']}] ns={group['namespace']}  {group['compute']}")
+            for e in group["entries"]:
+                print(f"    {e['demo']}:{e['function']}")
+        for e in skipped:
+            print(f"  skip {e['demo']}:{e['function']} ({e['skip']})")
+        raise SystemExit(0)
+
+    backend = FakeBackend(fail=args.fail) if args.fake else KubetorchBackend()
+    report = run_suite(groups, backend, _parse_limits(args.limit), args.default_limit)
+    print_report(report, skipped)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({**report, "skipped": skipped}, f, indent=2)
+    raise SystemExit(1 if report["failed"] else 0)
@@ -0,0 +1,371 @@
+"""Asynchronous, rank-sharded checkpointing to a mounted PVC.
+
+`AsyncCheckpointer.save()` only snapshots this rank's share of the state into
+host memory; a background thread writes it to disk while training continues.
+
+Layout under `root` (e.g. /mnt/data/checkpoints/<run>):
+    step_00000100/rank_00000.pt   # this rank's shard of the flattened state
+    step_00000100/rank_00000.done # written after the shard is fully on disk
+    latest                        # {"step": 100, "dir": "step_00000100", "world_size": 2}
+
+Rank 0 moves `latest` (atomic rename) only once every rank's shard is done, and
+keeps the last `keep_last` complete checkpoints. With several ranks, whether a save
+is taken or skipped (a writer still behind) is decided collectively, so every rank
+writes the same steps. On SIGTERM (SUNK gives us 5s)
+the most recent snapshot is flushed before the process exits.
+
+Example:
+    # Step-time overhead: async vs synchronous torch.save (local temp dir)
+    python demos/sunk/checkpointing.py --bench
+
+    # Same benchmark on a pod, writing to the slurm-data PVC
+    python demos/sunk/checkpointing.py --bench --remote
+"""
+
+import argparse
+import copy
+import json
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+import kubetorch as kt
+import torch
+
+
+def flatten_state(state: dict, prefix: tuple = ()) -> dict:
+    """Flatten nested dicts into {path tuple: leaf}, e.g. ("optimizer", "state", 0, "exp_avg")."""
+    flat = {}
+    for key, value in state.items():
+        if isinstance(value, dict) and value:
+            flat.update(flatten_state(value, (*prefix, key)))
+        else:
+            flat[(*prefix, key)] = value
+    return flat
+
+
+def unflatten_state(flat: dict) -> dict:
+    """Inverse of flatten_state."""
+    state = {}
+    for path, value in flat.items():
+        node = state
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return state
+
+
+def shard_assignment(flat: dict, world_size: int) -> dict:
+    """Assign each leaf to a rank, balancing bytes (largest-first, least-loaded rank).
+
+    Deterministic given the state structure, so every rank computes the same split.
+    Non-tensor leaves (step counters, param_groups) are small and go to rank 0.
+    """
+    loads = [0] * world_size
+    owner = {}
+    tensors = [(p, v) for p, v in flat.items() if isinstance(v, torch.Tensor)]
+    for path, value in sorted(tensors, key=lambda pv: (-pv[1].nbytes, repr(pv[0]))):
+        rank = loads.index(min(loads))
+        owner[path] = rank
+        loads[rank] += value.nbytes
+    for path in flat:
+        owner.setdefault(path, 0)
+    return owner
+
+
+def _snapshot(value):
+    """Copy a leaf into host memory so training can keep mutating the original."""
+    if isinstance(value, torch.Tensor):
+        return value.detach().to("cpu", copy=True)
+    return copy.deepcopy(value)
+
+
+def _write_json_atomic(path: str, data: dict):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class AsyncCheckpointer:
+    """Snapshot-then-write checkpointer; one instance per rank.
+
+    Args:
+        root: Checkpoint directory shared by all ranks (the PVC mount).
+        rank: This process's rank.
+        world_size: Number of ranks sharing the write.
+        keep_last: Number of complete checkpoints to keep.
+        handle_sigterm: Flush the latest snapshot on SIGTERM (main thread only).
+        commit_timeout: How long rank 0 waits for other ranks' shards before
+            giving up on moving `latest` to that step.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        rank: int = 0,
+        world_size: int = 1,
+        keep_last: int = 3,
+        handle_sigterm: bool = True,
+        commit_timeout: float = 120.0,
+    ):
+        self.root = root
+        self.rank = rank
+        self.world_size = world_size
+        self.keep_last = keep_last
+        self.commit_timeout = commit_timeout
+        os.makedirs(root, exist_ok=True)
+
+        # Single pending slot: if the writer is still busy, a newer snapshot replaces
+        # an unwritten older one (one rank) or is skipped on every rank (several ranks)
+        # instead of queueing up behind it.
+        self._pending: tuple[int, dict] | None = None
+        self._busy = False
+        self._cond = threading.Condition()
+        self._closed = False
+        self.stats = {"saves": 0, "writes": 0, "skipped": 0, "snapshot_s": 0.0, "write_s": 0.0}
+        self._thread = threading.Thread(target=self._writer, name="ckpt-writer", daemon=True)
+        self._thread.start()
+
+        self._prev_sigterm = None
+        if handle_sigterm and threading.current_thread() is threading.main_thread():
+            self._prev_sigterm = signal.signal(signal.SIGTERM, self._on_sigterm)
+
+    def save(self, step: int, state: dict):
+        """Snapshot this rank's shard of `state` to host memory and return immediately.
+
+        With several ranks this is a collective (all ranks call it at the same steps):
+        if any rank still has an unwritten snapshot, every rank skips this one.
+        """
+        if self.world_size > 1:
+            with self._cond:
+                behind = self._pending is not None
+            if self._any_rank(behind):
+                self.stats["skipped"] += 1
+                return
+        start = time.perf_counter()
+        flat = flatten_state(state)
+        owner = shard_assignment(flat, self.world_size)
+        shard = {p: _snapshot(v) for p, v in flat.items() if owner[p] == self.rank}
+        self.stats["snapshot_s"] += time.perf_counter() - start
+        self.stats["saves"] += 1
+
+        with self._cond:
+            if self._pending is not None:
+                self.stats["skipped"] += 1
+            self._pending = (step, shard)
+            self._cond.notify_all()
+
+    def _any_rank(self, flag: bool) -> bool:
+        """True if `flag` is set on any rank (this rank's flag without torch.distributed)."""
+        import torch.distributed as dist
+
+        if not (dist.is_available() and dist.is_initialized()):
+            return flag
+        device = "cuda" if dist.get_backend() == "nccl" else "cpu"
+        t = torch.tensor([int(flag)], device=device)
+        dist.all_reduce(t, op=dist.ReduceOp.MAX)
+        return bool(t.item())
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until every snapshot taken so far is on disk; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def load_latest(self, map_location="cpu") -> tuple[int, dict] | None:
+        """Load and merge all shards of the latest complete checkpoint, or None."""
+        latest = self._read_latest()
+        if latest is None:
+            return None
+        step_dir = os.path.join(self.root, latest["dir"])
+        flat = {}
+        for r in range(latest["world_size"]):
+            shard_path = os.path.join(step_dir, f"rank_{r:05d}.pt")
+            flat.update(torch.load(shard_path, map_location=map_location, weights_only=True))
+        return latest["step"], unflatten_state(flat)
+
+    def _read_latest(self) -> dict | None:
+        try:
+            with open(os.path.join(self.root, "latest")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _writer(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._closed)
+                if self._pending is None:
+                    return
+                step, shard = self._pending
+                self._pending = None
+                self._busy = True
+            try:
+                start = time.perf_counter()
+                self._write_shard(step, shard)
+                if self.rank == 0:
+                    self._commit(step)
+                self.stats["write_s"] += time.perf_counter() - start
+                self.stats["writes"] += 1
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _write_shard(self, step: int, shard: dict):
+        step_dir = os.path.join(self.root, f"step_{step:08d}")
+        os.makedirs(step_dir, exist_ok=True)
+        path = os.path.join(step_dir, f"rank_{self.rank:05d}.pt")
+        with open(f"{path}.tmp", "wb") as f:
+            torch.save(shard, f)
+            f.flush()
+            os.fsync(f.fileno())  # must really be on the PVC before we report it done
+        os.replace(f"{path}.tmp", path)
+        open(os.path.join(step_dir, f"rank_{self.rank:05d}.done"), "w").close()
+
+    def _commit(self, step: int):
+        """Rank 0: point `latest` at `step` once all shards are written, then prune."""
+        step_dir = os.path.join(self.root, f"step_{step:08d}")
+        done = [os.path.join(step_dir, f"rank_{r:05d}.done") for r in range(self.world_size)]
+        deadline = time.time() + self.commit_timeout
+        while not all(os.path.exists(d) for d in done):
+            if time.time() > deadline or self._newer_step_done(step):
+                # A rank that moved on to a newer step won't write this one
+                print(f"[Rank 0] checkpoint step {step} incomplete; keeping previous latest")
+                return
+            time.sleep(0.05)
+
+        _write_json_atomic(
+            os.path.join(self.root, "latest"),
+            {"step": step, "dir": os.path.basename(step_dir), "world_size": self.world_size},
+        )
+        step_dirs = sorted(d for d in os.listdir(self.root) if d.startswith("step_"))
+        keep = set(step_dirs[-self.keep_last :])
+        for d in step_dirs:
+            if d not in keep and d < os.path.basename(step_dir):
+                shutil.rmtree(os.path.join(self.root, d), ignore_errors=True)
+
+    def _newer_step_done(self, step: int) -> bool:
+        """Whether some rank has finished a shard of a step after `step`."""
+        newer = [
+            d for d in os.listdir(self.root) if d.startswith("step_") and d > f"step_{step:08d}"
+        ]
+        return any(
+            name.endswith(".done") for d in newer for name in os.listdir(os.path.join(self.root, d))
+        )
+
+    def _on_sigterm(self, signum, frame):
+        # Preemption: we get terminationGracePeriodSeconds (5s on SUNK) to flush
+        print(f"[Rank {self.rank}] SIGTERM: flushing latest checkpoint snapshot...")
+        flushed = self.flush(timeout=4.0)
+        print(f"[Rank {self.rank}] flush {'complete' if flushed else 'timed out'}")
+        if callable(self._prev_sigterm):
+            self._prev_sigterm(signum, frame)
+        else:
+            raise SystemExit(128 + signum)
+
+
+def run_checkpoint_bench(
+    steps: int = 60,
+    every: int = 5,
+    width: int = 2048,
+    layers: int = 6,
+    root: str | None = None,
+) -> dict:
+    """Mean training step time with no checkpointing, sync torch.save and AsyncCheckpointer."""
+    if root:
+        os.makedirs(root, exist_ok=True)
+    root = tempfile.mkdtemp(prefix="ckpt_bench_", dir=root)  # removed again at the end
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(*[torch.nn.Linear(width, width) for _ in range(layers)])
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-4)
+    x = torch.randn(64, width)
+
+    def train(save_fn) -> float:
+        times = []
+        for step in range(1, steps + 1):
+            start = time.perf_counter()
+            optimizer.zero_grad()
+            model(x).pow(2).mean().backward()
+            optimizer.step()
+            if save_fn and step % every == 0:
+                save_fn(step, {"model": model.state_dict(), "optimizer": optimizer.state_dict()})
+            times.append(time.perf_counter() - start)
+        return sum(times) / len(times)
+
+    def sync_save(step, state):
+        path = os.path.join(root, "sync", f"step_{step:08d}.pt")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            torch.save(state, f)
+            f.flush()
+            os.fsync(f.fileno())  # same durability as the async writer
+
+    baseline = train(None)
+    sync = train(sync_save)
+    ckpt = AsyncCheckpointer(os.path.join(root, "async"), handle_sigterm=False)
+    async_ = train(ckpt.save)
+    ckpt.close()
+
+    n_bytes = sum(p.nbytes for p in model.parameters()) * 3  # params + Adam moments
+    shutil.rmtree(root, ignore_errors=True)
+    return {
+        "state_mb": round(n_bytes / 1e6, 1),
+        "checkpoint_every": every,
+        "baseline_step_ms": round(baseline * 1e3, 2),
+        "sync_step_ms": round(sync * 1e3, 2),
+        "async_step_ms": round(async_ * 1e3, 2),
+        "sync_overhead_pct": round((sync / baseline - 1) * 100, 1),
+        "async_overhead_pct": round((async_ / baseline - 1) * 100, 1),
+        "async_snapshot_ms_per_save": round(
+            ckpt.stats["snapshot_s"] / ckpt.stats["saves"] * 1e3, 1
+        ),
+        "async_write_ms_per_save": round(
+            ckpt.stats["write_s"] / max(ckpt.stats["writes"], 1) * 1e3, 1
+        ),
+        "async_snapshots_superseded": ckpt.stats["skipped"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async checkpoint step-time benchmark")
+    parser.add_argument("--bench", action="store_true", help="Run the step-time benchmark")
+    parser.add_argument("--steps", type=int, default=60)
+    parser.add_argument("--every", type=int, default=5, help="Checkpoint every N steps")
+    parser.add_argument("--dir", help="Parent dir to write under (default: system temp)")
+    parser.add_argument("--remote", action="store_true", help="Run on a pod against the PVC")
+    args = parser.parse_args()
+
+    if not args.bench:
+        parser.print_help()
+        raise SystemExit(0)
+
+    print("Benchmarking checkpoint overhead (no ckpt vs torch.save vs AsyncCheckpointer)...")
+    if args.remote:
+        vol = kt.Volume.from_name(
+            name="slurm-data", namespace="tenant-slurm", mount_path="/mnt/data"
+        )
+        compute = kt.Compute(
+            cpus="4",
+            memory="8Gi",
+            image=kt.images.Python311().pip_install(["torch"]),
+            namespace="tenant-slurm",
+            volumes=[vol],
+            launch_timeout=120,
+        )
+        bench_fn = kt.fn(run_checkpoint_bench, name="sunk_ckpt_bench").to(compute)
+        result = bench_fn(args.steps, args.every, root=args.dir or "/mnt/data/ckpt_bench")
+    else:
+        result = run_checkpoint_bench(args.steps, args.every, root=args.dir)
+    for k, v in result.items():
+        print(f"  {k}: {v}")
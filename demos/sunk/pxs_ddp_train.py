@@ -0,0 +1,323 @@
+"""Data-parallel (DDP) training of a PXS Opora model across ranks.
+
+Unlike `pxs_gpu_train.py` (single GPU, `model.train(data)`), every rank here:
+- Loads or generates only its own shard of the dataset
+- Wraps the underlying torch module in DistributedDataParallel (bucketed gradients)
+- Contributes its metrics to a single summary aggregated on rank 0
+
+Runs with nccl on GPUs and gloo on CPU. If pxs isn't installed (e.g. a local
+CPU check), an equivalent plain-torch MLP (3 -> 32 -> 64 -> 1) is used instead.
+
+Example:
+    # Local scaling check on CPU: 1, 2 and 4 processes (gloo)
+    python demos/sunk/pxs_ddp_train.py --local 1,2,4
+
+    # On B200 nodes via SUNK (.distribute())
+    python demos/sunk/pxs_ddp_train.py --workers 2
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import kubetorch as kt
+
+PXS_DEMOS = Path(__file__).resolve().parents[1] / "pxs"
+
+
+def shard_indices(n_samples: int, rank: int, world_size: int) -> range:
+    """Global sample indices owned by `rank` (equal-sized, strided shards).
+
+    Every rank gets exactly n_samples // world_size samples so that all ranks
+    run the same number of steps (DDP hangs if one rank runs an extra step).
+    """
+    per_rank = n_samples // world_size
+    return range(rank, per_rank * world_size, world_size)
+
+
+def load_shard(
+    rank: int,
+    world_size: int,
+    n_samples: int,
+    n_points: int,
+    data_dir: str | None = None,
+    seed: int = 0,
+) -> list[dict]:
+    """Load (from `data_dir/*.npz`) or generate only this rank's samples (PXS format).
+
+    Generated samples are seeded by their global index, so the full dataset is
+    identical regardless of world size.
+    """
+    import numpy as np
+
+    if data_dir:
+        files = sorted(f for f in os.listdir(data_dir) if f.endswith(".npz"))
+        indices = shard_indices(len(files), rank, world_size)
+        return [dict(np.load(os.path.join(data_dir, files[i]))) for i in indices]
+
+    shard = []
+    for i in shard_indices(n_samples, rank, world_size):
+        rng = np.random.default_rng(seed + i)
+        points = rng.normal(size=(n_points, 3)).astype(np.float32)
+        shard.append(
+            {
+                "points": points,
+                # Learnable target so the loss actually goes down
+                "target": np.sin(points).sum(axis=1, keepdims=True).astype(np.float32),
+            }
+        )
+    return shard
+
+
+def _pxs_demos_on_path():
+    """Make demos/pxs importable for the shared Opora helpers (client and pod alike)."""
+    if str(PXS_DEMOS) not in sys.path:
+        sys.path.insert(0, str(PXS_DEMOS))
+
+
+def train_opora_ddp(
+    n_samples: int = 512,
+    n_points: int = 50,
+    epochs: int = 5,
+    batch_size: int = 16,
+    lr: float = 1e-3,
+    bucket_cap_mb: int = 25,
+    data_dir: str | None = None,
+    checkpoint_dir: str | None = None,
+    seed: int = 0,
+) -> dict | None:
+    """Train with DDP on every rank; returns the aggregated summary on rank 0, None elsewhere."""
+    import time
+
+    import numpy as np
+    import torch
+    import torch.distributed as dist
+    from torch.nn.parallel import DistributedDataParallel
+
+    _pxs_demos_on_path()
+    from opora_common import build_module
+
+    rank = int(os.environ["RANK"])
+    world_size = int(os.environ["WORLD_SIZE"])
+
+    use_cuda = torch.cuda.is_available()
+    if use_cuda:
+        local_rank = int(os.environ.get("LOCAL_RANK", 0))
+        torch.cuda.set_device(local_rank)
+        device = torch.device("cuda", local_rank)
+    else:
+        device = torch.device("cpu")
+    dist.init_process_group(
+        backend="nccl" if use_cuda else "gloo", rank=rank, world_size=world_size
+    )
+
+    # Each rank only ever touches its own shard
+    start = time.time()
+    shard = load_shard(rank, world_size, n_samples, n_points, data_dir, seed)
+    points = torch.from_numpy(np.stack([s["points"] for s in shard])).to(device)
+    target = torch.from_numpy(np.stack([s["target"] for s in shard])).to(device)
+    load_time = time.time() - start
+
+    torch.manual_seed(seed)  # identical init on all ranks (DDP also broadcasts rank 0's)
+    module, model_kind = build_module(device=device)
+    ddp = DistributedDataParallel(
+        module,
+        device_ids=[device.index] if use_cuda else None,
+        bucket_cap_mb=bucket_cap_mb,
+        gradient_as_bucket_view=True,
+    )
+    optimizer = torch.optim.Adam(ddp.parameters(), lr=lr)
+
+    # Resume automatically from the latest complete checkpoint, if any
+    ckpt = None
+    epoch_losses = []
+    if checkpoint_dir:
+        from checkpointing import AsyncCheckpointer
+
+        ckpt = AsyncCheckpointer(checkpoint_dir, rank=rank, world_size=world_size)
+        epoch_losses = _resume(ckpt, module, optimizer, device)
+        if rank == 0 and epoch_losses:
+            print(f"[Rank 0] resumed from {checkpoint_dir} at epoch {len(epoch_losses)}")
+
+    start_epoch = len(epoch_losses)
+    dist.barrier()
+    train_start = time.time()
+    for epoch in range(start_epoch, epochs):
+        stats = _train_epoch(ddp, model_kind, optimizer, points, target, batch_size, seed + epoch)
+        dist.reduce(stats, dst=0)
+        epoch_losses.append(stats[0].item() / max(stats[1].item(), 1))
+        if rank == 0:
+            print(f"[Rank 0] epoch {epoch + 1}/{epochs} loss={epoch_losses[-1]:.4f}")
+        if ckpt:
+            # Snapshot to host memory only; the PVC write happens in the background
+            state = {"model": module.state_dict(), "optimizer": optimizer.state_dict()}
+            ckpt.save(epoch + 1, {**state, "epoch_losses": epoch_losses})
+
+    if ckpt:
+        ckpt.close()
+    if use_cuda:
+        torch.cuda.synchronize()
+    train_time = time.time() - train_start
+
+    # Slowest rank determines wall time; sample counts add up
+    timing = torch.tensor([train_time, load_time], dtype=torch.float64, device=device)
+    dist.reduce(timing, dst=0, op=dist.ReduceOp.MAX)
+    seen = torch.tensor([len(shard) * (epochs - start_epoch)], dtype=torch.float64, device=device)
+    dist.reduce(seen, dst=0)
+    dist.destroy_process_group()
+
+    if rank != 0:
+        return None
+
+    train_time, load_time = timing.tolist()
+    return {
+        "model": model_kind,
+        "device": torch.cuda.get_device_name(device) if use_cuda else "cpu",
+        "world_size": world_size,
+        "n_train_samples": len(shard) * world_size,
+        "samples_per_rank": len(shard),
+        "epochs": epochs,
+        "final_loss": round(epoch_losses[-1], 5),
+        "epoch_losses": [round(x, 5) for x in epoch_losses],
+        "load_duration_s": round(load_time, 3),
+        "train_duration_s": round(train_time, 3),
+        "samples_per_s": round(seen.item() / train_time, 1),
+        "resumed_from_epoch": start_epoch,
+    }
+
+
+def _train_epoch(ddp, kind: str, optimizer, points, target, batch_size: int, seed: int):
+    """One pass over this rank's shard; returns [sum of batch losses, n batches]."""
+    import torch
+    from opora_common import forward_points
+
+    order = torch.randperm(len(points), generator=torch.Generator().manual_seed(seed))
+    stats = torch.zeros(2, dtype=torch.float64, device=points.device)
+    for i in range(0, len(points), batch_size):
+        idx = order[i : i + batch_size].to(points.device)
+        optimizer.zero_grad(set_to_none=True)
+        out = forward_points(ddp, points[idx], kind)
+        loss = torch.nn.functional.mse_loss(out, target[idx])
+        loss.backward()  # gradients all-reduced bucket by bucket, overlapped with backward
+        optimizer.step()
+        stats += torch.tensor([loss.item(), 1.0], dtype=torch.float64, device=points.device)
+    return stats
+
+
+def _resume(ckpt, module, optimizer, device) -> list[float]:
+    """Load the latest checkpoint into module/optimizer; returns the loss history so far."""
+    restored = ckpt.load_latest(map_location=device)
+    if restored is None:
+        return []
+    _, state = restored
+    module.load_state_dict(state["model"])
+    optimizer.load_state_dict(state["optimizer"])
+    return list(state["epoch_losses"])
+
+
+def scaling_report(summaries: list[dict]) -> list[dict]:
+    """Scaling efficiency of each run against the single-process run.
+
+    efficiency = throughput(N) / (N * throughput(1)); 1.0 is perfect linear scaling.
+    """
+    base = next((s for s in summaries if s["world_size"] == 1), None)
+    rows = []
+    for s in summaries:
+        row = {
+            "world_size": s["world_size"],
+            "samples_per_s": s["samples_per_s"],
+            "final_loss": s["final_loss"],
+        }
+        if base:
+            speedup = s["samples_per_s"] / base["samples_per_s"]
+            row["speedup"] = round(speedup, 2)
+            row["efficiency"] = round(speedup / s["world_size"], 2)
+        rows.append(row)
+    return rows
+
+
+def _local_worker(rank: int, world_size: int, kwargs: dict, queue):
+    """Entry point for one locally spawned rank (mimics the env .distribute() sets)."""
+    os.environ.update(
+        {
+            "RANK": str(rank),
+            "LOCAL_RANK": str(rank),
+            "WORLD_SIZE": str(world_size),
+            "MASTER_ADDR": "127.0.0.1",
+            "MASTER_PORT": os.environ.get("MASTER_PORT", "29532"),
+        }
+    )
+    summary = train_opora_ddp(**kwargs)
+    if rank == 0:
+        queue.put(summary)
+
+
+def run_local(world_size: int, **kwargs) -> dict:
+    """Train with `world_size` local processes (gloo on CPU)."""
+    import torch.multiprocessing as mp
+
+    ctx = mp.get_context("spawn")
+    queue = ctx.SimpleQueue()
+    mp.spawn(_local_worker, args=(world_size, kwargs, queue), nprocs=world_size, join=True)
+    return queue.get()
+
+
+def sunk_gpu_compute(workers: int):
+    """B200 compute via SUNK, as in pxs_gpu_train.py, distributed over `workers` pods."""
+    _pxs_demos_on_path()
+    from opora_common import sunk_b200_compute
+
+    compute = sunk_b200_compute(
+        "PXS DDP training via Kubetorch",
+        # --data-dir / --checkpoint-dir live here
+        volumes=[
+            kt.Volume.from_name(name="slurm-data", namespace="tenant-slurm", mount_path="/mnt/data")
+        ],
+    )
+    compute.distribute(framework="pytorch", workers=workers)
+    return compute
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DDP training of a PXS Opora model")
+    parser.add_argument("--local", help="Comma-separated local world sizes, e.g. 1,2,4 (gloo)")
+    parser.add_argument("--workers", type=int, default=2, help="GPU pods for .distribute()")
+    parser.add_argument("--n-samples", type=int, default=512)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--data-dir", help="Directory of .npz samples (e.g. on /mnt/data)")
+    parser.add_argument(
+        "--checkpoint-dir", help="Async checkpoints + auto-resume (e.g. on /mnt/data)"
+    )
+    args = parser.parse_args()
+
+    train_kwargs = {
+        "n_samples": args.n_samples,
+        "epochs": args.epochs,
+        "batch_size": args.batch_size,
+        "data_dir": args.data_dir,
+        "checkpoint_dir": args.checkpoint_dir,
+    }
+
+    summaries = []
+    if args.local:
+        for world_size in (int(n) for n in args.local.split(",")):
+            print(f"\nTraining locally with {world_size} process(es)...")
+            summaries.append(run_local(world_size, **train_kwargs))
+    else:
+        print(f"Training PXS Opora with DDP on {args.workers} B200 pods via SUNK...")
+        remote_fn = kt.fn(train_opora_ddp, name="pxs_ddp_train").to(sunk_gpu_compute(args.workers))
+        # .distribute() returns one result per rank; only rank 0 returns the summary
+        summaries.append(next(r for r in remote_fn(**train_kwargs) if r))
+
+    print("\n" + "=" * 50)
+    print("RESULTS")
+    print("=" * 50)
+    for k, v in summaries[-1].items():
+        print(f"  {k}: {v}")
+
+    if len(summaries) > 1:
+        print("\nScaling (vs 1 process):")
+        for row in scaling_report(summaries):
+            print(f"  {row}")
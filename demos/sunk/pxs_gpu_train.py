@@ -5,17 +5,30 @@ Uses pre-built image with:
 - Python 3.11
 - PyTorch 2.7.1+cu128
 - PXS with Opora
+
+Pass `--mode compile+bf16` (etc., see `demos/pxs/execution_modes.py`) to train and run
+the model compiled and/or under autocast instead of eager fp32.
 """
 
+import argparse
+import sys
+from pathlib import Path
+
 import kubetorch as kt
 
+PXS_DEMOS = Path(__file__).resolve().parents[1] / "pxs"
 
-def run_opora_gpu():
+
+def run_opora_gpu(mode: str = "eager", cache_dir: str | None = None):
     """Train and run a simple Opora MLP model on GPU."""
     import time
 
     import numpy as np
     import torch
+
+    if str(PXS_DEMOS) not in sys.path:
+        sys.path.insert(0, str(PXS_DEMOS))
+    from execution_modes import ExecutionMode, apply_to_opora
     from pxs.models.opora.pytorch.base import OporaPyTorch
     from pxs.models.opora.pytorch.config.config import OporaPyTorchConfig
 
@@ -51,6 +64,11 @@ def run_opora_gpu():
 
     # Create model on GPU
     model = OporaPyTorch(OporaPyTorchConfig(**config), device="cuda")
+    # Opora's train() can't scale the loss, so fp16 (incl. amp without bf16) is
+    # applied after training, to inference only
+    after_training = ExecutionMode(mode, "cuda").loss_scaling
+    if not after_training:
+        execution = apply_to_opora(model, mode, "cuda", cache_dir)
 
     # Generate dummy training data: list of samples (PXS format)
     # Each sample is a dict with feature and target arrays
@@ -70,6 +88,8 @@ def run_opora_gpu():
     model.train(train_data)
     train_duration = time.time() - start_time
     print(f"Training completed in {train_duration:.2f}s")
+    if after_training:
+        execution = apply_to_opora(model, mode, "cuda", cache_dir)
 
     # Run inference on a test sample
     test_sample = {
@@ -77,9 +97,11 @@ def run_opora_gpu():
         "target": np.random.normal(size=(n_points, 1)).astype(np.float32),
     }
     output = model.predict_one(data=test_sample)
+    execution.save_cache()  # compiled artifacts for the next pod (compile modes)
 
     return {
         "device": device_name,
+        "mode": mode,
         "n_train_samples": n_samples,
         "train_duration_s": round(train_duration, 2),
         "output_shape": str(output["target"].shape),
@@ -89,6 +111,23 @@ def run_opora_gpu():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PXS Opora training on GPU via SUNK")
+    parser.add_argument("--mode", default="eager", help="eager, compile, bf16, fp16, ...")
+    parser.add_argument(
+        "--cache-dir",
+        help="Compiled artifacts, compile modes only (default: /mnt/data/compile-cache on the PVC)",
+    )
+    args = parser.parse_args()
+
+    # Only compile modes need the PVC (to share compiled artifacts across pods)
+    compiling = "compile" in args.mode.split("+")
+    cache_dir = (args.cache_dir or "/mnt/data/compile-cache") if compiling else None
+    extra = {}
+    if compiling:
+        extra["volumes"] = [
+            kt.Volume.from_name(name="slurm-data", namespace="tenant-slurm", mount_path="/mnt/data")
+        ]
+
     print("Running PXS Opora model on GPU via SUNK...")
 
     # Pre-built image with PXS, PyTorch, CUDA 13.0, kubetorch[server]
@@ -132,6 +171,7 @@ if __name__ == "__main__":
         tolerations=gpu_tolerations,
         service_template=service_template,
         image=image,
+        **extra,
     )
 
     print(f"  Scheduler: {SUNK_SCHEDULER}")
@@ -140,7 +180,7 @@ if __name__ == "__main__":
     print("  Image: ghcr.io/physicsxltd/pxs-gpu:latest")
 
     remote_fn = kt.fn(run_opora_gpu, name="pxs_gpu_train").to(compute)
-    result = remote_fn()
+    result = remote_fn(mode=args.mode, cache_dir=cache_dir)
 
     print("\n" + "=" * 50)
     print("RESULTS")
@@ -0,0 +1,334 @@
+"""Run many functions inside one SUNK allocation (a pod "lease").
+
+Every SUNK demo deploys its own pod through the Slurm scheduler, so each one waits
+in the Slurm queue again. A `SunkLease` acquires one allocation (a `LeaseHost`
+class deployed with the SUNK scheduler name, annotations and tolerations) and
+multiplexes any number of functions onto it:
+- `lease.fn(f)` returns a callable that runs `f` on the leased pod; `f` is
+  imported there by module name from the synced project, like `kt.fn` would
+- The allocation is held until `release()` (or leaving the `with` block), or until
+  no call has been made for `idle_timeout` seconds; the next call re-acquires it
+- `stats()` reports the queue wait paid and an estimate of the wait saved
+
+Schedulers are pluggable: `SunkScheduler` deploys on the cluster, and
+`FakeSunkScheduler` runs the host in-process after an injected queue delay, so the
+lease logic can be tested without Slurm.
+
+Example:
+    # Local: one lease vs one allocation per function, with 1-3s fake queue delays
+    python demos/sunk/sunk_lease.py --local
+
+    # Cluster: several functions on one SUNK CPU allocation
+    python demos/sunk/sunk_lease.py
+"""
+
+import argparse
+import collections
+import importlib
+import inspect
+import random
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import kubetorch as kt
+
+# Project root, identical on the client and in the synced pod copy
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def sunk_compute(cpus: str = "0.5", memory: str = "1Gi", gpus: str | None = None, **kwargs):
+    """kt.Compute scheduled by SUNK, with the annotations/tolerations it requires."""
+    extra = {}
+    if gpus:
+        extra["tolerations"] = [
+            {"key": "nvidia.com/gpu", "operator": "Exists", "effect": "NoSchedule"}
+        ]
+        extra["node_selector"] = {"gpu.nvidia.com/class": "B200"}
+    return kt.Compute(
+        cpus=cpus,
+        memory=memory,
+        gpus=gpus,
+        namespace="tenant-slurm",
+        launch_timeout=600,
+        service_template={
+            "spec": {
+                "template": {
+                    "spec": {
+                        "schedulerName": "tenant-slurm-slurm-scheduler",
+                        "terminationGracePeriodSeconds": 5,  # SUNK requires < KillWait - 5s
+                    }
+                }
+            }
+        },
+        annotations={
+            "sunk.coreweave.com/account": "root",
+            "sunk.coreweave.com/comment": "Kubetorch lease",
+            "sunk.coreweave.com/exclusive": "user",
+        },
+        **extra,
+        **kwargs,
+    )
+
+
+class LeaseHost:
+    """Pod-side: import and run functions by (directory, module, name)."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.calls = collections.Counter()
+        self._fns = {}
+
+    def call(self, rel_dir: str, module: str, name: str, args: list, kwargs: dict):
+        key = (rel_dir, module, name)
+        if key not in self._fns:
+            path = str(REPO_ROOT / rel_dir)
+            if path not in sys.path:
+                sys.path.insert(0, path)
+            self._fns[key] = getattr(importlib.import_module(module), name)
+        self.calls[f"{module}.{name}"] += 1
+        return self._fns[key](*args, **kwargs)
+
+    def info(self) -> dict:
+        return {
+            "host": socket.gethostname(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "calls": dict(self.calls),
+        }
+
+
+class SunkScheduler:
+    """Acquire allocations by deploying a LeaseHost through the SUNK scheduler."""
+
+    def __init__(self, **compute_kwargs):
+        self.compute_kwargs = compute_kwargs
+
+    def acquire(self, name: str):
+        return kt.cls(LeaseHost, name=name).to(sunk_compute(**self.compute_kwargs))
+
+    def release(self, host):
+        host.teardown()
+
+
+class FakeSunkScheduler:
+    """Local stand-in: sleeps a random Slurm queue delay, then hosts in-process."""
+
+    def __init__(self, queue_delay_s: tuple[float, float] = (1.0, 3.0), seed: int = 0):
+        self.queue_delay_s = queue_delay_s
+        self._rng = random.Random(seed)
+        self.allocations = 0
+        self.queue_wait_s = 0.0
+
+    def acquire(self, name: str):
+        delay = self._rng.uniform(*self.queue_delay_s)
+        time.sleep(delay)
+        self.allocations += 1
+        self.queue_wait_s += delay
+        return LeaseHost()
+
+    def release(self, host):
+        pass
+
+
+class SunkLease:
+    """One scheduler allocation shared by many functions.
+
+    Args:
+        scheduler: `SunkScheduler` (cluster) or `FakeSunkScheduler` (local).
+        name: Service name of the leased host.
+        idle_timeout: Release the allocation after this many seconds without calls.
+    """
+
+    def __init__(self, scheduler=None, name: str = "sunk_lease", idle_timeout: float = 300.0):
+        self.scheduler = scheduler or SunkScheduler()
+        self.name = name
+        self.idle_timeout = idle_timeout
+        self.acquisitions = []  # seconds spent waiting for each allocation
+        self.calls = collections.Counter()
+        self._host = None
+        self._last_call = time.monotonic()
+        self._in_flight = 0
+        self._lock = threading.Lock()  # guards the state above; never held while acquiring
+        self._acquire_lock = threading.Lock()  # one scheduler acquire at a time
+        self._closed = threading.Event()
+        threading.Thread(target=self._idle_watch, daemon=True).start()
+
+    def acquire(self):
+        return self._acquire(hold=False)
+
+    def _acquire(self, hold: bool):
+        """The leased host, acquiring it if needed; `hold` counts a call in flight.
+
+        The scheduler acquire (up to launch_timeout in the Slurm queue) runs outside
+        `_lock`, so calls on a live host and the idle watcher never wait on it; `_lock`
+        is taken only to check for and publish the host.
+        """
+        while True:
+            with self._lock:
+                if self._host is not None:
+                    self._in_flight += hold
+                    return self._host
+            with self._acquire_lock:
+                with self._lock:
+                    if self._host is not None:  # another caller acquired it meanwhile
+                        continue
+                start = time.perf_counter()
+                host = self.scheduler.acquire(self.name)
+                waited = time.perf_counter() - start
+                with self._lock:
+                    if self._closed.is_set():
+                        self.scheduler.release(host)
+                        raise RuntimeError(f"Lease {self.name!r} was closed while acquiring")
+                    self.acquisitions.append(waited)
+                    self._host = host
+                    self._last_call = time.monotonic()
+                    self._in_flight += hold
+                    return host
+
+    def release(self):
+        with self._lock:
+            if self._host is not None:
+                self.scheduler.release(self._host)
+                self._host = None
+
+    def close(self):
+        self._closed.set()
+        self.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fn(self, func):
+        """Callable that runs `func` on the leased allocation."""
+        file = Path(inspect.getfile(func)).resolve()
+        target = (str(file.parent.relative_to(REPO_ROOT)), file.stem, func.__name__)
+
+        def leased(*args, **kwargs):
+            # Held in flight from the moment it's returned: the idle watcher can't
+            # release it before the call
+            host = self._acquire(hold=True)
+            with self._lock:
+                self.calls[func.__name__] += 1
+            try:
+                return host.call(*target, list(args), kwargs)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._last_call = time.monotonic()
+
+        leased.__name__ = func.__name__
+        return leased
+
+    def _idle_watch(self):
+        while not self._closed.wait(min(self.idle_timeout / 4, 5.0)):
+            with self._lock:  # check and release together: no call can slip in between
+                idle = time.monotonic() - self._last_call
+                if self._host is not None and not self._in_flight and idle > self.idle_timeout:
+                    self.scheduler.release(self._host)
+                    self._host = None
+
+    def stats(self) -> dict:
+        """Queue wait paid vs one allocation per distinct function (each waits once)."""
+        paid = sum(self.acquisitions)
+        mean_wait = paid / max(len(self.acquisitions), 1)
+        return {
+            "allocations": len(self.acquisitions),
+            "functions": len(self.calls),
+            "calls": sum(self.calls.values()),
+            "queue_wait_s": round(paid, 2),
+            "queue_wait_saved_s": round(
+                max(len(self.calls) - len(self.acquisitions), 0) * mean_wait, 2
+            ),
+        }
+
+
+def hostname() -> str:
+    return socket.gethostname()
+
+
+def sum_squares(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def sleep_and_echo(value, seconds: float = 0.05):
+    time.sleep(seconds)
+    return value
+
+
+DEMO_FUNCTIONS = [hostname, sum_squares, sleep_and_echo]
+
+
+def _demo_calls(call):
+    """Run each demo function a few times through `call(func, *args)`."""
+    results = []
+    for i in range(3):
+        results.append(call(hostname))
+        results.append(call(sum_squares, 100_000 + i))
+        results.append(call(sleep_and_echo, i))
+    return results
+
+
+def run_lease_bench(queue_delay_s: tuple[float, float] = (1.0, 3.0), seed: int = 0) -> dict:
+    """Same calls with one allocation per function (like the SUNK demos) vs one lease."""
+    per_fn = FakeSunkScheduler(queue_delay_s, seed)
+    hosts = {}
+    start = time.perf_counter()
+
+    def call_own_allocation(func, *args):
+        if func not in hosts:
+            hosts[func] = per_fn.acquire(func.__name__)
+        return func(*args)
+
+    _demo_calls(call_own_allocation)
+    per_fn_wall = time.perf_counter() - start
+
+    leased_scheduler = FakeSunkScheduler(queue_delay_s, seed + 1)
+    start = time.perf_counter()
+    with SunkLease(leased_scheduler, idle_timeout=60) as lease:
+        leased = {f: lease.fn(f) for f in DEMO_FUNCTIONS}
+        _demo_calls(lambda func, *args: leased[func](*args))
+        stats = lease.stats()
+    lease_wall = time.perf_counter() - start
+
+    return {
+        "per_function_allocations": per_fn.allocations,
+        "per_function_queue_wait_s": round(per_fn.queue_wait_s, 2),
+        "per_function_wall_s": round(per_fn_wall, 2),
+        "lease_allocations": leased_scheduler.allocations,
+        "lease_queue_wait_s": round(leased_scheduler.queue_wait_s, 2),
+        "lease_wall_s": round(lease_wall, 2),
+        "measured_queue_wait_saved_s": round(
+            per_fn.queue_wait_s - leased_scheduler.queue_wait_s, 2
+        ),
+        "lease_stats": stats,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multiplex functions onto one SUNK allocation")
+    parser.add_argument("--local", action="store_true", help="Use the fake scheduler")
+    parser.add_argument("--min-delay", type=float, default=1.0, help="Fake queue delay (s)")
+    parser.add_argument("--max-delay", type=float, default=3.0, help="Fake queue delay (s)")
+    parser.add_argument("--idle-timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    if args.local:
+        print("One allocation per function vs one lease (fake Slurm queue)...")
+        for k, v in run_lease_bench((args.min_delay, args.max_delay)).items():
+            print(f"  {k}: {v}")
+    else:
+        from test_sunk_cpu import test_sunk
+
+        with SunkLease(SunkScheduler(), idle_timeout=args.idle_timeout) as lease:
+            print(lease.fn(test_sunk)())
+            results = _demo_calls(lambda func, *a: lease.fn(func)(*a))
+            print(f"Hosts used: {sorted({r for r in results if isinstance(r, str)})}")
+            print(lease.acquire().info())
+            for k, v in lease.stats().items():
+                print(f"  {k}: {v}")
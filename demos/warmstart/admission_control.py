@@ -0,0 +1,444 @@
+"""Demo: Pod-side admission control and fair queueing for concurrent calls.
+
+`concurrent_calls.py` shows a warm pod serving several calls at once, but nothing
+decides what happens at overload: long training calls and short inference calls all
+run at once, share the CPU, and short-call latency collapses without any signal back
+to the caller or the autoscaler. `AdmissionController` sits in front of the work:
+- At most `max_concurrency` calls run; up to `max_queue` more wait in total, and
+  `max_queue_per_key` caps one key's share of that queue
+- Waiting calls are dispatched by start-time fair queueing, per caller or per
+  priority class (with weights). Each call is charged its key's recent service time,
+  so keys share pod *time*; `max_running_per_key` keeps slots free for other keys
+- Each call carries a time budget from the client; calls whose deadline passes
+  while queued are dropped before they run, and expired calls are refused up front
+- When the queue is full the call is rejected immediately with a `retry_after_s`
+  hint (estimated from queue depth and recent service times)
+- `metrics()` / `prometheus()` export queue depth, in-flight calls, wait-time
+  percentiles and admit/reject/expire counters
+
+On the pod, `@admitted(controller)` wraps a function: callers pass `kt_caller`,
+`kt_priority` and `kt_budget_s`, and get `{"rejected": ..., "retry_after_s": ...}`
+back instead of a result when refused; `call_with_retry` honours the hint.
+
+Example:
+    # Local: mixed long/short load against a simulated 4-core pod, per policy
+    python demos/warmstart/admission_control.py --local
+
+    # On a pod
+    python demos/warmstart/admission_control.py
+"""
+
+import collections
+import functools
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+class AdmissionError(Exception):
+    """The call was not admitted (queue full, or its deadline passed)."""
+
+    def __init__(self, reason: str, retry_after_s: float | None = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class _Ticket:
+    __slots__ = ("key", "tag", "deadline", "enqueued", "granted", "expired")
+
+    def __init__(self, key, tag, deadline):
+        self.key = key
+        self.tag = tag
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.expired = False
+
+
+class AdmissionController:
+    """Bounded, fair, deadline-aware admission for concurrent calls on one pod.
+
+    Args:
+        max_concurrency: Calls allowed to run at once (e.g. the pod's cores).
+        max_queue: Calls allowed to wait in total, across all keys; beyond that every
+            call is rejected.
+        policy: "caller" (fair share per caller), "priority" (weighted share per
+            priority class) or "fifo" (one queue, arrival order).
+        weights: Share per priority class for the "priority" policy.
+        max_running_per_key: Cap on one key's running calls, so a slot stays free
+            for others (defaults to max_concurrency, i.e. no cap).
+        max_queue_per_key: Cap on one key's waiting calls, so one caller can't fill the
+            whole queue (defaults to max_queue, i.e. no cap).
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        max_queue: int = 32,
+        policy: str = "caller",
+        weights: dict | None = None,
+        max_running_per_key: int | None = None,
+        max_queue_per_key: int | None = None,
+    ):
+        if policy not in ("caller", "priority", "fifo"):
+            raise ValueError(f"Unknown policy {policy!r}")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.policy = policy
+        self.weights = weights or {"interactive": 8.0, "default": 1.0, "batch": 1.0}
+        self.max_running_per_key = max_running_per_key or max_concurrency
+        self.max_queue_per_key = min(max_queue_per_key or max_queue, max_queue)
+        self.counters = collections.Counter()
+        self.waits = collections.defaultdict(lambda: collections.deque(maxlen=10_000))
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._finish = {}  # key -> virtual finish tag of its last queued call
+        self._virtual = 0.0
+        self._running = collections.Counter()
+        self._queued = collections.Counter()
+        self._service_s = {}  # key -> EWMA of its call duration (cost and retry hints)
+
+    def _key(self, caller: str, priority: str):
+        if self.policy == "fifo":
+            return "all"
+        return caller if self.policy == "caller" else priority
+
+    def acquire(self, caller: str = "anonymous", priority: str = "default", budget_s=None):
+        """Block until this call may run, or raise AdmissionError. Returns a release() token."""
+        deadline = time.monotonic() + budget_s if budget_s is not None else None
+        key = self._key(caller, priority)
+        with self._cond:
+            if budget_s is not None and budget_s <= 0:
+                self.counters["expired"] += 1
+                raise AdmissionError("deadline already passed")
+            # The total bounds the pod's backlog however many caller names clients invent
+            if self._queued.total() >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise AdmissionError("queue full", self.retry_after())
+            if self._queued[key] >= self.max_queue_per_key:
+                self.counters["rejected"] += 1
+                raise AdmissionError("queue full for key", self.retry_after(key))
+
+            # Start-time fair queueing: a key's calls are spaced cost/weight apart in
+            # virtual time, so each key gets its share however many calls it queues
+            weight = self.weights.get(priority, 1.0) if self.policy == "priority" else 1.0
+            start = max(self._virtual, self._finish.get(key, 0.0))
+            self._finish[key] = start + self._service_s.get(key, 0.1) / weight
+            tag = start if self.policy != "fifo" else next(self._seq)
+            ticket = _Ticket(key, tag, deadline)
+            heapq.heappush(self._heap, (tag, next(self._seq), ticket))
+            self._queued[key] += 1
+            self._dispatch()
+            while not ticket.granted and not ticket.expired:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                if not self._cond.wait(timeout) and timeout == 0:
+                    self._expire(ticket)
+            if ticket.expired:
+                raise AdmissionError("deadline passed while queued")
+            now = time.monotonic()
+            self.waits[key].append(now - ticket.enqueued)
+            self.counters["admitted"] += 1
+            return now, key
+
+    def _expire(self, ticket):
+        if not ticket.expired and not ticket.granted:
+            ticket.expired = True
+            self._queued[ticket.key] -= 1
+            self.counters["expired"] += 1
+
+    def release(self, token: tuple):
+        """Mark a call finished and dispatch the next queued one."""
+        started, key = token
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._service_s[key] = 0.8 * self._service_s.get(key, elapsed) + 0.2 * elapsed
+            self._running[key] -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        capped = []
+        while self._heap and self._running.total() < self.max_concurrency:
+            entry = heapq.heappop(self._heap)
+            ticket = entry[2]
+            if ticket.expired:
+                continue
+            if ticket.deadline is not None and ticket.deadline <= now:
+                self._expire(ticket)  # dropped early: it would only be wasted work
+                continue
+            if self._running[ticket.key] >= self.max_running_per_key:
+                capped.append(entry)
+                continue
+            ticket.granted = True
+            self._queued[ticket.key] -= 1
+            self._running[ticket.key] += 1
+            if self.policy != "fifo":
+                self._virtual = max(self._virtual, ticket.tag)
+        for entry in capped:
+            heapq.heappush(self._heap, entry)
+        self._cond.notify_all()
+
+    def retry_after(self, key=None) -> float:
+        """Seconds until the queue (or the key's share of it) likely has room.
+
+        The key's backlog over its slots, or with no key the whole backlog over all slots.
+        """
+        if key is None:
+            backlog = sum(n * self._service_s.get(k, 0.1) for k, n in self._queued.items())
+            return round(backlog / self.max_concurrency, 3)
+        slots = min(self.max_running_per_key, self.max_concurrency)
+        return round(self._queued[key] * self._service_s.get(key, 0.1) / slots, 3)
+
+    def run(self, fn, *args, caller="anonymous", priority="default", budget_s=None, **kwargs):
+        token = self.acquire(caller, priority, budget_s)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.release(token)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            waits = {}
+            for key, values in self.waits.items():
+                waits[key] = {
+                    "p50_ms": _percentile_ms(values, 0.5),
+                    "p99_ms": _percentile_ms(values, 0.99),
+                    "n": len(values),
+                }
+            return {
+                "queue_depth": self._queued.total(),
+                "in_flight": self._running.total(),
+                "queued": {k: v for k, v in self._queued.items() if v},
+                "service_s": {k: round(v, 4) for k, v in self._service_s.items()},
+                **dict(self.counters),
+                "wait": waits,
+            }
+
+    def prometheus(self) -> str:
+        """Metrics in Prometheus text format (e.g. for a custom-metric autoscaler)."""
+        m = self.metrics()
+        lines = [
+            f"kt_admission_queue_depth {m['queue_depth']}",
+            f"kt_admission_in_flight {m['in_flight']}",
+        ]
+        for name in ("admitted", "rejected", "expired"):
+            lines.append(f'kt_admission_calls_total{{outcome="{name}"}} {m.get(name, 0)}')
+        for key, w in m["wait"].items():
+            for q in ("p50", "p99"):
+                lines.append(
+                    f'kt_admission_wait_seconds{{key="{key}",quantile="0.{q[1:]}"}} '
+                    f"{w[f'{q}_ms'] / 1e3:g}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def admitted(controller: AdmissionController):
+    """Decorator (pod side): admit each call; refused calls return a rejection dict."""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(
+            *args, kt_caller="anonymous", kt_priority="default", kt_budget_s=None, **kwargs
+        ):
+            try:
+                return controller.run(
+                    fn,
+                    *args,
+                    caller=kt_caller,
+                    priority=kt_priority,
+                    budget_s=kt_budget_s,
+                    **kwargs,
+                )
+            except AdmissionError as e:
+                return {"rejected": e.reason, "retry_after_s": e.retry_after_s}
+
+        return wrapper
+
+    return decorate
+
+
+def is_rejection(result) -> bool:
+    return isinstance(result, dict) and "rejected" in result and "retry_after_s" in result
+
+
+def call_with_retry(fn, *args, budget_s: float = 30.0, max_attempts: int = 5, **kwargs):
+    """Client side: call, and on a full-queue rejection wait retry_after_s (jittered)."""
+    deadline = time.monotonic() + budget_s
+    for _ in range(max_attempts):
+        remaining = deadline - time.monotonic()
+        result = fn(*args, kt_budget_s=remaining, **kwargs)
+        if not is_rejection(result) or result["retry_after_s"] is None:
+            return result
+        time.sleep(min(result["retry_after_s"] * random.uniform(1.0, 1.5), max(remaining, 0)))
+    return result
+
+
+class SimulatedPod:
+    """A pod with `cores` CPUs: work runs in 5ms quanta, at most `cores` at a time."""
+
+    def __init__(self, cores: int = 4, quantum: float = 0.005):
+        self.slots = threading.Semaphore(cores)
+        self.quantum = quantum
+
+    def work(self, seconds: float):
+        remaining = seconds
+        while remaining > 0:
+            with self.slots:
+                time.sleep(min(self.quantum, remaining))
+            remaining -= self.quantum
+
+
+def _poisson_arrivals(rates: dict, duration: float, seed: int) -> list:
+    rng = random.Random(seed)
+    arrivals = []
+    for kind, rate in rates.items():
+        t = rng.expovariate(rate)
+        while t < duration:
+            arrivals.append((t, kind))
+            t += rng.expovariate(rate)
+    return sorted(arrivals)
+
+
+def _percentile_ms(values, q):
+    ordered = sorted(values)
+    return round(ordered[min(int(len(ordered) * q), len(ordered) - 1)] * 1e3, 1)
+
+
+def run_mixed_load(
+    policy: str | None,
+    duration: float = 8.0,
+    cores: int = 4,
+    long_s: float = 0.4,
+    long_rate: float = 12.0,
+    short_s: float = 0.01,
+    short_rate: float = 50.0,
+    short_budget_s: float = 0.5,
+    max_running_per_key: int | None = None,
+    seed: int = 0,
+) -> dict:
+    """Open-loop Poisson arrivals of long (trainer) and short (inference) calls.
+
+    The default load asks for ~1.3x the pod's cores. policy=None runs everything at
+    once (no admission control). Short calls carry a `short_budget_s` deadline.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    pod = SimulatedPod(cores)
+    controller = None
+    if policy is not None:
+        controller = AdmissionController(
+            cores,
+            max_queue=16,
+            policy=policy,
+            max_running_per_key=max_running_per_key,
+            max_queue_per_key=8,
+        )
+    latencies = collections.defaultdict(list)
+    outcomes = collections.Counter()
+    lock = threading.Lock()
+
+    def handle(kind: str, work_s: float, caller: str, priority: str, budget_s):
+        start = time.monotonic()
+        try:
+            if controller is None:
+                pod.work(work_s)
+            else:
+                controller.run(
+                    pod.work, work_s, caller=caller, priority=priority, budget_s=budget_s
+                )
+            outcome = "ok"
+        except AdmissionError as e:
+            outcome = "expired" if "deadline" in e.reason else "rejected"
+        with lock:
+            outcomes[f"{kind}_{outcome}"] += 1
+            if outcome == "ok":
+                latencies[kind].append(time.monotonic() - start)
+
+    arrivals = _poisson_arrivals({"long": long_rate, "short": short_rate}, duration, seed)
+    start = time.monotonic()
+    with ThreadPoolExecutor(512) as server:  # the pod's HTTP server threads
+        for t, kind in arrivals:
+            time.sleep(max(0.0, start + t - time.monotonic()))
+            if kind == "long":
+                server.submit(handle, kind, long_s, "trainer", "batch", None)
+            else:
+                server.submit(handle, kind, short_s, "inference", "interactive", short_budget_s)
+    wall = time.monotonic() - start
+
+    label = policy or "none"
+    if max_running_per_key:
+        label += f" (max {max_running_per_key} per key)"
+    return _summarize(label, latencies, outcomes, wall, controller)
+
+
+def _summarize(label, latencies, outcomes, wall, controller) -> dict:
+    result = {"policy": label, "wall_s": round(wall, 1)}
+    for kind in ("short", "long"):
+        if latencies[kind]:
+            result[f"{kind}_p50_ms"] = _percentile_ms(latencies[kind], 0.5)
+            result[f"{kind}_p99_ms"] = _percentile_ms(latencies[kind], 0.99)
+    result["long_completed_per_s"] = round(outcomes["long_ok"] / wall, 2)
+    result["outcomes"] = dict(outcomes)
+    if controller is not None:
+        result["queue_wait"] = controller.metrics()["wait"]
+    return result
+
+
+# Trainer calls may hold one of the two slots; the other stays free for inference
+_CONTROLLER = AdmissionController(
+    max_concurrency=2, max_queue=16, policy="caller", max_running_per_key=1, max_queue_per_key=8
+)
+
+
+@admitted(_CONTROLLER)
+def serve(kind: str = "short"):
+    """A pod-side entry point mixing short inference and long training-style calls."""
+    import socket
+
+    if kind == "metrics":
+        return _CONTROLLER.metrics()
+    time.sleep(0.05 if kind == "short" else 3.0)
+    return {"kind": kind, "pod": socket.gethostname()}
+
+
+if __name__ == "__main__":
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Pod-side admission control")
+    parser.add_argument("--local", action="store_true", help="Run the local mixed-load test")
+    parser.add_argument("--duration", type=float, default=8.0)
+    args = parser.parse_args()
+
+    if args.local:
+        print("Mixed load on a simulated 4-core pod (~1.3x overloaded):")
+        scenarios = [(None, None), ("fifo", None), ("caller", None), ("caller", 3), ("priority", 3)]
+        for policy, cap in scenarios:
+            print(f"  {run_mixed_load(policy, args.duration, max_running_per_key=cap)}")
+        raise SystemExit(0)
+
+    import kubetorch as kt
+
+    compute = kt.Compute(cpus="1", launch_timeout=60, labels={"demo": "admission"})
+    remote_serve = kt.fn(serve, name="warmstart_admission").to(compute)
+
+    # 6 long calls queue behind one slot; short calls keep the other
+    with ThreadPoolExecutor(16) as pool:
+        longs = [
+            pool.submit(remote_serve, "long", kt_caller="trainer", kt_budget_s=60) for _ in range(6)
+        ]
+        time.sleep(0.5)
+        shorts = []
+        for _ in range(6):
+            start = time.time()
+            result = call_with_retry(remote_serve, "short", kt_caller="inference", budget_s=10)
+            shorts.append((round(time.time() - start, 2), result))
+        for f in longs:
+            print(f"long: {f.result()}")
+    for latency, result in shorts:
+        print(f"short: {latency}s {result}")
+    print(f"metrics: {remote_serve('metrics', kt_caller='ops')}")
@@ -0,0 +1,404 @@
+"""Demo: Disk-persistent memoization for pure remote functions.
+
+Deterministic evaluations (scoring the same geometry with the same model config) are
+recomputed on every call, warm pod or not. `@memoize` caches results keyed on:
+- A hash of the function's source (editing the function invalidates its entries)
+- A canonical hash of the arguments: dicts by sorted key, floats by exact value,
+  numpy arrays / torch tensors by dtype, shape and a digest of their contents
+- An optional `version` tag (bump it when something outside the source changes)
+
+Two tiers: an in-memory LRU (per process, survives warm calls) and an on-disk tier,
+meant for the PVC so entries outlive the pod, evicted least-recently-used by total
+size. Concurrent misses on the same key compute once: other threads wait for the
+result, and other processes/pods wait on a per-key file lock. `.cache_stats()` returns
+hit/miss counts.
+
+Example:
+    # Local: concurrent misses, memory and disk hits, eviction
+    python demos/warmstart/memoize.py --local
+
+    # On a pod, caching on the slurm-data PVC
+    python demos/warmstart/memoize.py
+"""
+
+import collections
+import contextlib
+import fcntl
+import functools
+import hashlib
+import inspect
+import math
+import os
+import pickle
+import struct
+import threading
+import time
+
+MEMO_DIR = os.environ.get("KT_MEMO_DIR")  # e.g. /mnt/data/memo on the PVC
+
+
+def _update(h, value):
+    """Feed a canonical, type-tagged encoding of `value` into hasher `h`."""
+    if value is None or isinstance(value, bool):
+        h.update(f"{type(value).__name__}:{value};".encode())
+    elif isinstance(value, int):
+        h.update(f"i:{value};".encode())
+    elif isinstance(value, float):
+        # Exact bits, so 0.1 + 0.2 and 0.3 differ; all NaNs are one key
+        h.update(b"f:" + (b"nan" if math.isnan(value) else struct.pack("<d", value)))
+    elif isinstance(value, str):
+        h.update(f"s:{len(value)}:".encode() + value.encode())
+    elif isinstance(value, bytes):
+        h.update(f"b:{len(value)}:".encode() + value)
+    elif isinstance(value, (list, tuple, dict, set, frozenset)):
+        _update_container(h, value)
+    elif hasattr(value, "__array__") and hasattr(value, "dtype"):
+        _update_array(h, value)
+    else:
+        raise TypeError(
+            f"Can't hash argument of type {type(value).__name__} canonically; "
+            "pass plain data or arrays"
+        )
+
+
+def _update_container(h, value):
+    if isinstance(value, dict):
+        # Order-independent: entries sorted by the hash of their key
+        entries = sorted((canonical_hash(k), v) for k, v in value.items())
+        h.update(f"d:{len(entries)}{{".encode())
+        for key_hash, v in entries:
+            h.update(key_hash.encode())
+            _update(h, v)
+        h.update(b"}")
+    elif isinstance(value, (set, frozenset)):
+        h.update(f"set:{len(value)}{{".encode())
+        h.update("".join(sorted(map(canonical_hash, value))).encode())
+    else:
+        h.update(f"{type(value).__name__}:{len(value)}[".encode())
+        for item in value:
+            _update(h, item)
+        h.update(b"]")
+
+
+def _update_array(h, value):
+    """dtype, shape and a content digest (numpy arrays, torch tensors)."""
+    import numpy as np
+
+    if hasattr(value, "detach"):  # torch tensor
+        value = value.detach().cpu().numpy()
+    array = np.ascontiguousarray(value)
+    h.update(f"a:{array.dtype.str}:{array.shape}:".encode())
+    h.update(hashlib.blake2b(array.view(np.uint8).reshape(-1), digest_size=16).digest())
+
+
+def canonical_hash(value) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    _update(h, value)
+    return h.hexdigest()
+
+
+def source_hash(fn) -> str:
+    """Hash of the function's source (bytecode and constants if source is unavailable)."""
+    try:
+        source = inspect.getsource(fn).encode()
+    except (OSError, TypeError):
+        code = fn.__code__
+        source = code.co_code + repr(code.co_consts).encode()
+    return hashlib.blake2b(f"{fn.__module__}.{fn.__qualname__}".encode() + source).hexdigest()[:16]
+
+
+class MemoryTier:
+    """In-process LRU of results."""
+
+    def __init__(self, max_items: int = 256):
+        self.max_items = max_items
+        self.items = collections.OrderedDict()
+
+    def get(self, key):
+        if key in self.items:
+            self.items.move_to_end(key)
+            return True, self.items[key]
+        return False, None
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+
+
+class DiskTier:
+    """Pickled results under `path`, evicted least-recently-used (by mtime) past max_bytes.
+
+    Writes are atomic (temp file + rename), so concurrent readers on other pods see
+    either nothing or a complete entry.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1 << 30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        os.makedirs(path, exist_ok=True)
+        self._bytes = sum(e.stat().st_size for e in self._entries())
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f"{key}.pkl")
+
+    def _entries(self):
+        for sub in os.scandir(self.path):
+            if sub.is_dir():
+                yield from (e for e in os.scandir(sub.path) if e.name.endswith(".pkl"))
+
+    def get(self, key):
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return False, None
+        with contextlib.suppress(OSError):
+            os.utime(path)  # mark as recently used
+        return True, value
+
+    def put(self, key, value):
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._bytes += os.path.getsize(path)
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries until under 90% of max_bytes."""
+        entries = sorted((e.stat().st_mtime, e.stat().st_size, e.path) for e in self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            with contextlib.suppress(FileNotFoundError):  # another pod got there first
+                os.remove(path)
+                self.evictions += 1
+            total -= size
+        self._bytes = total
+
+    @contextlib.contextmanager
+    def lock(self, key: str):
+        """Exclusive per-key lock across processes/pods sharing the directory."""
+        path = self._file(key)[: -len(".pkl")] + ".lock"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Memoized:
+    """A memoized function; call it like the original."""
+
+    def __init__(self, fn, version: str, cache_dir: str | None, max_items: int, max_bytes: int):
+        functools.update_wrapper(self, fn)
+        self.fn = fn
+        self.prefix = f"{source_hash(fn)}|{version}"
+        self.memory = MemoryTier(max_items)
+        self.disk = DiskTier(os.path.join(cache_dir, fn.__name__), max_bytes) if cache_dir else None
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> Event set when the computing thread finishes
+
+    def key(self, args, kwargs) -> str:
+        return canonical_hash([self.prefix, list(args), kwargs])
+
+    def __call__(self, *args, **kwargs):
+        key = self.key(args, kwargs)
+        waited = False
+        while True:
+            with self._lock:
+                found, value = self.memory.get(key)
+                if found:
+                    self.stats["coalesced" if waited else "memory_hits"] += 1
+                    return value
+                event = self._inflight.get(key)
+                if event is None:  # this thread computes; the others wait for it
+                    self._inflight[key] = threading.Event()
+                    break
+            waited = True
+            event.wait()  # then re-check memory (or compute, if that call failed)
+
+        try:
+            value = self._load_or_compute(key, args, kwargs)
+            with self._lock:
+                self.memory.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _load_or_compute(self, key, args, kwargs):
+        if self.disk is None:
+            self.stats["misses"] += 1
+            return self._compute(args, kwargs)
+        found, value = self.disk.get(key)
+        if not found:
+            with self.disk.lock(key):  # another pod may be computing the same key
+                found, value = self.disk.get(key)
+                if not found:
+                    self.stats["misses"] += 1
+                    value = self._compute(args, kwargs)
+                    self.disk.put(key, value)
+                    return value
+        self.stats["disk_hits"] += 1
+        return value
+
+    def _compute(self, args, kwargs):
+        start = time.perf_counter()
+        value = self.fn(*args, **kwargs)
+        self.stats["compute_s"] += time.perf_counter() - start
+        return value
+
+    def cache_stats(self) -> dict:
+        stats = dict(self.stats)
+        calls = sum(stats.get(k, 0) for k in ("memory_hits", "disk_hits", "misses", "coalesced"))
+        stats["compute_s"] = round(stats.get("compute_s", 0.0), 3)
+        stats["hit_rate"] = round(1 - stats.get("misses", 0) / calls, 3) if calls else None
+        stats["memory_items"] = len(self.memory.items)
+        if self.disk:
+            stats["disk_bytes"] = self.disk._bytes
+            stats["disk_evictions"] = self.disk.evictions
+        return stats
+
+    def cache_clear(self, disk: bool = False):
+        with self._lock:
+            self.memory.items.clear()
+        if disk and self.disk:
+            for entry in list(self.disk._entries()):
+                os.remove(entry.path)
+            self.disk._bytes = 0
+
+
+def memoize(
+    fn=None,
+    *,
+    version: str = "",
+    cache_dir: str | None = MEMO_DIR,
+    max_items: int = 256,
+    max_bytes: int = 1 << 30,
+):
+    """Decorator: cache a pure function's results in memory and (with cache_dir) on disk."""
+
+    def decorate(f):
+        return Memoized(f, version, cache_dir, max_items, max_bytes)
+
+    return decorate(fn) if fn is not None else decorate
+
+
+@memoize(version="v1")
+def score_geometry(points, config: dict):
+    """Stand-in for an expensive deterministic evaluation of one geometry."""
+    import numpy as np
+
+    time.sleep(config.get("cost_s", 0.5))
+    points = np.asarray(points, dtype=np.float32)
+    centered = points - points.mean(axis=0)
+    return {
+        "n_points": len(points),
+        "radius": float(np.linalg.norm(centered, axis=1).max()),
+        "score": float(np.sin(points * config.get("scale", 1.0)).sum()),
+    }
+
+
+class GeometryScorer:
+    """Pod-side wrapper so stats can be read remotely; deploy with `kt.cls`."""
+
+    def score(self, points, config: dict):
+        return score_geometry(points, config)
+
+    def stats(self) -> dict:
+        return score_geometry.cache_stats()
+
+
+def run_local_demo(cost_s: float = 0.5) -> dict:
+    """Concurrent misses, memory hits, disk hits after a 'restart', size eviction."""
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    import numpy as np
+
+    def evaluate(points, config):
+        time.sleep(config["cost_s"])
+        return float(np.sin(points).sum())
+
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        scorer = memoize(evaluate, version="v1", cache_dir=cache_dir)
+        points = np.random.default_rng(0).normal(size=(5000, 3))
+        config = {"cost_s": cost_s, "model": "opora-64"}
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: scorer(points, config), range(8)))
+        results["8_concurrent_first_calls_s"] = round(time.perf_counter() - start, 2)
+
+        start = time.perf_counter()
+        scorer(points.copy(), dict(reversed(config.items())))  # equal content, new objects
+        results["memory_hit_ms"] = round((time.perf_counter() - start) * 1e3, 2)
+
+        scorer.cache_clear()  # as after a pod restart: memory gone, PVC kept
+        start = time.perf_counter()
+        scorer(points, config)
+        results["disk_hit_ms"] = round((time.perf_counter() - start) * 1e3, 2)
+
+        changed = points.copy()
+        changed[0, 0] += 1e-9
+        start = time.perf_counter()
+        scorer(changed, config)
+        results["one_value_changed_s"] = round(time.perf_counter() - start, 2)
+        results["stats"] = scorer.cache_stats()
+
+        small_dir = os.path.join(cache_dir, "small")
+        small = memoize(evaluate, version="small", cache_dir=small_dir, max_bytes=500)
+        for i in range(50):
+            small(np.full(3, float(i)), {"cost_s": 0})
+        results["eviction_stats"] = small.cache_stats()
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Disk-persistent memoization")
+    parser.add_argument("--local", action="store_true", help="Run the local demo")
+    args = parser.parse_args()
+
+    if args.local:
+        for k, v in run_local_demo().items():
+            print(f"  {k}: {v}")
+        raise SystemExit(0)
+
+    import kubetorch as kt
+
+    compute = kt.Compute(
+        cpus="1",
+        memory="1Gi",
+        image=kt.images.Python311()
+        .pip_install(["numpy"])
+        .set_env_vars({"KT_MEMO_DIR": "/mnt/data/memo"}),
+        namespace="tenant-slurm",
+        volumes=[
+            kt.Volume.from_name(name="slurm-data", namespace="tenant-slurm", mount_path="/mnt/data")
+        ],
+        launch_timeout=120,
+    )
+    scorer = kt.cls(GeometryScorer, name="warmstart_memoize").to(compute)
+
+    points = [[float(i), float(i % 7), float(i % 3)] for i in range(2000)]
+    config = {"cost_s": 2.0, "scale": 0.5}
+    for attempt in range(3):
+        start = time.time()
+        result = scorer.score(points, config)
+        print(f"Call {attempt + 1}: {time.time() - start:.2f}s -> {result}")
+    print(f"Stats: {scorer.stats()}")